@@ -0,0 +1,236 @@
+# 電卓の式を NumPy の配列でまとめて計算する（一括計算モード）
+# engine.py で作った構文木を、演算子ごとに NumPy の ufunc で計算する
+# 電卓で "Error" になる値（0除算・負の数の平方根・0以下の対数など）は、エラーの位置を表す bool 配列(errors)で返す
+#
+# 使い方（CSVの列名を式の変数名にする。結果は result 列、エラーは Error）:
+#   python batch.py "x^3 + 10^x" data.csv > out.csv
+#   python batch.py "x^3 + 10^x" --range 0 5 1000000 --summary
+import argparse
+import csv
+import math
+import sys
+
+import numpy as np
+
+from engine import CONSTANTS, ERROR, Binary, Call, Const, Num, Unary, Var, compile_expression, variables_of
+
+# 階乗は整数の n だけ計算でき、float64 で表せるのは 170! まで
+# gamma(n + 1) = n! の表を作っておき、配列の値で引く
+_MAX_FACTORIAL = 170
+_FACTORIALS = np.array([math.gamma(n + 1) for n in range(_MAX_FACTORIAL + 1)])
+
+
+def _either(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a | b
+
+
+# 結果があふれた（入力は有限なのに inf になった）位置。math.pow や ** では OverflowError になる
+def _overflowed(result, *inputs):
+    bad = np.isinf(result)
+    for x in inputs:
+        bad &= np.isfinite(x)
+    return bad
+
+
+# 1つの値に対する計算（engine.UNARY_FUNCTIONS と同じ名前 -> (結果, エラーの位置 or None)）
+def _sqrt(x):
+    return np.sqrt(x), x < 0
+
+
+def _log10(x):
+    return np.log10(x), x <= 0
+
+
+def _inv(x):
+    return np.divide(1.0, x), x == 0
+
+
+def _fact(x):
+    bad = (x < 0) | (x % 1 != 0) | (x > _MAX_FACTORIAL)  # 負の数・小数・float64 であふれる数
+    index = np.where(bad, 0, x).astype(np.intp)
+    return _FACTORIALS[index], bad
+
+
+def _exp10(x):
+    result = np.power(10.0, x)
+    return result, _overflowed(result, x)
+
+
+def _square(x):
+    result = np.square(x)
+    return result, _overflowed(result, x)
+
+
+def _cube(x):
+    result = np.power(x, 3)
+    return result, _overflowed(result, x)
+
+
+def _percent(x):
+    return np.divide(x, 100), None
+
+
+VECTOR_UNARY = {
+    "√": _sqrt,
+    "sqrt": _sqrt,
+    "log10": _log10,
+    "10ˣ": _exp10,
+    "exp10": _exp10,
+    "1/x": _inv,
+    "inv": _inv,
+    "x!": _fact,
+    "!": _fact,
+    "fact": _fact,
+    "x²": _square,
+    "²": _square,
+    "x³": _cube,
+    "³": _cube,
+    "%": _percent,
+}
+
+
+def _divide(a, b):
+    return np.divide(a, b), b == 0
+
+
+# math.pow と同じく、負の数の小数乗・0の負の数乗・あふれはエラー
+def _power(a, b):
+    result = np.power(a, b)
+    bad = ((a < 0) & np.isfinite(b) & (b % 1 != 0)) | ((a == 0) & (b < 0)) | _overflowed(result, a, b)
+    return result, bad
+
+
+VECTOR_BINARY = {
+    "+": lambda a, b: (np.add(a, b), None),
+    "-": lambda a, b: (np.subtract(a, b), None),
+    "*": lambda a, b: (np.multiply(a, b), None),
+    "/": _divide,
+    "**": _power,
+    "^": _power,
+}
+
+
+# 構文木をたどり、(値の配列, エラーの位置 or None) を返す
+# エラーの位置はそのまま後ろの計算へ伝わる（電卓と同じく、途中で Error なら結果も Error）
+def _evaluate(node, arrays):
+    if isinstance(node, Num):
+        return np.float64(node.value), None
+    if isinstance(node, Const):
+        return np.float64(CONSTANTS[node.name]), None
+    if isinstance(node, Var):
+        return arrays[node.name], None
+    if isinstance(node, Unary):
+        value, errors = _evaluate(node.operand, arrays)
+        if node.op == "-":
+            return np.negative(value), errors
+        if node.op == "+":
+            return value, errors
+        result, bad = VECTOR_UNARY[node.op](value)
+        return result, _either(errors, bad)
+    if isinstance(node, Binary):
+        left, left_errors = _evaluate(node.left, arrays)
+        right, right_errors = _evaluate(node.right, arrays)
+        result, bad = VECTOR_BINARY[node.op](left, right)
+        return result, _either(_either(left_errors, right_errors), bad)
+    if isinstance(node, Call):
+        value, errors = _evaluate(node.arg, arrays)
+        result, bad = VECTOR_UNARY[node.name](value)
+        return result, _either(errors, bad)
+    raise TypeError(f"計算できない構文木: {node!r}")
+
+
+# 配列でまとめて計算する式
+# expr(x=配列) で (values, errors) を返す。values は float64 の配列で、errors が True の位置は NaN
+class VectorizedExpression:
+    __slots__ = ("source", "tree", "variables")
+
+    def __init__(self, source, tree):
+        self.source = source
+        self.tree = tree
+        self.variables = tuple(variables_of(tree))
+
+    def __call__(self, **arrays):
+        missing = [name for name in self.variables if name not in arrays]
+        if missing:
+            raise ValueError(f"変数の値がありません: {', '.join(missing)}")
+        arrays = {name: np.asarray(arrays[name], dtype=np.float64) for name in self.variables}
+        shape = np.broadcast_shapes(*(a.shape for a in arrays.values()))
+        with np.errstate(all="ignore"):
+            values, errors = _evaluate(self.tree, arrays)
+        values = np.array(np.broadcast_to(values, shape), dtype=np.float64)
+        if errors is None:
+            errors = np.zeros(shape, dtype=bool)
+        else:
+            errors = np.array(np.broadcast_to(errors, shape))
+            values[errors] = np.nan
+        return values, errors
+
+
+def vectorize_expression(text):
+    return VectorizedExpression(text, compile_expression(text).tree)
+
+
+# 式を配列でまとめて計算する。(values, errors) を返す
+def evaluate_batch(text, **arrays):
+    return vectorize_expression(text)(**arrays)
+
+
+def _read_columns(fp, names):
+    reader = csv.DictReader(fp)
+    missing = [name for name in names if name not in (reader.fieldnames or ())]
+    if missing:
+        raise SystemExit(f"CSVに列がありません: {', '.join(missing)}")
+    columns = {name: [] for name in names}
+    for row in reader:
+        for name in names:
+            columns[name].append(float(row[name]))
+    return {name: np.array(values) for name, values in columns.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="電卓の式を配列でまとめて計算する")
+    parser.add_argument("expression", help='式（例: "x^3 + 10^x"）')
+    parser.add_argument("csv", nargs="?", help="入力のCSV（列名 = 変数名。- なら標準入力）")
+    parser.add_argument("--range", nargs=3, metavar=("START", "STOP", "COUNT"),
+                        help="1つの変数に START から STOP まで COUNT 個の値を入れる（CSVの代わり）")
+    parser.add_argument("--summary", action="store_true", help="結果を1行ずつ書かず、件数と範囲だけ表示する")
+    args = parser.parse_args(argv)
+
+    expr = vectorize_expression(args.expression)
+    if args.range:
+        if len(expr.variables) != 1:
+            parser.error("--range は変数が1つの式にだけ使えます")
+        start, stop, count = float(args.range[0]), float(args.range[1]), int(args.range[2])
+        arrays = {expr.variables[0]: np.linspace(start, stop, count)}
+    elif args.csv:
+        if args.csv == "-":
+            arrays = _read_columns(sys.stdin, expr.variables)
+        else:
+            with open(args.csv, newline="", encoding="utf-8") as f:
+                arrays = _read_columns(f, expr.variables)
+    else:
+        parser.error("CSV か --range を指定してください")
+
+    values, errors = expr(**arrays)
+    if args.summary:
+        ok = values[~errors]
+        print(f"{values.size:,} 件, Error {int(errors.sum()):,} 件")
+        if ok.size:
+            print(f"最小 {ok.min():.15g}, 最大 {ok.max():.15g}, 平均 {ok.mean():.15g}")
+        return
+
+    writer = csv.writer(sys.stdout, lineterminator="\n")
+    names = list(expr.variables)
+    writer.writerow(names + ["result"])
+    inputs = [np.broadcast_to(arrays[name], values.shape) for name in names]
+    for i in range(values.size):
+        result = ERROR if errors[i] else repr(float(values[i]))
+        writer.writerow([repr(float(column[i])) for column in inputs] + [result])
+
+
+if __name__ == "__main__":
+    main()
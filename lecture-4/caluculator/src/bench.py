@@ -0,0 +1,273 @@
+# 電卓の計算エンジンの性能測定用スクリプト（Flet は不要）
+# 使い方: python bench.py <対象> （対象は BENCHMARKS を参照）
+import argparse
+import random
+import time
+
+from engine import ERROR, apply_binary, compile_expression, evaluate_tree, parse
+
+# 電卓のボタンを一通り使う式
+EXPRESSIONS = [
+    "x^3 + 10^x",
+    "√x * 2 - 1/x",
+    "log10(x) + x² / 3",
+    "(x + 1) * (x - 1) / 4%",
+    "x! / 6 + π",  # x! は整数のときだけ計算できる（それ以外は Error）
+    "inv(x) + exp10(1) - x³",
+]
+
+
+def sample_inputs(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.uniform(0.5, 5.0) if i % 7 else float(rng.randint(1, 6)) for i in range(count)]
+
+
+def rate(count, seconds):
+    return f"{count / seconds / 1e6:6.2f} M式/s ({seconds * 1e9 / count:7.1f} ns/式)"
+
+
+def bench_engine(args):
+    values = sample_inputs(args.count)
+    slow_count = max(1, args.count // 20)  # 遅い方法は件数を減らして1件あたりで比べる
+
+    for text in EXPRESSIONS:
+        compiled = compile_expression(text)
+        rows = [(v,) for v in values]
+
+        start = time.perf_counter()
+        for v in values[:slow_count]:
+            try:
+                evaluate_tree(parse(text), {"x": v})
+            except Exception:
+                pass
+        parse_each = time.perf_counter() - start
+
+        tree = parse(text)
+        start = time.perf_counter()
+        for v in values[:slow_count]:
+            try:
+                evaluate_tree(tree, {"x": v})
+            except Exception:
+                pass
+        tree_walk = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = compiled.evaluate_many(rows)
+        compiled_seconds = time.perf_counter() - start
+
+        errors = sum(1 for r in results if r is ERROR)
+        print(f"{text}")
+        print(f"  毎回解析    : {rate(slow_count, parse_each)}")
+        print(f"  構文木を評価: {rate(slow_count, tree_walk)}")
+        print(f"  コンパイル済: {rate(len(rows), compiled_seconds)}  ({len(rows):,} 件, Error {errors:,} 件)")
+
+
+# NumPy で配列ごとに計算する場合と、1件ずつ計算する場合の比較
+def bench_numpy(args):
+    import numpy as np
+
+    from batch import vectorize_expression
+
+    values = sample_inputs(args.count)
+    array = np.array(values)
+    slow_count = max(1, args.count // 20)
+
+    # CalculatorApp.calculate と同じ apply_binary を1件ずつ呼ぶ（x³ + 10ˣ をボタンで計算するのと同じ手順）
+    start = time.perf_counter()
+    for v in values[:slow_count]:
+        apply_binary("+", apply_binary("**", v, 3.0), apply_binary("**", 10.0, v))
+    calculate_loop = time.perf_counter() - start
+    print(f"x^3 + 10^x を calculate と同じ手順で1件ずつ: {rate(slow_count, calculate_loop)}")
+
+    for text in EXPRESSIONS:
+        compiled = compile_expression(text)
+        vectorized = vectorize_expression(text)
+
+        start = time.perf_counter()
+        compiled.evaluate_many([(v,) for v in values])
+        scalar_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, errors = vectorized(x=array)
+        vector_seconds = time.perf_counter() - start
+
+        print(f"{text}")
+        print(f"  1件ずつ(コンパイル済): {rate(len(values), scalar_seconds)}")
+        print(f"  NumPy でまとめて     : {rate(len(values), vector_seconds)}  "
+              f"(Error {int(errors.sum()):,} 件, {scalar_seconds / vector_seconds:.0f} 倍)")
+
+
+# x! の比較: 毎回 math.factorial / 覚えている近くの n! からの差分 / 全桁を作らない表示
+def bench_factorial(args):
+    import math
+
+    from factorial import FactorialCache, display_factorial
+
+    def timed(function, *args):
+        start = time.perf_counter()
+        value = function(*args)
+        return value, (time.perf_counter() - start) * 1000
+
+    for n in args.sizes:
+        cache = FactorialCache()
+        exact, cold = timed(cache.factorial, n)
+        print(f"n = {n:,} ({exact.bit_length() * math.log10(2):,.0f} 桁)")
+        print(f"  math.factorial（覚えていない）: {cold:10.2f} ms")
+        for neighbour in (n + 1, n + 10, n - 1, n + n // 10):
+            _, ms = timed(cache.factorial, neighbour)
+            print(f"  {neighbour:,}! を覚えている n! から: {ms:10.3f} ms")
+
+        text, ms = timed(display_factorial, n)
+        print(f"  表示（指数表記）: {ms:10.3f} ms  {text}")
+
+
+# 数の表し方（float / decimal / fraction）ごとの、電卓の1操作あたりの時間
+# 電卓と同じく、表示の文字列を読んで計算し、また文字列にするところまでを1操作とする
+def bench_numeric(args):
+    from numeric import get_numbers
+
+    arithmetic = [("+", "0.1"), ("*", "1.5"), ("-", "0.2"), ("/", "1.5")]
+    functions = ["√", "x²", "10ˣ", "log10", "1/x", "1/x"]
+    backends = [("float", get_numbers("float"))]
+    for precision in (28, 50, 100):
+        backends.append((f"decimal({precision})", get_numbers("decimal", precision)))
+    backends.append(("fraction", get_numbers("fraction")))
+
+    baseline = {}
+    for label, numbers in backends:
+        # 0.1 を足し続ける（float では誤差がたまる）
+        start = time.perf_counter()
+        display = "0"
+        for _ in range(args.steps):
+            display = numbers.format(numbers.binary("+", numbers.parse(display), numbers.parse("0.1")))
+        adding = time.perf_counter() - start
+
+        # 四則演算を順に
+        start = time.perf_counter()
+        display = "1"
+        for i in range(args.steps):
+            op, operand = arithmetic[i % len(arithmetic)]
+            display = numbers.format(numbers.binary(op, numbers.parse(display), numbers.parse(operand)))
+        chained = time.perf_counter() - start
+
+        # 関数ボタンを順に（√ → x² → 10ˣ → log10 → 1/x → 1/x で値はほぼ元に戻る）
+        start = time.perf_counter()
+        display = "2"
+        for i in range(args.steps):
+            display = numbers.display_unary(functions[i % len(functions)], display)
+        unary = time.perf_counter() - start
+
+        times = (adding, chained, unary)
+        baseline.setdefault("float", times)
+        ratios = " / ".join(f"{t / b:5.1f}倍" for t, b in zip(times, baseline["float"]))
+        print(f"{label:13s} 0.1の足し算 {adding * 1e6 / args.steps:7.2f} us, 四則演算 {chained * 1e6 / args.steps:7.2f} us, "
+              f"関数 {unary * 1e6 / args.steps:8.2f} us （float の {ratios}） 最後の値 {display[:24]}")
+
+
+# ランダムな電卓の操作（1〜3桁の数とキーを交互に押す）
+def random_session(rng, length):
+    from tape import KEYS
+
+    digits = KEYS[:11]
+    operations = KEYS[11:]
+    keys = []
+    while len(keys) < length:
+        keys.extend(rng.choice(digits) for _ in range(rng.randint(1, 3)))
+        keys.append(rng.choice(operations))
+    return keys
+
+
+# 記録した操作を画面なしで押し直す時間（最後の表示が記録と同じかは test_tape.py で確かめる）
+# --save で操作の記録を CSV に書き、--load で書いておいた記録を押し直す
+def bench_tape(args):
+    import io
+
+    from keypad import Keypad
+    from numeric import get_numbers
+    from tape import CalculationTape, read_sessions, write_sessions
+
+    names = ("float", "decimal", "fraction")
+    if args.load:
+        with open(args.load, newline="", encoding="utf-8") as f:
+            sessions = read_sessions(f)
+        print(f"{args.load} から {len(sessions):,} 回分の操作を読み込みました")
+    else:
+        rng = random.Random(0)
+        sessions = []
+        start = time.perf_counter()
+        for i in range(args.sessions):
+            name = names[i % len(names)]
+            keypad = Keypad(get_numbers(name))
+            for key in random_session(rng, rng.randint(10, 40)):
+                keypad.press(key)
+            sessions.append((name, keypad.tape, keypad.display))
+        seconds = time.perf_counter() - start
+        keys = sum(len(tape) for _, tape, _ in sessions)
+        print(f"記録: {len(sessions):,} 回分 {keys:,} キー {seconds:.2f} 秒 ({keys / seconds:,.0f} キー/s)")
+        buffer = io.StringIO()
+        write_sessions(buffer, sessions)
+        if args.save:
+            with open(args.save, "w", newline="", encoding="utf-8") as f:
+                f.write(buffer.getvalue())
+        buffer.seek(0)
+        sessions = read_sessions(buffer)  # 書いて読み直したものを押し直す
+        tape_bytes = sum(len(tape.to_bytes()) for _, tape, _ in sessions)
+        print(f"テープの大きさ: {tape_bytes:,} バイト (CSV {len(buffer.getvalue()):,} バイト)")
+
+    numbers = {name: get_numbers(name) for name in names}
+    for name in names:
+        group = [(tape, result) for n, tape, result in sessions if n == name]
+        if not group:
+            continue
+        keys = sum(len(tape) for tape, _ in group)
+        start = time.perf_counter()
+        mismatches = [(tape.keys(), result, display) for tape, result in group
+                      if (display := Keypad(numbers[name]).replay(tape.keys())) != result]
+        seconds = time.perf_counter() - start
+        print(f"押し直し {name:8s}: {len(group):,} 回分 {seconds * 1000:8.1f} ms "
+              f"({len(group) / seconds:,.0f} 回分/s, {keys / seconds:,.0f} キー/s), 不一致 {len(mismatches)}")
+
+    # 取り消しと CSV 出力（40 キーの操作で）
+    keypad = Keypad()
+    keys = random_session(random.Random(1), 40)
+    for key in keys:
+        keypad.press(key)
+    start = time.perf_counter()
+    for _ in keys:
+        keypad.undo()
+    seconds = time.perf_counter() - start
+    print(f"取り消し: 1回 {seconds * 1e6 / len(keys):.1f} us（{len(keys)} キーの操作を全部取り消し）")
+
+    keypad = Keypad(display="0")
+    keypad.tape = CalculationTape(keys)
+    start = time.perf_counter()
+    out = io.StringIO()
+    keypad.export_csv(out)
+    print(f"CSV 出力: {len(keys)} キー {(time.perf_counter() - start) * 1e6:.0f} us")
+
+
+BENCHMARKS = {
+    "engine": bench_engine,
+    "numpy": bench_numpy,
+    "factorial": bench_factorial,
+    "numeric": bench_numeric,
+    "tape": bench_tape,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="電卓の計算エンジンの性能測定")
+    parser.add_argument("target", choices=BENCHMARKS.keys())
+    parser.add_argument("--count", type=int, default=1000000, help="1つの式を計算する回数")
+    parser.add_argument("--sizes", type=lambda s: [int(v) for v in s.split(",")], default=[10**4, 10**5, 10**6],
+                        help="factorial で計算する n（カンマ区切り）")
+    parser.add_argument("--steps", type=int, default=20000, help="numeric で電卓を操作する回数")
+    parser.add_argument("--sessions", type=int, default=5000, help="tape で記録する操作の回数")
+    parser.add_argument("--save", help="tape で記録した操作を書き出すCSV")
+    parser.add_argument("--load", help="tape で押し直す操作のCSV（--save で書いたもの）")
+    args = parser.parse_args()
+    BENCHMARKS[args.target](args)
+
+
+if __name__ == "__main__":
+    main()
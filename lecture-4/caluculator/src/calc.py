@@ -1,5 +1,8 @@
 import flet as ft
-import math
+
+# キー操作と計算は Flet に依存しない keypad.py（engine.py / numeric.py）で行う
+from keypad import UNDO, Keypad
+from numeric import BACKENDS, DEFAULT_PRECISION, get_numbers
 
 class CalcButton(ft.ElevatedButton):
     def __init__(self, text, button_clicked, expand=1):
@@ -32,11 +35,13 @@ class ExtraActionButton(CalcButton):
 
 
 class CalculatorApp(ft.Container):
-    def __init__(self):
+    # numbers: 数の表し方（numeric.py のバックエンド）。省略すると今までどおり float
+    def __init__(self, numbers=None, precision=DEFAULT_PRECISION):
         super().__init__()
-        self.reset()
+        self.precision = precision
+        self.keypad = Keypad(numbers)
 
-        self.result = ft.Text(value="0", color=ft.Colors.WHITE, size=20)
+        self.result = ft.Text(value=self.keypad.display, color=ft.Colors.WHITE, size=20)
         self.width = 700
         self.bgcolor = ft.Colors.BLACK
         self.border_radius = ft.border_radius.all(20)
@@ -68,6 +73,19 @@ class CalculatorApp(ft.Container):
                                 ExtraActionButton(text="x!", button_clicked=self.button_clicked),
                             ],
                         ),
+                        # 数の表し方（float / decimal / fraction）を選ぶ・1つ前のキーを取り消す
+                        ft.Row(
+                            controls=[
+                                ft.Dropdown(
+                                    value=self.keypad.numbers.name,
+                                    options=[ft.dropdown.Option(name) for name in BACKENDS],
+                                    on_change=self.numbers_changed,
+                                    dense=True,
+                                    expand=2,
+                                ),
+                                ExtraActionButton(text=UNDO, button_clicked=self.button_clicked),
+                            ],
+                        ),
                     ],       expand=1,#左側の列を狭くする(スマホがそうしてたから)        
                 ),         
             
@@ -120,129 +138,14 @@ class CalculatorApp(ft.Container):
         )
 
     def button_clicked(self, e):
-        data = e.control.data
-        print(f"Button clicked with data = {data}")
-        if self.result.value == "Error" or data == "AC":
-            self.result.value = "0"
-            self.reset()
-
-        elif data in ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "."):
-            if self.result.value == "0" or self.new_operand == True:
-                self.result.value = data
-                self.new_operand = False
-            else:
-                self.result.value = self.result.value + data
-
-        elif data in ("+", "-", "*", "/"):
-            self.result.value = self.calculate(self.operand1, float(self.result.value), self.operator)
-            self.operator = data
-            if self.result.value == "Error":
-                self.operand1 = "0"
-            else:
-                self.operand1 = float(self.result.value)
-            self.new_operand = True
-
-        elif data in ("="):
-            self.result.value = self.calculate(self.operand1, float(self.result.value), self.operator)
-            self.reset()
-
-        elif data in ("%"):
-            self.result.value = float(self.result.value) / 100
-            self.reset()
-
-        elif data in ("+/-"):
-            if float(self.result.value) > 0:
-                self.result.value = "-" + str(self.result.value)
-
-            elif float(self.result.value) < 0:
-                self.result.value = str(self.format_number(abs(float(self.result.value))))
-        
-        
-        #化学計算ボタンの処理
-        elif data in ("π"): 
-            self.result.value = str(self.format_number(math.pi))
-            self.new_operand = True 
-        
-        elif data in ("√"):
-            if float(self.result.value) < 0: #負の数の平方根はエラー
-                self.result.value = "Error"
-            else:
-                self.result.value = str(self.format_number(math.sqrt(float(self.result.value))))
-            self.new_operand = True
-        
-        elif data in ("1/x"):
-            if float(self.result.value) == 0: #0の逆数はエラー
-                self.result.value = "Error"
-            else:
-                self.result.value = str(self.format_number(1 / float(self.result.value)))
-            self.new_operand = True
-        
-        elif data in ("x²"):
-            self.result.value = str(self.format_number(float(self.result.value) ** 2))
-            self.new_operand = True
-
-        elif data in ("x³"):
-            self.result.value = str(self.format_number(float(self.result.value) ** 3))
-            self.new_operand = True 
-
-        elif data in ("xʸ"):
-            self.operand1 = float(self.result.value)
-            self.operator = "**" #べき乗の演算子
-            self.new_operand = True
-
-        elif data in ("10ˣ"):
-            self.result.value = str(self.format_number(10 ** float(self.result.value)))
-            self.new_operand = True
-        
-        elif data in ("log10"):
-            if float(self.result.value) <= 0: #0以下の対数はエラー
-                self.result.value = "Error"
-            else:
-                self.result.value = str(self.format_number(math.log10(float(self.result.value))))
-            self.new_operand = True
-        
-        elif data in ("x!"):
-            if float(self.result.value) < 0 or float(self.result.value) % 1 != 0: #負の数と小数の階乗はエラー
-                self.result.value = "Error"
-            else:
-                self.result.value = str(self.format_number(math.factorial(int(float(self.result.value)))))
-            self.new_operand = True
-    
-
+        self.result.value = self.keypad.press(e.control.data)
         self.update()
 
-    def format_number(self, num):
-        if num % 1 == 0:
-            return int(num)
-        else:
-            return num
-
-    def calculate(self, operand1, operand2, operator):
-
-        if operator == "+":
-            return self.format_number(operand1 + operand2)
-
-        elif operator == "-":
-            return self.format_number(operand1 - operand2)
-
-        elif operator == "*":
-            return self.format_number(operand1 * operand2)
-
-        elif operator == "/":
-            if operand2 == 0:
-                return "Error"
-            else:
-                return self.format_number(operand1 / operand2)
-        
-        # べき乗の計算
-        elif operator == "**":  
-            return self.format_number(operand1 ** operand2) #x ** yを計算
-        
-
-    def reset(self):
-        self.operator = "+"
-        self.operand1 = 0
-        self.new_operand = True
+    # 数の表し方を切り替える（表示中の値はそのまま、途中の計算は取り消す）
+    def numbers_changed(self, e):
+        self.keypad.set_numbers(get_numbers(e.control.value, self.precision))
+        self.result.value = self.keypad.display
+        self.update()
 
 
 def main(page: ft.Page):
@@ -251,4 +154,5 @@ def main(page: ft.Page):
     page.add(calc)
 
 
-ft.app(main)
+if __name__ == "__main__":
+    ft.app(main)
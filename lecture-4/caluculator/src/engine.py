@@ -0,0 +1,368 @@
+# 電卓の計算エンジン（Flet なしで使える）
+# 式の文字列 → 字句解析 → 優先順位つきの構文解析(AST) → Python の関数にコンパイル、の順に処理する
+# 1度コンパイルした式は、変数の値を変えて何度でも速く計算できる
+#
+# 書ける式（電卓のボタンとの対応）:
+#   + - * /        四則演算（* / が + - より先）
+#   x ^ y, x ** y  xʸ（右結合、-2^2 = -(2^2)）
+#   x², x³         2乗・3乗
+#   √x, sqrt(x)    平方根
+#   log10(x)       常用対数
+#   10^x, exp10(x) 10ˣ
+#   1/x, inv(x)    逆数
+#   x!, fact(x)    階乗
+#   x%             x / 100
+#   π, pi          円周率
+# 0除算・負の数の平方根・0以下の対数・負や小数や大きすぎる数の階乗などは CalcError（電卓では "Error" と表示）
+import math
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from factorial import exact_factorial
+
+ERROR = "Error"  # CalculatorApp と同じ、計算できなかったときの表示
+
+
+# 計算できない（電卓の "Error"）
+class CalcError(Exception):
+    pass
+
+
+# 式の書き方が正しくない
+class ParseError(CalcError):
+    pass
+
+
+# 構文木のノード
+Num = namedtuple("Num", ["value"])
+Const = namedtuple("Const", ["name"])
+Var = namedtuple("Var", ["name"])
+Unary = namedtuple("Unary", ["op", "operand"])  # op: "-", "+", "√", "!", "%", "²", "³"
+Binary = namedtuple("Binary", ["op", "left", "right"])  # op: "+", "-", "*", "/", "^"
+Call = namedtuple("Call", ["name", "arg"])
+
+
+# 1つの値に対する計算（ボタンの記号・関数名 -> 関数）
+def _sqrt(x):
+    if x < 0:  # 負の数の平方根はエラー
+        raise CalcError("負の数の平方根")
+    return math.sqrt(x)
+
+
+def _log10(x):
+    if x <= 0:  # 0以下の対数はエラー
+        raise CalcError("0以下の対数")
+    return math.log10(x)
+
+
+def _inv(x):
+    if x == 0:  # 0の逆数はエラー
+        raise CalcError("0の逆数")
+    return 1 / x
+
+
+# 負の数・小数・大きすぎる数（factorial.EXACT_LIMIT より大きい）の階乗はエラー
+def _fact(x):
+    return exact_factorial(x)
+
+
+def _exp10(x):
+    return math.pow(10, x)
+
+
+def _percent(x):
+    return x / 100
+
+
+UNARY_FUNCTIONS = {
+    "√": _sqrt,
+    "sqrt": _sqrt,
+    "log10": _log10,
+    "10ˣ": _exp10,
+    "exp10": _exp10,
+    "1/x": _inv,
+    "inv": _inv,
+    "x!": _fact,
+    "!": _fact,
+    "fact": _fact,
+    "x²": lambda x: x ** 2,
+    "²": lambda x: x ** 2,
+    "x³": lambda x: x ** 3,
+    "³": lambda x: x ** 3,
+    "%": _percent,
+}
+
+# 2つの値の計算（CalculatorApp の演算子 -> 関数）
+BINARY_FUNCTIONS = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b,
+    "**": math.pow,  # xʸ
+    "^": math.pow,
+}
+
+CONSTANTS = {"π": math.pi, "pi": math.pi}
+FUNCTION_NAMES = ("sqrt", "log10", "exp10", "inv", "fact")
+
+
+# 1つの値に計算を適用する。計算できなければ CalcError
+def apply_unary(name, x):
+    try:
+        return UNARY_FUNCTIONS[name](x)
+    except (ArithmeticError, ValueError) as err:
+        raise CalcError(str(err)) from err
+
+
+# 2つの値に演算子を適用する。計算できなければ CalcError
+def apply_binary(op, a, b):
+    try:
+        return BINARY_FUNCTIONS[op](a, b)
+    except (ArithmeticError, ValueError) as err:
+        raise CalcError(str(err)) from err
+
+
+# 字句解析: 数・演算子・名前に分ける
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+      | (?P<op>\*\*|[-+*/^()!%²³√π])
+      | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+    )""", re.VERBOSE)
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if match is None:
+            raise ParseError(f"読めない文字: {text[pos:].strip()[:1]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "op" and value == "**":
+            value = "^"
+        tokens.append((kind, value))
+        pos = match.end()
+    tokens.append(("end", None))
+    return tokens
+
+
+# 構文解析（演算子の優先順位に従って構文木を作る）
+# 式 := 項 (("+" | "-") 項)*
+# 項 := 単項 (("*" | "/") 単項)*
+# 単項 := ("-" | "+" | "√") 単項 | べき
+# べき := 後置 ("^" 単項)?          右結合
+# 後置 := 基本 ("!" | "%" | "²" | "³")*
+# 基本 := 数 | π | 変数 | 関数名 "(" 式 ")" | "(" 式 ")"
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def take(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, value):
+        kind, got = self.take()
+        if got != value:
+            raise ParseError(f"{value!r} が必要です")
+
+    def parse(self):
+        node = self.expression()
+        if self.peek()[0] != "end":
+            raise ParseError(f"余分な記号: {self.peek()[1]!r}")
+        return node
+
+    def expression(self):
+        node = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            node = Binary(self.take()[1], node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek() in (("op", "*"), ("op", "/")):
+            node = Binary(self.take()[1], node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() in (("op", "-"), ("op", "+"), ("op", "√")):
+            return Unary(self.take()[1], self.unary())
+        return self.power()
+
+    def power(self):
+        node = self.postfix()
+        if self.peek() == ("op", "^"):
+            self.take()
+            node = Binary("^", node, self.unary())
+        return node
+
+    def postfix(self):
+        node = self.primary()
+        while self.peek() in (("op", "!"), ("op", "%"), ("op", "²"), ("op", "³")):
+            node = Unary(self.take()[1], node)
+        return node
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == "num":
+            return Num(float(value))
+        if kind == "op" and value == "π":
+            return Const("π")
+        if kind == "op" and value == "(":
+            node = self.expression()
+            self.expect(")")
+            return node
+        if kind == "name":
+            if value in FUNCTION_NAMES:
+                self.expect("(")
+                node = Call(value, self.expression())
+                self.expect(")")
+                return node
+            if value in CONSTANTS:
+                return Const(value)
+            if self.peek() == ("op", "("):
+                raise ParseError(f"知らない関数: {value}")
+            return Var(value)
+        raise ParseError("式が途中で終わっています" if kind == "end" else f"ここに {value!r} は書けません")
+
+
+def parse(text):
+    return _Parser(tokenize(text)).parse()
+
+
+# 式に出てくる変数名（出てきた順）
+def variables_of(node):
+    names = []
+
+    def visit(node):
+        if isinstance(node, Var):
+            if node.name not in names:
+                names.append(node.name)
+        elif isinstance(node, Unary):
+            visit(node.operand)
+        elif isinstance(node, Binary):
+            visit(node.left)
+            visit(node.right)
+        elif isinstance(node, Call):
+            visit(node.arg)
+
+    visit(node)
+    return names
+
+
+# 構文木をそのままたどって計算する（コンパイルしない場合。比較用）
+def evaluate_tree(node, variables):
+    if isinstance(node, Num):
+        return node.value
+    if isinstance(node, Const):
+        return CONSTANTS[node.name]
+    if isinstance(node, Var):
+        try:
+            return variables[node.name]
+        except KeyError:
+            raise CalcError(f"変数 {node.name} の値がありません") from None
+    if isinstance(node, Unary):
+        value = evaluate_tree(node.operand, variables)
+        if node.op == "-":
+            return -value
+        if node.op == "+":
+            return value
+        return apply_unary(node.op, value)
+    if isinstance(node, Binary):
+        return apply_binary(node.op, evaluate_tree(node.left, variables), evaluate_tree(node.right, variables))
+    return apply_unary(node.name, evaluate_tree(node.arg, variables))
+
+
+# 構文木から Python の式の文字列を作る（関数は名前空間 _NAMESPACE のものを呼ぶ）
+# 四則演算はそのまま書き、エラーは呼び出し時に例外でまとめて CalcError にする
+def _to_source(node):
+    if isinstance(node, Num):
+        if math.isinf(node.value):  # 1e999 のようにあふれた数は repr が inf になり、名前として読めない
+            return "float('inf')"
+        return repr(node.value)
+    if isinstance(node, Const):
+        return "PI"
+    if isinstance(node, Var):
+        return "v_" + node.name
+    if isinstance(node, Unary):
+        operand = _to_source(node.operand)
+        if node.op in ("-", "+"):
+            return f"({node.op}{operand})"
+        if node.op == "²":
+            return f"({operand} ** 2)"
+        if node.op == "³":
+            return f"({operand} ** 3)"
+        if node.op == "%":
+            return f"({operand} / 100)"
+        return f"sqrt({operand})" if node.op == "√" else f"fact({operand})"
+    if isinstance(node, Binary):
+        left, right = _to_source(node.left), _to_source(node.right)
+        if node.op == "^":
+            return f"pow({left}, {right})"
+        return f"({left} {node.op} {right})"
+    arg = _to_source(node.arg)
+    if node.name == "inv":
+        return f"(1 / {arg})"
+    return f"{node.name}({arg})"
+
+
+# math の関数は負の数の平方根・0以下の対数で ValueError を出すので、そのまま使える
+_NAMESPACE = {
+    "PI": math.pi,
+    "sqrt": math.sqrt,
+    "log10": math.log10,
+    "exp10": _exp10,
+    "fact": _fact,
+    "pow": math.pow,
+}
+
+
+# コンパイル済みの式
+# expr(x=2) / expr(2)（引数は variables の順）で計算する
+class CompiledExpression:
+    __slots__ = ("source", "tree", "variables", "_function")
+
+    def __init__(self, source, tree):
+        self.source = source
+        self.tree = tree
+        self.variables = tuple(variables_of(tree))
+        params = ", ".join("v_" + name for name in self.variables)
+        self._function = eval(f"lambda {params}: {_to_source(tree)}", dict(_NAMESPACE))
+
+    def __call__(self, *args, **kwargs):
+        try:
+            return self._function(*args, **{"v_" + name: value for name, value in kwargs.items()})
+        except (ArithmeticError, ValueError) as err:
+            raise CalcError(str(err)) from err
+        except TypeError as err:
+            raise CalcError(f"変数の値が足りません: {', '.join(self.variables)}") from err
+
+    # 値の組（variables の順）ごとに計算し、結果のリストを返す。計算できなかったものは ERROR
+    def evaluate_many(self, rows):
+        function = self._function
+        results = []
+        for row in rows:
+            try:
+                results.append(function(*row))
+            except (ArithmeticError, ValueError, CalcError):
+                results.append(ERROR)
+        return results
+
+
+@lru_cache(maxsize=256)
+def compile_expression(text):
+    return CompiledExpression(text, parse(text))
+
+
+# 式を1回だけ計算する（同じ式はコンパイル結果を使い回す）
+def evaluate(text, **variables):
+    return compile_expression(text)(**variables)
@@ -0,0 +1,128 @@
+# 階乗の計算（電卓の x! ボタンと engine の fact で使う）
+# ・正確な値: math.factorial（C 実装の分割統治）で計算し、計算した n! を LRU に覚えておく
+#   近くの n の階乗を覚えていれば、その差の部分の積だけを掛ける（割る）ので、隣の n はすぐ計算できる
+# ・表示用: 大きな n は全桁を作らず、スターリングの級数で log10(n!) を求めて指数表記にする（n によらず一定時間）
+# 計算できないときは math.factorial と同じく ValueError（engine では CalcError になる）
+import math
+import threading
+from collections import OrderedDict
+from decimal import Decimal, localcontext
+
+DISPLAY_DIGITS = 20  # これより桁の多い階乗は指数表記で表示する（21! までは全桁）
+SIGNIFICANT_DIGITS = 10  # 指数表記の仮数の桁数
+EXACT_LIMIT = 100000  # 正確な値を計算する上限（これより大きいと時間がかかりすぎるのでエラー）
+
+
+# 整数かどうか確かめて int にする。負の数・小数・inf・NaN は ValueError
+def factorial_argument(x):
+    if x < 0 or x % 1 != 0:  # inf と NaN は x % 1 が NaN になるのでここで弾かれる
+        raise ValueError("負の数・小数の階乗")
+    return int(x)
+
+
+# lo * (lo + 1) * ... * (hi - 1) を2分割しながら計算する（大きさの近い数どうしを掛けると速い）
+def range_product(lo, hi):
+    if hi - lo <= 32:
+        return math.prod(range(lo, hi))
+    mid = (lo + hi) // 2
+    return range_product(lo, mid) * range_product(mid, hi)
+
+
+# 計算した n! を覚えておく
+# n より小さいところを覚えていれば (m+1)...n を掛け、少し大きいところなら (n+1)...m で割る
+class FactorialCache:
+    def __init__(self, maxsize=8, down_limit=256):
+        self.maxsize = maxsize  # 10⁵! で約190KB なので数個まで
+        self.down_limit = down_limit  # 割り算は掛け算より遅いので、割って戻るのは近いときだけ
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.incremental = 0
+        self.misses = 0
+
+    # n に一番近く、そこから計算した方が速い覚えている m を返す。なければ None
+    def _nearest(self, n):
+        best = None
+        for m in self._entries:
+            if m <= n and n - m <= n // 4 or n < m <= n + self.down_limit:
+                if best is None or abs(n - m) < abs(n - best):
+                    best = m
+        return best
+
+    def factorial(self, n):
+        with self._lock:
+            value = self._entries.get(n)
+            if value is not None:
+                self._entries.move_to_end(n)
+                self.hits += 1
+                return value
+            m = self._nearest(n)
+            base = self._entries[m] if m is not None else None
+        if base is None:
+            value = math.factorial(n)
+            with self._lock:
+                self.misses += 1
+        else:
+            value = base * range_product(m + 1, n + 1) if m < n else base // range_product(n + 1, m + 1)
+            with self._lock:
+                self.incremental += 1
+        with self._lock:
+            self._entries[n] = value
+            self._entries.move_to_end(n)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = FactorialCache()
+
+
+# 正確な x!（int）。EXACT_LIMIT より大きいと ValueError
+def exact_factorial(x, limit=EXACT_LIMIT):
+    n = factorial_argument(x)
+    if n > limit:
+        raise ValueError("階乗が大きすぎます")
+    return _cache.factorial(n)
+
+
+# スターリングの級数の補正項 B₂ₖ / (2k(2k-1)) の分子と分母
+# n > 21 なら 5 項で誤差は 1e-20 より小さい
+_STIRLING_TERMS = ((1, 12), (-1, 360), (1, 1260), (-1, 1680), (1, 1188))
+_PI = Decimal("3.14159265358979323846264338327950288419716939937510")
+
+
+# log10(n!) を Decimal で求める（全桁を作らないので n が大きくても時間が変わらない）
+# digits は小数部に残す桁数（級数の誤差より細かくはならない）
+def log10_factorial(n, digits=40):
+    with localcontext() as ctx:
+        ctx.prec = digits + len(str(n))  # 整数部の桁数の分だけ精度を足す
+        d = Decimal(n)
+        ln = (d + Decimal("0.5")) * d.ln() - d + (2 * _PI).ln() / 2
+        power = d
+        for numerator, denominator in _STIRLING_TERMS:
+            ln += Decimal(numerator) / (denominator * power)
+            power *= d * d
+        return ln / Decimal(10).ln()
+
+
+# n! の表示用の文字列（時間が一定の表示モード）
+# DISPLAY_DIGITS 桁までは全桁、それより大きければ "8.263931688e+5565708" のような指数表記
+def display_factorial(x, significant=SIGNIFICANT_DIGITS):
+    n = factorial_argument(x)
+    if n <= 21:
+        value = math.factorial(n)
+        if value < 10 ** DISPLAY_DIGITS:
+            return str(value)
+    log10 = log10_factorial(n)
+    exponent = int(log10)  # n! >= 1 なので切り捨て = 床
+    with localcontext() as ctx:
+        ctx.prec = significant + 10
+        mantissa = (Decimal(10) ** (log10 - exponent)).quantize(Decimal(1).scaleb(1 - significant))
+    if mantissa >= 10:  # 9.9999... が繰り上がった
+        mantissa = (mantissa / 10).quantize(Decimal(1).scaleb(1 - significant))
+        exponent += 1
+    return f"{mantissa}e+{exponent}"
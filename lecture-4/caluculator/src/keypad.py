@@ -0,0 +1,159 @@
+# 電卓のキー操作（Flet なしで動く。CalculatorApp はこれを画面に出すだけ）
+# キーごとの処理は最初に表(_handlers)にしておき、押されたキーで1回引くだけにする
+# 押したキーは計算テープ(tape.CalculationTape)に記録し、取り消し・やり直し・CSV出力に使う
+import csv
+
+from engine import CalcError
+from numeric import get_numbers
+from tape import CalculationTape
+
+ERROR = "Error"
+UNDO = "↶"  # 1つ前のキーを取り消す（テープには記録しない）
+
+# キー -> 処理するメソッドの名前
+_KEY_HANDLERS = {
+    **{digit: "_digit" for digit in "0123456789."},
+    **{op: "_operator" for op in ("+", "-", "*", "/")},
+    "=": "_equals",
+    "%": "_percent",
+    "+/-": "_negate",
+    "AC": "clear",
+    "π": "_pi",
+    **{name: "_unary" for name in ("√", "1/x", "x²", "x³", "10ˣ", "log10", "x!")},
+    "xʸ": "_power",
+}
+
+
+class Keypad:
+    # numbers: 数の表し方（numeric.py のバックエンド）。display: 始めの表示
+    def __init__(self, numbers=None, display="0"):
+        self.numbers = numbers or get_numbers("float")
+        self.initial = display
+        self.tape = CalculationTape()
+        self._handlers = {key: getattr(self, name) for key, name in _KEY_HANDLERS.items()}
+        self.display = display
+        self.reset()
+
+    def reset(self):
+        self.operator = "+"
+        self.operand1 = 0
+        self.new_operand = True
+
+    def clear(self, key=None):
+        self.display = "0"
+        self.reset()
+
+    # キーを1つ押して、表示を返す（知らないキーは何もしない）
+    def press(self, key):
+        if key == UNDO:
+            return self.undo()
+        handler = self._handlers.get(key)
+        if handler is None:
+            return self.display
+        self.tape.append(key)
+        self._apply(handler, key)
+        return self.display
+
+    def _apply(self, handler, key):
+        if self.display == ERROR:  # Error の次はどのキーでも AC と同じ
+            self.clear()
+            return
+        try:
+            handler(key)
+        except (ValueError, ArithmeticError):  # "1.2.3" のように読めない表示など
+            self.display = ERROR
+
+    # 記録せずにキーを順に押す
+    def replay(self, keys):
+        handlers = self._handlers
+        for key in keys:
+            self._apply(handlers[key], key)
+        return self.display
+
+    # 最後のキーを取り消す（始めの表示からテープをやり直す）
+    def undo(self):
+        if len(self.tape):
+            self.tape.pop()
+            self.display = self.initial
+            self.reset()
+            self.replay(self.tape.keys())
+        return self.display
+
+    # 数の表し方を切り替える（表示中の値はそのまま、途中の計算とテープは新しく始める）
+    def set_numbers(self, numbers):
+        try:
+            display = numbers.format(numbers.parse(self.display))
+        except (ValueError, ArithmeticError):
+            display = "0"
+        self.numbers = numbers
+        self.initial = display
+        self.tape = CalculationTape()
+        self.display = display
+        self.reset()
+
+    # テープの各キーと、押した後の表示を CSV に書く
+    def export_csv(self, fp):
+        keypad = Keypad(self.numbers, self.initial)
+        writer = csv.writer(fp, lineterminator="\n")
+        writer.writerow(("step", "key", "display"))
+        for step, key in enumerate(self.tape.keys(), 1):
+            writer.writerow((step, key, keypad.replay((key,))))
+
+    def calculate(self, operand1, operand2, operator):
+        # 演算子（+, -, *, /, べき乗の **）ごとの計算は選んでいるバックエンドで行う。0除算などは "Error"
+        try:
+            return self.numbers.format(self.numbers.binary(operator, operand1, operand2))
+        except CalcError:
+            return ERROR
+
+    def _digit(self, key):
+        if self.display == "0" or self.new_operand:
+            self.display = "0." if key == "." else key
+            self.new_operand = False
+        else:
+            self.display = self.display + key
+
+    def _operator(self, key):
+        self.display = self.calculate(self.operand1, self.numbers.parse(self.display), self.operator)
+        self.operator = key
+        self.operand1 = 0 if self.display == ERROR else self.numbers.parse(self.display)
+        self.new_operand = True
+
+    def _equals(self, key):
+        self.display = self.calculate(self.operand1, self.numbers.parse(self.display), self.operator)
+        self.reset()
+
+    def _percent(self, key):
+        self._unary(key)
+        self.reset()
+
+    def _negate(self, key):
+        value = self.numbers.parse(self.display)
+        if value > 0:
+            self.display = "-" + self.display
+        elif value < 0:
+            self.display = self.numbers.format(-value)
+
+    def _pi(self, key):
+        self.display = self.numbers.format(self.numbers.pi())
+        self.new_operand = True
+
+    # 1つの値に対する計算（√, 1/x, x², x³, 10ˣ, log10, x!, %）
+    # 負の数の平方根・0の逆数・0以下の対数・負の数と小数の階乗などはエラー
+    # 大きな階乗は全桁を作らず指数表記で表示する（大きな数でも画面が固まらない）
+    def _unary(self, key):
+        try:
+            self.display = self.numbers.display_unary(key, self.display)
+        except CalcError:
+            self.display = ERROR
+        self.new_operand = True
+
+    def _power(self, key):
+        self.operand1 = self.numbers.parse(self.display)
+        self.operator = "**"  # べき乗の演算子
+        self.new_operand = True
+
+
+# 記録したキーを新しい電卓で押し直し、最後の表示を返す
+def replay(keys, numbers=None):
+    return Keypad(numbers).replay(keys)
@@ -0,0 +1,288 @@
+# 電卓の数の表し方（バックエンド）
+# 同じ操作（表示の文字列との変換・四則演算と xʸ・ボタンの1値計算・π）を、数の型ごとに用意する
+#   float    : 今までどおりの2進の浮動小数点（速い。0.1 + 0.2 = 0.30000000000000004 になる）
+#   decimal  : 10進の decimal.Decimal（precision 桁。0.1 + 0.2 = 0.3、10^5000 もあふれない）
+#   fraction : 分数 fractions.Fraction（四則演算と整数乗は正確。1/3 は "1/3" と表示）
+#              平方根・対数などが無理数になるときは precision 桁の Decimal で計算して分数にする
+# 計算できないときは CalcError（電卓では "Error" と表示）
+import math
+from decimal import (MAX_EMAX, MIN_EMIN, Context, Decimal, DecimalException, DivisionByZero, InvalidOperation,
+                     Overflow, localcontext)
+from fractions import Fraction
+from functools import lru_cache
+
+from engine import CalcError, apply_binary, apply_unary
+from factorial import display_factorial, exact_factorial, factorial_argument, log10_factorial
+
+DEFAULT_PRECISION = 28  # decimal の既定と同じ
+EXACT_DISPLAY_DIGITS = 60  # fraction で、これより長い分子・分母は小数の近似で表示する
+EXACT_FACTORIAL_N = 1000  # decimal・fraction で x! の正確な値を使う上限（より大きい n は log10(n!) から求める）
+
+
+# 円周率を digits 桁求める（decimal のドキュメントのレシピ）
+@lru_cache(maxsize=8)
+def decimal_pi(digits):
+    with localcontext() as ctx:
+        ctx.prec = digits + 2
+        three = Decimal(3)
+        lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+        while s != lasts:
+            lasts = s
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            s += t
+    with localcontext() as ctx:
+        ctx.prec = digits
+        return +s
+
+
+# n が 10 の整数乗なら指数、そうでなければ None
+def _power_of_ten(n):
+    if n < 1:
+        return None
+    k = int(math.log10(n))  # 大きい数では誤差があるので前後も確かめる
+    for exponent in (k - 1, k, k + 1):
+        if exponent >= 0 and 10 ** exponent == n:
+            return exponent
+    return None
+
+
+# float（今までの電卓と同じ計算）
+class FloatNumbers:
+    name = "float"
+
+    # 表示の文字列を数にする（fraction の "1/3" のような表示も読める）
+    def parse(self, text):
+        if "/" in text:
+            return float(Fraction(text))
+        return float(text)
+
+    def format(self, value):
+        return str(int(value)) if value % 1 == 0 else str(value)
+
+    def binary(self, op, a, b):
+        return apply_binary(op, a, b)
+
+    def unary(self, name, x):
+        return apply_unary(name, x)
+
+    def pi(self):
+        return math.pi
+
+    # ボタンの1値計算を表示の文字列に行う。x! は全桁を作らない表示にする
+    def display_unary(self, name, text):
+        if name == "x!":
+            try:
+                return display_factorial(self.parse(text))
+            except ValueError as err:
+                raise CalcError(str(err)) from err
+        return self.format(self.unary(name, self.parse(text)))
+
+
+# 10進の Decimal（precision 桁、指数は decimal で表せる限りあふれない）
+class DecimalNumbers(FloatNumbers):
+    name = "decimal"
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        self.context = Context(prec=precision, Emax=MAX_EMAX, Emin=MIN_EMIN,
+                               traps=[InvalidOperation, DivisionByZero, Overflow])
+
+    def parse(self, text):
+        if "/" in text:
+            numerator, denominator = text.split("/")
+            return self._checked(self.context.divide, Decimal(numerator), Decimal(denominator))
+        return self.context.create_decimal(text)
+
+    # 桁数が precision に収まる数はそのまま、大きすぎる・小さすぎる数は指数表記
+    def format(self, value):
+        value = value.normalize(self.context)
+        if value.is_zero():
+            return "0"
+        if -7 < value.adjusted() < self.precision:
+            return format(value, "f")
+        return str(value)
+
+    # 計算できなかったときの例外をまとめて CalcError にし、結果が無限大なら Error にする
+    def _checked(self, function, *args):
+        try:
+            result = function(*args)
+        except (DecimalException, ValueError) as err:
+            raise CalcError(str(err)) from err
+        if not result.is_finite():  # 0の負の数乗・0以下の対数など
+            raise CalcError("計算結果が無限大")
+        return result
+
+    def binary(self, op, a, b):
+        ctx = self.context
+        operations = {
+            "+": ctx.add,
+            "-": ctx.subtract,
+            "*": ctx.multiply,
+            "/": ctx.divide,
+            "**": ctx.power,
+            "^": ctx.power,
+        }
+        return self._checked(operations[op], a, b)
+
+    def unary(self, name, x):
+        ctx = self.context
+        if name in ("√", "sqrt"):
+            return self._checked(ctx.sqrt, x)
+        if name == "log10":
+            if x <= 0:
+                raise CalcError("0以下の対数")
+            return self._checked(ctx.log10, x)
+        if name in ("1/x", "inv"):
+            return self._checked(ctx.divide, 1, x)
+        if name in ("x²", "²"):
+            return self._checked(ctx.power, x, 2)
+        if name in ("x³", "³"):
+            return self._checked(ctx.power, x, 3)
+        if name in ("10ˣ", "exp10"):
+            return self._checked(ctx.power, 10, x)
+        if name == "%":
+            return self._checked(ctx.divide, x, 100)
+        return self._checked(self._factorial, x)
+
+    # 小さい n は正確な値を丸め、大きい n は log10(n!) から求める（全桁は作らない）
+    def _factorial(self, x):
+        n = factorial_argument(x)
+        if n <= EXACT_FACTORIAL_N:
+            return self.context.plus(Decimal(exact_factorial(n)))
+        return self.context.power(10, log10_factorial(n, self.precision + 10))
+
+    def pi(self):
+        return decimal_pi(self.precision)
+
+    def display_unary(self, name, text):
+        return self.format(self.unary(name, self.parse(text)))
+
+
+# 分数 Fraction（四則演算と整数乗は正確）
+class FractionNumbers(DecimalNumbers):
+    name = "fraction"
+    max_bits = 100000  # 整数乗の結果の大きさの上限（10^(10^7) などで固まらないように）
+
+    def parse(self, text):
+        try:
+            return Fraction(text)
+        except ValueError:
+            return Fraction(self.context.create_decimal(text))
+
+    # 整数・有限小数はそのまま、それ以外は "分子/分母"（長すぎれば precision 桁の小数で近似）
+    def format(self, value):
+        numerator, denominator = value.numerator, value.denominator
+        if max(numerator.bit_length(), denominator.bit_length()) * 0.302 > EXACT_DISPLAY_DIGITS:  # 0.302 ≒ log10(2)
+            return super().format(self._approximate_decimal(value))
+        d = denominator
+        for p in (2, 5):
+            while d % p == 0:
+                d //= p
+        if d == 1:  # 有限小数
+            with localcontext() as ctx:
+                ctx.prec = EXACT_DISPLAY_DIGITS * 2
+                return format((Decimal(numerator) / denominator).normalize(), "f")
+        return f"{numerator}/{denominator}"
+
+    # 何十万桁もの分子・分母をそのまま Decimal にすると数秒かかるので、
+    # precision 桁より十分長い上位のビットだけを残して割り、切り捨てた分は 2 の累乗を掛けて戻す
+    def _approximate_decimal(self, value):
+        bits = (self.precision + 10) * 4  # 4 > log2(10)
+        numerator_shift = max(abs(value.numerator).bit_length() - bits, 0)
+        denominator_shift = max(value.denominator.bit_length() - bits, 0)
+        with localcontext(self.context) as ctx:
+            ctx.prec = self.precision + 10  # 途中は多めの桁で計算し、最後に precision 桁に丸める
+            result = Decimal(value.numerator >> numerator_shift) / Decimal(value.denominator >> denominator_shift)
+            if numerator_shift != denominator_shift:
+                result *= Decimal(2) ** (numerator_shift - denominator_shift)
+        return self.context.plus(result)
+
+    # 無理数になるかもしれない計算は、Decimal で計算して分数にする
+    def _approximate(self, name, *args):
+        decimals = [self._approximate_decimal(v) for v in args]
+        if name in ("**", "^"):
+            return Fraction(DecimalNumbers.binary(self, name, *decimals))
+        return Fraction(DecimalNumbers.unary(self, name, *decimals))
+
+    def _power(self, a, b):
+        if b.denominator != 1:
+            return self._approximate("^", a, b)
+        if a == 0 and b < 0:
+            raise CalcError("0の負の数乗")
+        if abs(b) * max(a.numerator.bit_length(), a.denominator.bit_length()) > self.max_bits:
+            raise CalcError("計算結果が大きすぎます")
+        return a ** int(b)
+
+    def binary(self, op, a, b):
+        if op == "+":
+            return a + b
+        if op == "-":
+            return a - b
+        if op == "*":
+            return a * b
+        if op == "/":
+            if b == 0:
+                raise CalcError("0除算")
+            return a / b
+        return self._power(a, b)
+
+    def unary(self, name, x):
+        if name in ("√", "sqrt"):
+            if x < 0:
+                raise CalcError("負の数の平方根")
+            root_n, root_d = math.isqrt(x.numerator), math.isqrt(x.denominator)
+            if root_n * root_n == x.numerator and root_d * root_d == x.denominator:
+                return Fraction(root_n, root_d)
+            return self._approximate(name, x)
+        if name == "log10":
+            if x <= 0:
+                raise CalcError("0以下の対数")
+            for value, sign in ((x, 1), (1 / x, -1)):
+                exponent = _power_of_ten(value.numerator) if value.denominator == 1 else None
+                if exponent is not None:
+                    return Fraction(sign * exponent)
+            return self._approximate(name, x)
+        if name in ("1/x", "inv"):
+            return self.binary("/", Fraction(1), x)
+        if name in ("x²", "²"):
+            return x * x
+        if name in ("x³", "³"):
+            return x * x * x
+        if name in ("10ˣ", "exp10"):
+            return self._power(Fraction(10), x)
+        if name == "%":
+            return x / 100
+        # x! は小さい n だけ正確な値、大きい n は decimal と同じく log10(n!) からの近似
+        if x > EXACT_FACTORIAL_N:
+            return Fraction(self._checked(self._factorial, x))
+        try:
+            return Fraction(exact_factorial(x))
+        except ValueError as err:
+            raise CalcError(str(err)) from err
+
+    def pi(self):
+        return Fraction(decimal_pi(self.precision))
+
+    # 大きい n の x! は、何十万桁の分数を作らずに近似の Decimal をそのまま表示する
+    def display_unary(self, name, text):
+        if name == "x!":
+            x = self.parse(text)
+            if x > EXACT_FACTORIAL_N:
+                return DecimalNumbers.format(self, self._checked(self._factorial, x))
+        return super().display_unary(name, text)
+
+
+BACKENDS = {
+    "float": FloatNumbers,
+    "decimal": DecimalNumbers,
+    "fraction": FractionNumbers,
+}
+
+
+# 名前からバックエンドを作る（decimal と fraction は precision 桁）
+def get_numbers(name="float", precision=DEFAULT_PRECISION):
+    if name == "float":
+        return FloatNumbers()
+    return BACKENDS[name](precision)
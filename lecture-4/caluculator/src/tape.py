@@ -0,0 +1,58 @@
+# 電卓の計算テープ（押したキーを順に記録したもの）
+# キーは KEYS の番号にして array('B') に1バイトずつ追記するので、長い操作でも小さい
+# 記録したキーをもう一度押せば（keypad.replay）同じ計算をやり直せる
+import csv
+from array import array
+
+# 電卓のキー（番号 = KEYS の位置。記録したテープが読めなくならないよう、追加は末尾に）
+KEYS = (
+    "0", "1", "2", "3", "4", "5", "6", "7", "8", "9", ".",
+    "+", "-", "*", "/", "=", "%", "+/-", "AC",
+    "π", "√", "1/x", "x²", "x³", "xʸ", "10ˣ", "log10", "x!",
+)
+KEY_CODES = {key: code for code, key in enumerate(KEYS)}
+
+
+class CalculationTape:
+    __slots__ = ("codes",)
+
+    def __init__(self, keys=()):
+        self.codes = array('B', [KEY_CODES[key] for key in keys])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def append(self, key):
+        self.codes.append(KEY_CODES[key])
+
+    # 最後のキーを取り消して返す
+    def pop(self):
+        return KEYS[self.codes.pop()]
+
+    def keys(self):
+        return [KEYS[code] for code in self.codes]
+
+    def to_bytes(self):
+        return self.codes.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        tape = cls()
+        tape.codes.frombytes(data)
+        return tape
+
+
+# 回帰テスト用の操作の記録（1行1回分: 数の表し方, 押したキー（空白区切り）, 最後の表示）
+SESSION_FIELDS = ("numbers", "keys", "result")
+
+
+def write_sessions(fp, sessions):
+    writer = csv.writer(fp, lineterminator="\n")
+    writer.writerow(SESSION_FIELDS)
+    for numbers, tape, result in sessions:
+        writer.writerow((numbers, " ".join(tape.keys()), result))
+
+
+# write_sessions で書いたものを (数の表し方, テープ, 最後の表示) のリストにする
+def read_sessions(fp):
+    return [(row["numbers"], CalculationTape(row["keys"].split()), row["result"]) for row in csv.DictReader(fp)]
@@ -0,0 +1,42 @@
+# 一括計算モード（batch.py）のテスト
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from batch import VectorizedExpression, evaluate_batch
+from engine import ERROR, compile_expression
+
+
+def test_function_call_marks_errors():
+    values, errors = evaluate_batch("sqrt(x) + log10(x)", x=np.array([-1.0, 0.0, 100.0]))
+    assert list(errors) == [True, True, False]
+    assert values[2] == 12.0
+    assert np.isnan(values[:2]).all()
+
+
+def test_unknown_node_is_rejected():
+    Other = namedtuple("Other", ["name"])
+    with pytest.raises(TypeError):
+        VectorizedExpression("?", Other("x"))(x=np.array([1.0]))
+
+
+# Error の位置と値が1件ずつの計算（コンパイル済みの式）と同じか
+@pytest.mark.parametrize("text", ["x^3 + 10^x", "√x * 2 - 1/x", "log10(x) + x² / 3", "(x + 1) * (x - 1) / 4%",
+                                  "x! / 6 + π", "inv(x) + exp10(1) - x³"])
+def test_vectorized_matches_scalar(text):
+    values = np.linspace(-2.0, 6.0, 161)
+    results = compile_expression(text).evaluate_many([(v,) for v in values.tolist()])  # 電卓と同じく float で
+    vector_values, errors = evaluate_batch(text, x=values)
+    assert errors.tolist() == [r is ERROR for r in results]
+    expected = np.array([np.nan if r is ERROR else float(r) for r in results])
+    assert np.allclose(vector_values[~errors], expected[~errors], rtol=1e-12)
+
+
+# 電卓で Error になる値（負の数・0・あふれる数）も1件ずつの計算と同じ位置が Error になるか
+@pytest.mark.parametrize("text", ["√x", "log10(x)", "1/x", "inv(x)", "x! / 6", "x^0.5", "0^x", "x²", "10^x", "1/(x - 1)"])
+def test_vectorized_errors_match_scalar(text):
+    edge = [-2.0, -0.5, 0.0, 0.5, 1.0, 3.0, 200.0, 1e200]
+    expected = compile_expression(text).evaluate_many([(v,) for v in edge])
+    _, errors = evaluate_batch(text, x=np.array(edge))
+    assert errors.tolist() == [r is ERROR for r in expected]
@@ -0,0 +1,48 @@
+# 式のコンパイル（engine.py）のテスト（速さの比較は bench.py engine）
+import random
+
+import pytest
+
+from engine import ERROR, compile_expression, evaluate_tree, parse
+
+# 電卓のボタンを一通り使う式
+EXPRESSIONS = [
+    "x^3 + 10^x",
+    "√x * 2 - 1/x",
+    "log10(x) + x² / 3",
+    "(x + 1) * (x - 1) / 4%",
+    "x! / 6 + π",
+    "inv(x) + exp10(1) - x³",
+]
+
+
+def tree_result(tree, variables):
+    try:
+        return evaluate_tree(tree, variables)
+    except Exception:
+        return ERROR
+
+
+def same(result, expected):
+    return result == expected or result != result and expected != expected  # nan どうし
+
+
+# コンパイル済みの式と構文木の評価で結果が同じか
+@pytest.mark.parametrize("text", EXPRESSIONS)
+def test_compiled_matches_tree(text):
+    rng = random.Random(0)
+    values = [rng.uniform(0.5, 5.0) if i % 7 else float(rng.randint(1, 6)) for i in range(500)]
+    values += [-2.0, 0.0, 200.0]
+    tree = parse(text)
+    results = compile_expression(text).evaluate_many([(v,) for v in values])
+    for v, result in zip(values, results):
+        assert result == tree_result(tree, {"x": v}), (v, result)
+
+
+# あふれた数（inf になる）を書いた式でも、コンパイル済みと構文木の評価が同じか
+@pytest.mark.parametrize("text", ["1e999", "x + 1e400", "-1e999 * x", "1e999 - 1e999", "x / 1e999"])
+@pytest.mark.parametrize("v", [0.0, 2.0])
+def test_overflowing_literals_match_tree(text, v):
+    expected = tree_result(parse(text), {"x": v})
+    result = compile_expression(text).evaluate_many([(v,)] if "x" in text else [()])[0]
+    assert same(result, expected), (result, expected)
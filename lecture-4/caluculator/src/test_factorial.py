@@ -0,0 +1,27 @@
+# x! の計算（factorial.py）のテスト（速さの比較は bench.py factorial）
+import math
+
+import pytest
+
+from factorial import FactorialCache, display_factorial
+
+
+# 覚えている近くの n! からの差分で求めても、math.factorial と同じ値になる
+def test_cache_builds_from_nearby_factorial():
+    n = 5000
+    cache = FactorialCache()
+    cache.factorial(n)
+    for neighbour in (n + 1, n + 10, n - 1, n + n // 10):
+        assert cache.factorial(neighbour) == math.factorial(neighbour), neighbour
+    assert cache.misses == 1 and cache.incremental == 4
+
+
+# 指数と仮数の先頭の桁が正確な値と合っているか
+@pytest.mark.parametrize("n", [100, 1000, 10000])
+def test_display_matches_exact_digits(n):
+    exact = math.factorial(n)
+    mantissa, exponent = display_factorial(n).split("e+")
+    exponent = int(exponent)
+    assert 10 ** exponent <= exact < 10 ** (exponent + 1)
+    leading = exact // 10 ** (exponent - 9)  # 先頭の10桁
+    assert abs(leading - int(mantissa.replace(".", ""))) <= 1
@@ -0,0 +1,69 @@
+# 数の表し方（numeric.py）のテスト（時間の比較は bench.py numeric）
+import time
+from decimal import Decimal, localcontext
+from fractions import Fraction
+
+import pytest
+
+from engine import CalcError
+from keypad import Keypad
+from numeric import get_numbers
+
+BACKENDS = ("float", "decimal", "fraction")
+
+
+@pytest.mark.parametrize("name", BACKENDS)
+@pytest.mark.parametrize("n", ["1001", "99999", "100001", "10000000"])
+def test_large_factorial_is_approximated_quickly(name, n):
+    numbers = get_numbers(name)
+    start = time.perf_counter()
+    display = numbers.display_unary("x!", n)
+    assert time.perf_counter() - start < 0.1
+    assert "e+" in display.lower()
+
+
+def test_large_factorial_agrees_across_backends():
+    float_display = get_numbers("float").display_unary("x!", "99999")
+    for name in ("decimal", "fraction"):
+        assert get_numbers(name).display_unary("x!", "99999").startswith("2.824229407")
+    assert float_display == "2.824229408e+456568"
+
+
+@pytest.mark.parametrize("name", BACKENDS)
+@pytest.mark.parametrize("n", ["-3", "2.5", "1001.5"])
+def test_factorial_of_non_integer_is_error(name, n):
+    with pytest.raises(CalcError):
+        get_numbers(name).display_unary("x!", n)
+
+
+def test_fraction_small_factorial_is_exact():
+    numbers = get_numbers("fraction")
+    assert numbers.display_unary("x!", "20") == "2432902008176640000"
+    assert numbers.unary("x!", numbers.parse("30")) == 265252859812191058636308480000000
+
+
+def test_fraction_keeps_working_after_large_factorial():
+    keypad = Keypad(get_numbers("fraction"))
+    for key in ("9", "9", "9", "9", "9", "x!", "+", "1"):
+        keypad.press(key)
+    start = time.perf_counter()
+    assert keypad.press("=") == "2.824229407960347874293421578E+456568"
+    assert time.perf_counter() - start < 2
+
+
+@pytest.mark.parametrize("value", [Fraction(7, 3 ** 500), Fraction(2 ** 4000 + 1, 3 ** 900), Fraction(-(10 ** 300) - 7, 11)])
+def test_fraction_approximate_decimal_rounds_like_exact_division(value):
+    numbers = get_numbers("fraction")
+    with localcontext(numbers.context):
+        exact = Decimal(value.numerator) / Decimal(value.denominator)
+    assert numbers._approximate_decimal(value) == exact
+
+
+# 0.1 を足し続けても decimal・fraction では誤差がたまらない
+@pytest.mark.parametrize("name", ["decimal", "fraction"])
+def test_adding_tenths_is_exact(name):
+    numbers = get_numbers(name)
+    display = "0"
+    for _ in range(1000):
+        display = numbers.format(numbers.binary("+", numbers.parse(display), numbers.parse("0.1")))
+    assert display == "100"
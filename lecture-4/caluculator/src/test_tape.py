@@ -0,0 +1,57 @@
+# 計算テープ（tape.py）と押し直し・取り消し（keypad.py）のテスト（速さは bench.py tape）
+import io
+import random
+
+import pytest
+
+from keypad import Keypad
+from numeric import get_numbers
+from tape import KEYS, CalculationTape, read_sessions, write_sessions
+
+
+# ランダムな電卓の操作（1〜3桁の数とキーを交互に押す）
+def random_session(rng, length):
+    keys = []
+    while len(keys) < length:
+        keys.extend(rng.choice(KEYS[:11]) for _ in range(rng.randint(1, 3)))
+        keys.append(rng.choice(KEYS[11:]))
+    return keys
+
+
+# 記録した操作を CSV に書いて読み直し、押し直すと最後の表示が記録と同じになる
+@pytest.mark.parametrize("name", ["float", "decimal", "fraction"])
+def test_replay_matches_recorded_display(name):
+    rng = random.Random(0)
+    sessions = []
+    for _ in range(100):
+        keypad = Keypad(get_numbers(name))
+        for key in random_session(rng, rng.randint(10, 40)):
+            keypad.press(key)
+        sessions.append((name, keypad.tape, keypad.display))
+    buffer = io.StringIO()
+    write_sessions(buffer, sessions)
+    buffer.seek(0)
+    for _, tape, result in read_sessions(buffer):
+        assert Keypad(get_numbers(name)).replay(tape.keys()) == result, tape.keys()
+
+
+def test_undo_steps_back_through_the_tape():
+    keys = random_session(random.Random(1), 40)
+    keypad = Keypad()
+    for key in keys:
+        keypad.press(key)
+    expected = [Keypad().replay(keys[:i]) for i in range(len(keys) - 1, -1, -1)]
+    assert [keypad.undo() for _ in keys] == expected
+    assert len(keypad.tape) == 0
+
+
+def test_export_csv_writes_one_row_per_key():
+    keys = random_session(random.Random(1), 40)
+    keypad = Keypad(display="0")
+    keypad.tape = CalculationTape(keys)
+    out = io.StringIO()
+    keypad.export_csv(out)
+    lines = out.getvalue().splitlines()
+    assert lines[0] == "step,key,display"
+    assert len(lines) == len(keys) + 1
+    assert lines[-1].split(",")[-1] == Keypad().replay(keys)
@@ -0,0 +1,786 @@
+# 性能測定用スクリプト
+# 使い方: python bench.py <対象> （対象は BENCHMARKS を参照）
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import flet as ft
+import requests
+from flet.core.local_connection import LocalConnection
+from flet.core.protocol import ClientActions, ClientMessage, CommandEncoder, PageCommandsBatchResponsePayload
+
+from db import WeatherDB
+from http_cache import HTTPCache
+from click_pipeline import LatestClickPipeline
+from forecast_data import ForecastCache, ParsedForecast, cached_parsed_forecast, extract_weekly_report, fetch_parsed_forecast
+from forecast_parser import iter_bundle, iter_weekly_forecasts, weekly_forecasts
+from prefetch import prefetch_all
+from regions import RegionStore, load_region_data, parse_region_data
+from weather_render import build_weather_render, create_weather_display, get_weather_render
+from forecast_cards import ForecastGrid, format_age
+from sidebar import RegionSidebar
+from weather_code import CODE_TO_TEXT, WEATHER_COLORS
+from stub_jma import StubJMAServer, sample_area_info, sample_area_json, sample_daily_list, sample_forecast_json
+
+
+# 旧実装と同じく、呼び出しごとに接続を開き直すWeatherDB（読み込みのキャッシュもなし）
+class ConnectPerCallDB(WeatherDB):
+    def __init__(self, db_name):
+        super().__init__(db_name, cache_size=0)
+
+    def _get_conn(self):
+        conn = sqlite3.connect(self.db_name)
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    _writer = _get_conn
+
+
+# 1クリック分(保存+最新取得)の平均時間をミリ秒で返す
+def measure_clicks(db, clicks):
+    office_codes = [f"{130000 + i * 10:06d}" for i in range(20)]
+    start = time.perf_counter()
+    for i in range(clicks):
+        code = office_codes[i % len(office_codes)]
+        db.save_weather_report(sample_area_info(code), sample_daily_list(i))
+        db.get_latest_forecast(code)
+    return (time.perf_counter() - start) / clicks * 1000
+
+
+def bench_db(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label, cls in (("before (接続を毎回作成)", ConnectPerCallDB), ("after (接続プール+WAL)", WeatherDB)):
+            db = cls(os.path.join(tmp, f"{cls.__name__}.db"))
+            db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+            results[label] = measure_clicks(db, args.clicks)
+            db.close()
+        for label, ms in results.items():
+            print(f"{label}: {ms:.3f} ms/click")
+
+
+def bench_bulk(args):
+    office_count = args.offices
+
+    def reports():
+        for i in range(office_count):
+            yield sample_area_info(f"{i:06d}"), sample_daily_list(i)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WeatherDB(os.path.join(tmp, "bulk.db"))
+        db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+        start = time.perf_counter()
+        saved = db.save_weather_reports_bulk(reports())
+        elapsed = time.perf_counter() - start
+        db.close()
+    rows = saved * 7
+    print(f"{saved} 地域 / {rows} 日別行: {elapsed:.3f} s ({rows / elapsed:,.0f} rows/s, {saved / elapsed:,.0f} offices/s)")
+
+
+def table_count(db, table):
+    return db._get_conn().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def bench_dedup(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WeatherDB(os.path.join(tmp, "dedup.db"))
+        db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+        area_info = sample_area_info("130010")
+        area_info['report_datetime'] = "2026-01-01T11:00:00+09:00"
+
+        # 毎回内容が変わる場合（通常の挿入）
+        start = time.perf_counter()
+        for i in range(args.clicks):
+            db.save_weather_report(dict(area_info, report_datetime=f"gen-{i}"), sample_daily_list(i))
+        insert_ms = (time.perf_counter() - start) / args.clicks * 1000
+        rows_after_insert = table_count(db, "daily_forecasts")
+
+        # 同じ発表を何度も保存する場合（重複判定で書き込みを省略）
+        daily_list = sample_daily_list(0)
+        db.save_weather_report(area_info, daily_list)
+        rows_before = table_count(db, "daily_forecasts")
+        start = time.perf_counter()
+        for _ in range(args.clicks):
+            db.save_weather_report(area_info, daily_list)
+        dedup_ms = (time.perf_counter() - start) / args.clicks * 1000
+        rows_after = table_count(db, "daily_forecasts")
+        db.close()
+    print(f"full insert: {insert_ms:.3f} ms/save (daily_forecasts {rows_after_insert} 行)")
+    print(f"dedup skip : {dedup_ms:.3f} ms/save (daily_forecasts {rows_before} -> {rows_after} 行)")
+
+
+def bench_compact(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WeatherDB(os.path.join(tmp, "compact.db"))
+        db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+        # 50地域 x 1日4回 x 240日分の履歴を作り、保存日時を過去にずらす
+        areas, per_day, days = 50, 4, 240
+        db.save_weather_reports_bulk(
+            (sample_area_info(f"{a:06d}"), sample_daily_list(g))
+            for g in range(per_day * days) for a in range(areas)
+        )
+        conn = db._get_conn()
+        conn.execute("""
+            UPDATE forecasts SET datetime = datetime('now', 'localtime',
+                '-' || ((forecast_id - 1) / :areas / :per_day) || ' days',
+                '-' || ((forecast_id - 1) / :areas % :per_day) || ' hours')
+        """, {'areas': areas, 'per_day': per_day})
+        conn.commit()
+        before = table_count(db, "daily_forecasts")
+        start = time.perf_counter()
+        stats = db.compact_history(keep_all_days=7, keep_months=6, batch_size=args.batch)
+        elapsed = time.perf_counter() - start
+        after = table_count(db, "daily_forecasts")
+        db.close()
+    print(f"daily_forecasts {before} -> {after} 行 ({elapsed:.3f} s)")
+    for key, value in stats.items():
+        print(f"  {key}: {value}")
+
+
+# get_latest_forecast の実行計画を表示する（索引を使っているかは test_db_plan.py で確かめる）
+def print_latest_plan(db):
+    conn = db._get_conn()
+    for row in conn.execute("EXPLAIN QUERY PLAN " + WeatherDB.LATEST_FORECAST_SQL, ("000000",)):
+        print(f"  {row[3]}")
+
+
+def measure_latest(db, area_count, reads):
+    start = time.perf_counter()
+    for i in range(reads):
+        db.get_latest_forecast(f"{i % area_count:06d}")
+    return (time.perf_counter() - start) / reads * 1000
+
+
+def bench_plan(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WeatherDB(os.path.join(tmp, "plan.db"), cache_size=0)  # SQLそのものを測る
+        db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+        print("実行計画:")
+        print_latest_plan(db)
+
+        # 200地域分の履歴で日別予報を --rows 行作る
+        area_count = 200
+        generations = args.rows // 7 // area_count
+        db.save_weather_reports_bulk(
+            (sample_area_info(f"{a:06d}"), sample_daily_list(g))
+            for g in range(generations) for a in range(area_count)
+        )
+        print(f"daily_forecasts: {table_count(db, 'daily_forecasts')} 行")
+        print_latest_plan(db)
+        after_ms = measure_latest(db, area_count, args.clicks)
+
+        # 以前の単一列索引に戻して比較する
+        conn = db._get_conn()
+        conn.execute("DROP INDEX idx_forecasts_area_forecast")
+        conn.execute("DROP INDEX idx_daily_forecasts_forecast_date")
+        conn.execute("CREATE INDEX idx_forecasts_area_id ON forecasts(area_id)")
+        conn.execute("CREATE INDEX idx_daily_forecasts_forecast_id ON daily_forecasts(forecast_id)")
+        conn.commit()
+        before_ms = measure_latest(db, area_count, args.clicks)
+        db.close()
+    print(f"before (単一列索引): {before_ms:.3f} ms/read")
+    print(f"after  (複合・カバリング索引): {after_ms:.3f} ms/read")
+
+
+def bench_http(args):
+    with StubJMAServer(delay=args.delay) as server:
+        codes = [f"{130000 + i * 10:06d}" for i in range(args.clicks)]
+
+        # 旧実装: 毎回 requests.get（新しい接続、タイムアウトなし）
+        start = time.perf_counter()
+        for code in codes:
+            requests.get(server.forecast_url.format(code=code)).json()
+        bare_ms = (time.perf_counter() - start) / len(codes) * 1000
+
+        # 共有セッション（keep-alive で接続を再利用）
+        client = server.client()
+        start = time.perf_counter()
+        for code in codes:
+            client.fetch_forecast(code)
+        session_ms = (time.perf_counter() - start) / len(codes) * 1000
+        client.close()
+    print(f"requests.get  : {bare_ms:.3f} ms/fetch")
+    print(f"JMAClient     : {session_ms:.3f} ms/fetch")
+
+
+def bench_cache(args):
+    with StubJMAServer(delay=args.delay) as server, tempfile.TemporaryDirectory() as tmp:
+        codes = [f"{130000 + i * 10:06d}" for i in range(20)]
+        results = {}
+        for label, cache in (
+            ("キャッシュなし", None),
+            ("ttl=0 (毎回 304 で再検証)", HTTPCache(os.path.join(tmp, "revalidate.db"), ttl=0)),
+            ("ttl=600 (期限内は通信なし)", HTTPCache(os.path.join(tmp, "fresh.db"), ttl=600)),
+        ):
+            client = server.client(cache=cache)
+            server.requests = 0
+            start = time.perf_counter()
+            for i in range(args.clicks):
+                client.fetch_forecast(codes[i % len(codes)])
+            elapsed_ms = (time.perf_counter() - start) / args.clicks * 1000
+            stats = dict(cache.stats) if cache else {}
+            results[label] = (elapsed_ms, server.requests, stats)
+            client.close()
+    for label, (ms, sent, stats) in results.items():
+        print(f"{label}: {ms:.3f} ms/fetch, サーバへの要求 {sent} 回 {stats}")
+
+
+def bench_startup(args):
+    # 起動時に地域リストが用意できるまでの時間（ここでサイドバーを描ける）
+    with StubJMAServer(delay=args.delay) as server, tempfile.TemporaryDirectory() as tmp:
+        store = RegionStore(os.path.join(tmp, "region_data.json"))
+        client = server.client()
+        results = []
+        for label in ("cold (保存なし、area.json を待つ)", "warm (保存済み、裏で更新)"):
+            start = time.perf_counter()
+            region_data = load_region_data(client, store)
+            results.append((label, (time.perf_counter() - start) * 1000, len(region_data)))
+        client.close()
+    for label, ms, centers in results:
+        print(f"{label}: {ms:.2f} ms ({centers} 地方)")
+
+
+def bench_prefetch(args):
+    # 遅延なしでは差が出ないので、指定がなければ往復 50ms を再現する
+    with StubJMAServer(delay=args.delay or 0.05) as server, tempfile.TemporaryDirectory() as tmp:
+        region_data = parse_region_data(sample_area_json())
+        for concurrency in (1, 8, 32):
+            db = WeatherDB(os.path.join(tmp, f"prefetch{concurrency}.db"))
+            db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+            client = server.client()
+            # 先読みの途中で別の地域をクリックして保存するのにかかる時間
+            click_ms = []
+
+            def click():
+                start = time.perf_counter()
+                db.save_weather_report(sample_area_info("999999"), sample_daily_list(0))
+                click_ms.append((time.perf_counter() - start) * 1000)
+
+            clicker = threading.Timer(0.2, click)
+            clicker.start()
+            stats = prefetch_all(client, db, region_data, concurrency=concurrency, per_second=args.rate)
+            clicker.join()
+            client.close()
+            # 先読み後のクリックはDB読み込みだけ
+            code = stats['office_codes'][0]
+            start = time.perf_counter()
+            db.get_latest_forecast(code)
+            read_ms = (time.perf_counter() - start) * 1000
+            db.close()
+            print(f"concurrency={concurrency:2d}: {stats['seconds']:.3f} s "
+                  f"({len(stats['office_codes'])} 地域, エラー {len(stats['errors'])}), "
+                  f"先読み中の保存 {click_ms[0]:.3f} ms, 先読み後のクリック {read_ms:.3f} ms")
+
+
+def bench_click(args):
+    # 連続クリックでイベント処理が止まる時間（ハンドラの実行時間）を比べる
+    with StubJMAServer(delay=args.delay or 0.05) as server, tempfile.TemporaryDirectory() as tmp:
+        db = WeatherDB(os.path.join(tmp, "click.db"))
+        db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+        client = server.client()
+        codes = [f"{130000 + i * 10:06d}" for i in range(args.clicks)]
+
+        def load(code, cancel=None):
+            report_datetime, daily_list = extract_weekly_report(client.fetch_forecast(code, cancel), code)
+            area_info = dict(sample_area_info(code), report_datetime=report_datetime)
+            db.save_weather_report(area_info, daily_list)
+            return db.get_latest_forecast(code)
+
+        # 旧実装: ハンドラの中で通信からDB読み込みまで行う
+        sync_stalls = []
+        for code in codes:
+            start = time.perf_counter()
+            load(code)
+            sync_stalls.append((time.perf_counter() - start) * 1000)
+
+        # パイプライン: ハンドラは処理を渡すだけ。最後のクリックの結果だけが反映される
+        pipeline = LatestClickPipeline()
+        shown = []
+        done = threading.Event()
+
+        @pipeline.instrument
+        def handler(code):
+            token = pipeline.begin()
+            pipeline.run(token, lambda cancel: load(code, cancel),
+                         lambda rows: (shown.append(code), done.set()), lambda err: done.set())
+
+        for code in codes:
+            handler(code)
+        done.wait(10)
+        time.sleep(0.2)  # 取り消された処理が終わるのを待つ
+        stats = pipeline.stats()
+        pipeline.shutdown()
+        client.close()
+        db.close()
+    print(f"同期ハンドラ    : 平均 {sum(sync_stalls) / len(sync_stalls):.3f} ms, 最大 {max(sync_stalls):.3f} ms/click")
+    print(f"パイプライン    : 平均 {stats['avg_stall_ms']:.3f} ms, 最大 {stats['max_stall_ms']:.3f} ms/click, "
+          f"捨てた結果 {stats['discarded']} 件, 表示したクリック {shown}")
+
+
+def bench_render(args):
+    codes = list(CODE_TO_TEXT.keys())
+    cards = [codes[i % len(codes)] for i in range(args.cards)]
+
+    # 旧実装: カードごとにキーワードを探し、短縮テキストを作り直す
+    start = time.perf_counter()
+    for code in cards:
+        render = build_weather_render(CODE_TO_TEXT[code])
+        create_weather_display(render)
+    scan_ms = (time.perf_counter() - start) * 1000
+
+    # 表引き: 起動時に作った表から引くだけ
+    start = time.perf_counter()
+    for code in cards:
+        render = get_weather_render(code)
+        create_weather_display(render)
+    table_ms = (time.perf_counter() - start) * 1000
+
+    # コントロール作成を除いた、表示情報を求める部分だけ
+    start = time.perf_counter()
+    for code in cards:
+        build_weather_render(CODE_TO_TEXT[code])
+    scan_only_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for code in cards:
+        get_weather_render(code)
+    lookup_only_ms = (time.perf_counter() - start) * 1000
+    print(f"{args.cards} 枚 (コントロール作成込み): キーワード走査 {scan_ms:.1f} ms, 表引き {table_ms:.1f} ms")
+    print(f"{args.cards} 枚 (表示情報のみ)        : キーワード走査 {scan_only_ms:.1f} ms, 表引き {lookup_only_ms:.2f} ms")
+
+
+# Flet のクライアントの代わりに、送られるはずのメッセージの大きさを数える接続
+def measuring_page():
+    class MeasuringConnection(LocalConnection):
+        def __init__(self):
+            super().__init__()
+            self.bytes_sent = 0
+
+        # flet_socket_server.FletSocketServer.send_commands と同じ処理で、送信の代わりに大きさを数える
+        def send_commands(self, session_id, commands):
+            results = []
+            messages = []
+            for command in commands:
+                result, message = self._process_command(command)
+                if command.name in ("add", "get"):
+                    results.append(result)
+                if message:
+                    messages.append(message)
+            if messages:
+                message = ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages)
+                self.bytes_sent += len(json.dumps(message, cls=CommandEncoder, separators=(",", ":")).encode("utf-8"))
+            return PageCommandsBatchResponsePayload(results=results, error="")
+
+    conn = MeasuringConnection()
+    return ft.Page(conn, "bench", asyncio.new_event_loop()), conn
+
+
+# 旧実装と同じく、カードを毎回作り直す
+def legacy_cards(rows):
+    cards = []
+    for date, render, min_t, max_t in rows:
+        cards.append(ft.Container(
+            padding=20, bgcolor=ft.Colors.WHITE, border_radius=15,
+            shadow=ft.BoxShadow(spread_radius=1, blur_radius=10, color=ft.Colors.BLUE_GREY_100),
+            content=ft.Column([
+                ft.Text(date, weight="bold"),
+                ft.Container(content=create_weather_display(render), height=80, alignment=ft.alignment.center),
+                ft.Text(render.short_text, size=13, weight="bold", text_align=ft.TextAlign.CENTER),
+                ft.Row([
+                    ft.Text(min_t, color=ft.Colors.BLUE, weight="bold"),
+                    ft.Text("/", color=ft.Colors.GREY),
+                    ft.Text(max_t, color=ft.Colors.RED, weight="bold"),
+                ], alignment=ft.MainAxisAlignment.CENTER)
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+        ))
+    return cards
+
+
+def bench_cards(args):
+    # 地域切り替えごとの7日分の表示内容
+    switches = []
+    for i in range(args.clicks):
+        switches.append([
+            (d['date'], get_weather_render(d['w_code']), f"{d['min_t']}℃", f"{d['max_t']}℃")
+            for d in sample_daily_list(i)
+        ])
+
+    results = {}
+    for label in ("before (毎回作り直し)", "after (カードを使い回し)"):
+        page, conn = measuring_page()
+        grid = ft.GridView(expand=True, runs_count=5, max_extent=220)
+        forecast_grid = ForecastGrid(grid) if label.startswith("after") else None
+        page.add(grid)
+        conn.bytes_sent = 0
+        start = time.perf_counter()
+        for rows in switches:
+            if forecast_grid is None:
+                grid.controls.clear()
+                grid.controls.extend(legacy_cards(rows))
+            else:
+                forecast_grid.show_forecasts(rows)
+            page.update()
+        elapsed_ms = (time.perf_counter() - start) / len(switches) * 1000
+        results[label] = (elapsed_ms, conn.bytes_sent / len(switches))
+    for label, (ms, sent) in results.items():
+        print(f"{label}: {ms:.3f} ms/切り替え, 送信 {sent:,.0f} bytes/切り替え")
+
+
+# 旧実装と同じく、全地域のタイルを起動時に作る
+def legacy_sidebar(region_data, on_click):
+    sidebar_controls = [ft.Container(padding=15, bgcolor=ft.Colors.BLUE_GREY_700, content=ft.Text("地域を選択", weight="bold", color=ft.Colors.WHITE, size=16))]
+    for center_name, office_list in region_data.items():
+        office_tiles = [
+            ft.ListTile(title=ft.Text(office["name"], color=ft.Colors.WHITE70), data=office["code"], on_click=on_click, bgcolor=ft.Colors.BLUE_GREY_800)
+            for office in office_list
+        ]
+        sidebar_controls.append(
+            ft.ExpansionTile(title=ft.Text(center_name, size=14, color=ft.Colors.WHITE), controls=office_tiles, collapsed_text_color=ft.Colors.WHITE, icon_color=ft.Colors.WHITE, bgcolor=ft.Colors.BLUE_GREY_900, dense=True)
+        )
+    return ft.Container(width=250, bgcolor=ft.Colors.BLUE_GREY_900, content=ft.ListView(controls=sidebar_controls, padding=0, spacing=0))
+
+
+def bench_sidebar(args):
+    region_data = parse_region_data(sample_area_json())
+    for label, build in (("before (全タイルを作成)", legacy_sidebar), ("after (展開時に作成)", RegionSidebar)):
+        page, conn = measuring_page()
+        start = time.perf_counter()
+        page.add(build(region_data, lambda e: None))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{label}: 起動時 {elapsed_ms:.2f} ms, 送信 {conn.bytes_sent:,} bytes")
+
+    # 展開時と検索時の追加分
+    sidebar = RegionSidebar(region_data, lambda e: None)
+    page, conn = measuring_page()
+    page.add(sidebar)
+    conn.bytes_sent = 0
+    tile = sidebar.center_tiles.controls[0]
+    sidebar._on_expand(ft.ControlEvent(target=tile.uid, name="change", data="true", control=tile, page=page))
+    print(f"  地方を1つ展開: 送信 {conn.bytes_sent:,} bytes")
+    start = time.perf_counter()
+    for i in range(1000):
+        sidebar._search_index.search(str(i % 10))
+    print(f"  前方一致検索: {(time.perf_counter() - start) * 1000:.3f} ms / 1000 回")
+
+
+# 旧実装: 地域ごとに週間予報の地域リストを先頭から探す（見つからなければ先頭）
+def legacy_weekly_report(response_data, office_code):
+    weekly_data = response_data[1]
+    time_series = weekly_data['timeSeries']
+    area_index = 0
+    for i, area in enumerate(time_series[0]['areas']):
+        if area['area']['code'] == office_code:
+            area_index = i
+            break
+    dates = time_series[0]['timeDefines']
+    weather_codes = time_series[0]['areas'][area_index]['weatherCodes']
+    temps_min = time_series[1]['areas'][area_index].get('tempsMin', [None] * len(dates))
+    temps_max = time_series[1]['areas'][area_index].get('tempsMax', [None] * len(dates))
+    daily_list = []
+    for i in range(len(dates)):
+        daily_list.append({'date': dates[i][:10], 'w_code': weather_codes[i], 'min_t': temps_min[i], 'max_t': temps_max[i]})
+    return weekly_data.get('reportDatetime'), daily_list
+
+
+# 読みに行くファイルの求め方と、取り出す地域が正しいかは test_forecast_data.py で確かめる
+def bench_areas(args):
+    # 1つのファイルに args.areas 地域が入った予報から、全地域の週間予報を取り出す
+    area_codes = [f"{n:06d}" for n in range(args.areas)]
+    response_data = sample_forecast_json(area_codes[0], area_codes)
+    lookups = area_codes * max(1, 2000 // len(area_codes))
+
+    start = time.perf_counter()
+    for code in lookups:
+        legacy_weekly_report(response_data, code)
+    scan_ms = (time.perf_counter() - start) * 1000
+
+    cache = ForecastCache()
+    start = time.perf_counter()
+    for code in lookups:
+        parsed = cache.get("000000", response_data)
+        parsed.weekly_report(code)
+    index_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{len(area_codes)} 地域のファイルから {len(lookups)} 回: 線形探索 {scan_ms:.1f} ms, 索引 {index_ms:.1f} ms"
+          f" (解析 {cache.misses} 回, 再利用 {cache.hits} 回)")
+
+
+# 本物の予報JSONと同じくらいの大きさにするため、今日・明日の予報（風・波・降水確率・気温）も入れる
+def sample_full_forecast_json(office_code, area_codes, seed=0):
+    data = sample_forecast_json(office_code, area_codes, seed)
+    base = datetime(2026, 1, 1, 5, 0)
+    hours = [(base + timedelta(hours=6 * i)).strftime("%Y-%m-%dT%H:%M:%S+09:00") for i in range(6)]
+    class10s = [f"{code[:5]}{n}" for code in area_codes for n in range(4)]
+    data[0]["timeSeries"] = [
+        {"timeDefines": hours[:3], "areas": [{
+            "area": {"name": f"細分{code}", "code": code},
+            "weatherCodes": ["100", "101", "200"],
+            "weathers": ["晴れ　時々　くもり", "くもり　夜　雨", "雨　所により　雪"],
+            "winds": ["北の風　やや強く", "北西の風", "西の風　海上　では　強く"],
+            "waves": ["２メートル　うねり　を伴う", "１．５メートル", "１メートル"],
+        } for code in class10s]},
+        {"timeDefines": hours, "areas": [{"area": {"name": f"細分{code}", "code": code},
+                                          "pops": ["10", "20", "30", "40", "50", "60"]} for code in class10s]},
+        {"timeDefines": hours[:4], "areas": [{"area": {"name": f"地点{code}", "code": code},
+                                              "temps": ["1", "9", "2", "10"]} for code in class10s]},
+    ]
+    data[1]["tempAverage"] = {"areas": [{"area": {"name": "平年", "code": "00000"}, "min": "1.0", "max": "9.0"}]}
+    data[1]["precipAverage"] = {"areas": [{"area": {"name": "平年", "code": "00000"}, "min": "5", "max": "20"}]}
+    return data
+
+
+# 旧実装の読み方: ファイル全体を読み込み、日付は1日ごとに fromisoformat し直す
+def legacy_parse_file(body):
+    response_data = json.loads(body)
+    results = []
+    for area in response_data[1]['timeSeries'][0]['areas']:
+        report_datetime, daily_list = legacy_weekly_report(response_data, area['area']['code'])
+        for day, time_str in zip(daily_list, response_data[1]['timeSeries'][0]['timeDefines']):
+            day['time'] = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
+        results.append((report_datetime, daily_list))
+    return results
+
+
+def measure_parse(run):
+    start = time.perf_counter()
+    run()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    tracemalloc.start()
+    results = run()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_ms, peak, retained, len(results)
+
+
+def bench_parse(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        # キャッシュ済みの予報JSONの集まり（1ファイルに1〜3地域）と、それを続けて書いたバンドル
+        paths = []
+        bundle_path = os.path.join(tmp, "bundle.jsonl")
+        with open(bundle_path, "wb") as bundle:
+            for n in range(args.files):
+                office_code = f"{(n + 1) * 100:06d}"
+                area_codes = [f"{office_code[:4]}{m}0" for m in range(1 + n % 3)]
+                body = json.dumps(sample_full_forecast_json(office_code, area_codes, seed=n), ensure_ascii=False).encode("utf-8")
+                path = os.path.join(tmp, f"{office_code}.json")
+                with open(path, "wb") as f:
+                    f.write(body)
+                bundle.write(body + b"\n")
+                paths.append(path)
+        corpus_bytes = sum(os.path.getsize(path) for path in paths)
+        print(f"{len(paths)} ファイル, 合計 {corpus_bytes / 1024 / 1024:.1f} MB")
+
+        def read(path):
+            with open(path, "rb") as f:
+                return f.read()
+
+        def before():
+            return [result for path in paths for result in legacy_parse_file(read(path))]
+
+        def after_files():
+            return [forecast for path in paths for forecast in weekly_forecasts(json.loads(read(path)))]
+
+        def after_bundle():
+            with open(bundle_path, "rb") as bundle:
+                return list(iter_weekly_forecasts(iter_bundle(bundle)))
+
+        # 解析済みの予報を全ファイル分メモリに持っておく場合（ForecastCache に溜まった状態）
+        def before_all():
+            return [json.loads(read(path)) for path in paths]
+
+        def after_all():
+            return [ParsedForecast(json.loads(read(path))) for path in paths]
+
+        for label, run in (("before (json.loads + dict)", before), ("after (ファイルごと)", after_files),
+                           ("after (バンドルを逐次)", after_bundle)):
+            elapsed_ms, peak, retained, count = measure_parse(run)
+            print(f"{label:28}: {elapsed_ms:7.1f} ms, ピーク {peak / 1024:7.0f} KB, 結果 {retained / 1024:6.0f} KB ({count} 地域)")
+        for label, run in (("全ファイル保持 before (辞書)", before_all), ("全ファイル保持 after (解析済み)", after_all)):
+            elapsed_ms, peak, retained, _ = measure_parse(run)
+            print(f"{label:28}: {elapsed_ms:7.1f} ms, ピーク {peak / 1024:7.0f} KB, 保持 {retained / 1024:6.0f} KB")
+
+        # 大きな予報JSON1件を小さなチャンクで読んでも、チャンクごとに先頭から解析し直さない
+        big_path = os.path.join(tmp, "big.jsonl")
+        big_codes = [f"{n:06d}" for n in range(2000)]
+        with open(big_path, "wb") as f:
+            f.write(json.dumps(sample_full_forecast_json(big_codes[0], big_codes), ensure_ascii=False).encode("utf-8"))
+        start = time.perf_counter()
+        with open(big_path, "rb") as f:
+            json.loads(f.read())
+        loads_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        with open(big_path, "rb") as f:
+            list(iter_bundle(f, chunk_size=4096))
+        stream_ms = (time.perf_counter() - start) * 1000
+        print(f"{os.path.getsize(big_path) / 1024 / 1024:.1f} MB の1件を 4KB ずつ: {stream_ms:.1f} ms (json.loads {loads_ms:.1f} ms)")
+
+
+def bench_offline(args):
+    office_codes = [f"{(n + 1) * 10:04d}00" for n in range(20)]
+    clicks = [office_codes[i % len(office_codes)] for i in range(args.clicks)]
+    server = StubJMAServer(delay=args.delay or 0.05)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WeatherDB(os.path.join(tmp, "weather.db"))
+        db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+        # ttl=0 で毎回サーバに確認させる（条件付きGET）
+        client = server.client(cache=HTTPCache(os.path.join(tmp, "http_cache.db"), ttl=0), retries=0, timeout=(0.5, 0.5))
+
+        def load(code):
+            office = {"code": code}
+            report_datetime, daily_list = fetch_parsed_forecast(client, office).weekly_report(code)
+            area_info = dict(sample_area_info(code), report_datetime=report_datetime)
+            db.save_weather_report(area_info, daily_list)
+            return db.get_latest_forecast(code)
+
+        def measure(handler):
+            start = time.perf_counter()
+            for code in clicks:
+                handler(code)
+            return (time.perf_counter() - start) * 1000 / len(clicks)
+
+        # 通信してから表示する場合と、保存済みの予報をまず表示する場合（1クリックで最初に表示されるまで）
+        with server:
+            network_ms = measure(load)
+            stored_ms = measure(lambda code: (db.get_latest_forecast(code), db.get_latest_forecast_meta(code)))
+        print(f"通信してから表示      : {network_ms:.2f} ms/click (遅延 {server.delay * 1000:.0f} ms)")
+        print(f"保存済みをまず表示    : {stored_ms:.3f} ms/click")
+
+        # サーバを止めても、保存済みの予報（DB）とHTTPキャッシュの予報は表示できる（内容は test_forecast_data.py で確かめる）
+        client.session.close()  # keep-alive の接続を残さない
+        served = 0
+        for code in office_codes:
+            try:
+                load(code)
+            except requests.RequestException:
+                pass
+            rows = db.get_latest_forecast(code)
+            meta = db.get_latest_forecast_meta(code)
+            _, fetched_at = cached_parsed_forecast(client, {"code": code})
+            if rows:
+                served += 1
+        print(f"オフライン: {served}/{len(office_codes)} 地域を保存済みの予報で表示"
+              f" (発表 {format_age(datetime.fromisoformat(meta[0]))}, 取得 {format_age(datetime.fromtimestamp(fetched_at))})")
+        client.close()
+        db.close()
+
+
+def bench_readcache(args):
+    area_count = 200
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "weather.db")
+        db = WeatherDB(path, cache_size=area_count)
+        db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+        db.save_weather_reports_bulk((sample_area_info(f"{a:06d}"), sample_daily_list(a)) for a in range(area_count))
+        uncached = WeatherDB(path, cache_size=0)
+
+        # クリックのように同じ地域を何度も読む
+        for label, target in (("キャッシュなし", uncached), ("キャッシュあり", db)):
+            ms = measure_latest(target, area_count, args.clicks)
+            print(f"{label}: {ms:.4f} ms/read")
+        print(f"  {db.cache_stats}")
+
+        uncached.close()
+        db.close()
+
+
+# 旧実装: 起動のたびに全コードの色を求め、1行ずつ INSERT OR REPLACE する
+def legacy_seed(db, code_to_text, weather_colors):
+    with db._write_lock, db._writer() as conn:
+        cur = conn.cursor()
+        for code, desc in code_to_text.items():
+            color = "#808080"
+            for kw, c in weather_colors.items():
+                if kw in desc:
+                    color = c
+                    break
+            cur.execute("""
+                INSERT OR REPLACE INTO weather_codes
+                (weather_code, description, icon, color_code, memo, bg_color_code)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (code, desc, "help_outline", color, "", "#FFFFFF"))
+        conn.commit()
+
+
+def bench_seed(args):
+    launches = 50
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "weather.db")
+        db = WeatherDB(path)
+        start = time.perf_counter()
+        written = db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+        print(f"初回: {(time.perf_counter() - start) * 1000:.2f} ms ({written} 行)")
+        db.close()
+
+        # 起動のたびの登録（DBを開くところから）
+        results = {}
+        for label, seed in (("before (毎回全行を登録)", lambda db: legacy_seed(db, CODE_TO_TEXT, WEATHER_COLORS)),
+                            ("after (版が同じなら省略)", lambda db: db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS))):
+            seed_ms = 0.0
+            for _ in range(launches):
+                db = WeatherDB(path)
+                start = time.perf_counter()
+                seed(db)
+                seed_ms += (time.perf_counter() - start) * 1000
+                db.close()
+            results[label] = seed_ms / launches
+            print(f"{label}: {results[label]:.3f} ms/起動")
+        saved = results["before (毎回全行を登録)"] - results["after (版が同じなら省略)"]
+        print(f"起動1回あたり {saved:.2f} ms 短縮")
+
+        # 天気コード表が変わったときは、変わった行だけを書き込む
+        db = WeatherDB(path)
+        changed = dict(CODE_TO_TEXT)
+        code = next(iter(changed))
+        changed[code] = changed[code] + "（改）"
+        start = time.perf_counter()
+        written = db.seed_weather_master(changed, WEATHER_COLORS)
+        print(f"1コード変更: {(time.perf_counter() - start) * 1000:.2f} ms ({written} 行)")
+        db.close()
+
+
+BENCHMARKS = {
+    "db": bench_db,
+    "bulk": bench_bulk,
+    "dedup": bench_dedup,
+    "compact": bench_compact,
+    "plan": bench_plan,
+    "http": bench_http,
+    "cache": bench_cache,
+    "startup": bench_startup,
+    "prefetch": bench_prefetch,
+    "click": bench_click,
+    "render": bench_render,
+    "cards": bench_cards,
+    "sidebar": bench_sidebar,
+    "areas": bench_areas,
+    "parse": bench_parse,
+    "offline": bench_offline,
+    "readcache": bench_readcache,
+    "seed": bench_seed,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="天気予報アプリの性能測定")
+    parser.add_argument("target", choices=BENCHMARKS.keys())
+    parser.add_argument("--clicks", type=int, default=500)
+    parser.add_argument("--offices", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--delay", type=float, default=0.0, help="スタブサーバの応答遅延(秒)")
+    parser.add_argument("--cards", type=int, default=10000)
+    parser.add_argument("--files", type=int, default=500, help="解析する予報JSONの数")
+    parser.add_argument("--areas", type=int, default=50, help="1つの予報ファイルに入れる地域数")
+    parser.add_argument("--rate", type=float, default=None, help="ホストごとの1秒あたりの要求数")
+    args = parser.parse_args()
+    BENCHMARKS[args.target](args)
+
+
+if __name__ == "__main__":
+    main()
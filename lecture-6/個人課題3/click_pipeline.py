@@ -0,0 +1,82 @@
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from jma_client import FetchCancelled
+
+
+# クリックごとの取得・解析・DB処理を別スレッドで実行し、最新のクリックの結果だけを画面に反映する
+# 使い方:
+#   token = pipeline.begin()        # 前のクリックの処理を取り消す
+#   （読み込み中の表示）
+#   pipeline.run(token, work, on_done, on_error)
+# work(cancel) は cancel(threading.Event) がセットされたら途中でやめてよい
+class LatestClickPipeline:
+    def __init__(self, max_workers=2, history=200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="click")
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._cancel = threading.Event()
+        self.stall_ms = deque(maxlen=history)  # イベントハンドラがスレッドを占有した時間
+        self.discarded = 0  # 新しいクリックで捨てた結果の数
+
+    def begin(self):
+        with self._lock:
+            self._cancel.set()
+            self._cancel = threading.Event()
+            self._generation += 1
+            return self._generation, self._cancel
+
+    def run(self, token, work, on_done, on_error):
+        generation, cancel = token
+
+        def task():
+            try:
+                result = work(cancel)
+            except FetchCancelled:
+                self._discard()
+                return
+            except Exception as err:
+                self._apply(generation, on_error, err)
+                return
+            self._apply(generation, on_done, result)
+
+        self._executor.submit(task)
+
+    # 最新のクリックの結果なら反映する（反映中に次のクリックが始まらないようロックを取る）
+    def _apply(self, generation, callback, value):
+        with self._lock:
+            if generation != self._generation:
+                self.discarded += 1
+                return
+            callback(value)
+
+    def _discard(self):
+        with self._lock:
+            self.discarded += 1
+
+    # イベントハンドラの実行時間（イベント処理が止まっていた時間）を記録するデコレータ
+    def instrument(self, handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                self.stall_ms.append((time.perf_counter() - start) * 1000)
+        return wrapper
+
+    def stats(self):
+        stalls = list(self.stall_ms)
+        return {
+            'clicks': len(stalls),
+            'avg_stall_ms': sum(stalls) / len(stalls) if stalls else 0.0,
+            'max_stall_ms': max(stalls, default=0.0),
+            'discarded': self.discarded,
+        }
+
+    def shutdown(self):
+        self.begin()  # 実行中の処理を取り消す
+        self._executor.shutdown(wait=False)
@@ -1,19 +1,133 @@
+import hashlib
 import sqlite3
-from datetime import datetime
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
 
 # 天気予報アプリ用のSQLiteデータベース管理
 class WeatherDB:
-    def __init__(self, db_name="weather_app.db"):
+    # 最新の天気予報取得用SQL（実行計画の確認にも使う）
+    LATEST_FORECAST_SQL = """
+        SELECT df.*, wc.description, wc.color_code
+        FROM daily_forecasts df
+        JOIN weather_codes wc
+          ON df.weather_code = wc.weather_code
+        WHERE df.forecast_id = (
+            SELECT MAX(forecast_id)
+            FROM forecasts
+            WHERE area_id = ?
+        )
+        ORDER BY df.date ASC
+    """
+    # 履歴検索用SQL（iter_area_history / iter_date_evolution / get_temperature_summary）
+    AREA_HISTORY_SQL = """
+        SELECT f.forecast_id, f.datetime AS saved_at, f.report_datetime,
+               df.date, df.weather_code, df.temp_min, df.temp_max
+        FROM forecasts f
+        JOIN daily_forecasts df ON df.forecast_id = f.forecast_id
+        WHERE f.area_id = ? AND f.datetime >= ? AND f.datetime < ?
+        ORDER BY f.datetime, f.forecast_id, df.date
+    """
+    # 地域の予報を forecast_id 順に索引で読み、それぞれの日別予報を (forecast_id, date) で引く
+    # （CROSS JOIN で forecasts を外側に固定する。date の索引から全地域分を読んで並べ替えるより少なく、並べ替えもいらない）
+    DATE_EVOLUTION_SQL = """
+        SELECT f.forecast_id, f.datetime AS saved_at, f.report_datetime,
+               df.weather_code, df.temp_min, df.temp_max
+        FROM forecasts f
+        CROSS JOIN daily_forecasts df
+        WHERE f.area_id = ? AND df.forecast_id = f.forecast_id AND df.date = ?
+        ORDER BY f.forecast_id
+    """
+    TEMPERATURE_SUMMARY_SQL = """
+        SELECT COUNT(*) AS area_count,
+               MIN(NULLIF(df.temp_min, '')) AS temp_min,
+               MAX(NULLIF(df.temp_max, '')) AS temp_max,
+               AVG(NULLIF(df.temp_min, '')) AS avg_temp_min,
+               AVG(NULLIF(df.temp_max, '')) AS avg_temp_max
+        FROM daily_forecasts df
+        WHERE df.date = ? AND df.forecast_id IN (
+            SELECT MAX(d.forecast_id)
+            FROM daily_forecasts d
+            JOIN forecasts f ON f.forecast_id = d.forecast_id
+            WHERE d.date = ?
+            GROUP BY f.area_id
+        )
+    """
+
+    def __init__(self, db_name="weather_app.db", cache_size=256):
         self.db_name = db_name
+        # 接続はスレッドごとに1本だけ作って使い回す（Fletのイベントは別スレッドで動くため）
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        # 書き込みは専用の接続1本で順番に行う
+        # （自分の書き込みでは変わらない PRAGMA data_version で、他のプロセスの書き込みだけを見分けるため）
+        self._write_conn = None
+        self._write_lock = threading.RLock()
+        # get_latest_forecast の結果のキャッシュ（地域コード -> 行のリスト、最後に使った順）
+        self.cache_size = cache_size
+        self._latest_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0  # 消すたびに増やし、読み込み中に消されたものを入れないようにする
+        self._data_version = None
+        self.cache_stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'invalidations': 0, 'external_clears': 0}
+        self._compaction_thread = None
+        self._compaction_stop = threading.Event()
+        self.last_compaction_stats = None
+        self._closed = False
         self._init_db()
 
-    def _get_conn(self):
-        conn = sqlite3.connect(self.db_name)
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=10, check_same_thread=False)
+        # 新規DBのときだけ有効（WALにする前に設定する必要がある）。削除後のページを少しずつ返却できる
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        # WALにすると書き込み中でも他の接続から読み込みができる
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")  # WALならNORMALで十分安全
+        conn.execute("PRAGMA cache_size = -8000;")  # 約8MBのページキャッシュ
+        conn.execute("PRAGMA mmap_size = 67108864;")  # 64MBまでメモリマップで読む
         conn.execute("PRAGMA foreign_keys = ON;")
+        with self._conns_lock:
+            # close() の後に残ったスレッドが接続を開き直し、閉じられないまま残らないようにする
+            # （_get_conn・_writer の接続は close() で捨てるので、閉じた後は必ずここを通る）
+            if self._closed:
+                conn.close()
+                raise sqlite3.ProgrammingError("WeatherDB は閉じられています")
+            self._conns.append(conn)
+        return conn
+
+    def _get_conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
         return conn
+
+    # 書き込み用の接続（self._write_lock を取ってから使う）
+    def _writer(self):
+        if self._write_conn is None:
+            self._write_conn = self._connect()
+        return self._write_conn
+
+    # 開いている接続をすべて閉じる（アプリ終了時など）。閉じた後に読み書きすると sqlite3.ProgrammingError
+    def close(self):
+        self.stop_compaction()
+        # 書き込みの途中で書き込み用の接続を閉じないよう、書き込みロックを取ってから閉じる
+        with self._write_lock, self._conns_lock:
+            self._closed = True
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+        self._local = threading.local()
+        self._write_conn = None
+        self._data_version = None
+        self._clear_cache()
     
     def _init_db(self):
-        with self._get_conn() as conn:
+        with self._write_lock, self._writer() as conn:
             cur = conn.cursor()
             # テーブル作成
             cur.execute("""
@@ -36,15 +150,30 @@ class WeatherDB:
                 )
             """)# 天気コードマスターテーブル
 
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS app_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            """)# マスターデータの版（ハッシュ）などを保存するテーブル
+
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS forecasts (
                     forecast_id INTEGER PRIMARY KEY AUTOINCREMENT,
                     datetime TEXT NOT NULL,
                     office_code TEXT NOT NULL,
                     area_id TEXT NOT NULL,
+                    report_datetime TEXT,
+                    content_hash TEXT,
                     FOREIGN KEY (area_id) REFERENCES areas(area_id)
                 )
             """)# 天気予報テーブル
+            # 古いDBファイルには発表日時・ハッシュ列がないので追加する
+            forecast_columns = {row[1] for row in cur.execute("PRAGMA table_info(forecasts)")}
+            if "report_datetime" not in forecast_columns:
+                cur.execute("ALTER TABLE forecasts ADD COLUMN report_datetime TEXT")
+            if "content_hash" not in forecast_columns:
+                cur.execute("ALTER TABLE forecasts ADD COLUMN content_hash TEXT")
 
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS daily_forecasts (
@@ -59,81 +188,447 @@ class WeatherDB:
                 )
             """)# 日別天気予報テーブル
             # インデックス作成
+            # 地域ごとの最新予報を索引だけで引けるように
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_forecasts_area_forecast
+                ON forecasts(area_id, forecast_id DESC)
+            """)
+            # 日別予報は予報ID→日付順に並べ、必要な列をすべて含める（テーブル本体を読まずに済む）
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_daily_forecasts_forecast_date
+                ON daily_forecasts(forecast_id, date, weather_code, temp_min, temp_max)
+            """)
+            # 履歴検索用: 地域ごとの保存日時の範囲検索と、日付ごとの全地域集計
             cur.execute("""
-                CREATE INDEX IF NOT EXISTS idx_forecasts_area_id
-                ON forecasts(area_id)
+                CREATE INDEX IF NOT EXISTS idx_forecasts_area_datetime
+                ON forecasts(area_id, datetime)
             """)
             cur.execute("""
-                CREATE INDEX IF NOT EXISTS idx_daily_forecasts_forecast_id
-                ON daily_forecasts(forecast_id)
+                CREATE INDEX IF NOT EXISTS idx_daily_forecasts_date
+                ON daily_forecasts(date, forecast_id, temp_min, temp_max)
+            """)
+            # 上の索引と先頭列が同じで不要になった古い索引
+            cur.execute("DROP INDEX IF EXISTS idx_forecasts_area_id")
+            cur.execute("DROP INDEX IF EXISTS idx_daily_forecasts_forecast_id")
+            # 同じ官署・同じ発表日時の予報は1件だけ
+            cur.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_forecasts_office_report
+                ON forecasts(office_code, report_datetime)
             """)
             conn.commit()
 
     # 天気コードマスターデータ登録
+    # 天気コード表・色の表のハッシュを保存しておき、前回と同じなら何もしない（起動のたびに呼ばれるため）
+    # 変わっていたら、保存済みの行と違うものだけをまとめて書き込む。戻り値は書き込んだ行数
     def seed_weather_master(self, code_to_text, weather_colors):
-        with self._get_conn() as conn: 
-            cur = conn.cursor()
-            for code, desc in code_to_text.items(): # 天気コードと説明文を登録
-                color = "#808080"
-                for kw, c in weather_colors.items(): # 説明文に基づき色を決定
-                    if kw in desc: # 部分一致で判定
-                        color = c
-                        break
-                # 登録・更新処理
-                cur.execute("""
-                    INSERT OR REPLACE INTO weather_codes
-                    (weather_code, description, icon, color_code, memo, bg_color_code)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (code, desc, "help_outline", color, "", "#FFFFFF"))
+        version = hashlib.sha1(repr((sorted(code_to_text.items()), list(weather_colors.items()))).encode("utf-8")).hexdigest()
+        # 起動直後なので、_init_db で開いた書き込み用の接続で確認する（接続を新しく開かない）
+        with self._write_lock:
+            stored = self._writer().execute("SELECT value FROM app_meta WHERE key = 'weather_master_version'").fetchone()
+        if stored is not None and stored[0] == version:
+            return 0
+
+        rows = []
+        for code, desc in code_to_text.items(): # 天気コードと説明文を登録
+            color = "#808080"
+            for kw, c in weather_colors.items(): # 説明文に基づき色を決定
+                if kw in desc: # 部分一致で判定
+                    color = c
+                    break
+            rows.append((code, desc, "help_outline", color, "", "#FFFFFF"))
+
+        with self._write_lock, self._writer() as conn:
+            existing = set(conn.execute("""
+                SELECT weather_code, description, icon, color_code, memo, bg_color_code FROM weather_codes
+            """))
+            changed = [row for row in rows if row not in existing]
+            # 登録・更新処理
+            conn.executemany("""
+                INSERT OR REPLACE INTO weather_codes
+                (weather_code, description, icon, color_code, memo, bg_color_code)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, changed)
+            conn.execute("""
+                INSERT OR REPLACE INTO app_meta (key, value) VALUES ('weather_master_version', ?)
+            """, (version,))
             conn.commit()
+        if changed:
+            # 天気の説明文は最新の予報の行にも含まれるので、キャッシュは全部捨てる
+            self._clear_cache()
+        return len(changed)
 
     # 天気予報データ保存
     def save_weather_report(self, area_info, daily_data_list):
-        with self._get_conn() as conn: 
+        return self.save_weather_reports_bulk([(area_info, daily_data_list)])
+
+    # 複数地域の天気予報をまとめて1トランザクションで保存
+    # reports は (area_info, daily_data_list) の組を返すイテラブル（ジェネレータでもよい）
+    # area_info に 'report_datetime'（気象庁の発表日時）があれば、同じ発表の予報は重複保存しない
+    # 戻り値は実際に書き込んだ地域数
+    def save_weather_reports_bulk(self, reports, chunk_size=500):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        written = []
+        with self._write_lock, self._writer() as conn:
             cur = conn.cursor()
+            # 全件をメモリに載せないよう chunk_size 件ずつ書き込む
+            chunk = []
+            for report in reports:
+                chunk.append(report)
+                if len(chunk) >= chunk_size:
+                    written.extend(self._write_reports(cur, chunk, now))
+                    chunk = []
+            if chunk:
+                written.extend(self._write_reports(cur, chunk, now))
+            conn.commit()
+        # 書き込んだ地域の最新の予報だけキャッシュから消す
+        self._invalidate(written)
+        return len(written)
+
+    # 日別データの内容ハッシュ（前回と同じなら書き込みを省略するために使う）
+    @staticmethod
+    def _content_hash(daily_data_list):
+        rows = [(d['date'], d['min_t'], d['max_t'], d['w_code']) for d in daily_data_list]
+        return hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()
 
-            # 地域情報登録・更新
+    # 保存済みの同じ予報を探す（発表日時があればそれで、なければその地域の最新の予報）
+    def _find_stored_forecast(self, cur, area_info):
+        report_datetime = area_info.get('report_datetime')
+        if report_datetime:
             cur.execute("""
-                INSERT OR REPLACE INTO areas (area_id, area_name, center_id, center_name)
-                VALUES (?, ?, ?, ?)
-            """, (area_info['id'], area_info['name'],
-                  area_info['c_id'], area_info['c_name']))
-
-            # 天気予報登録
-            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            # 予報ヘッダ登録
+                SELECT forecast_id, content_hash FROM forecasts
+                WHERE office_code = ? AND report_datetime = ?
+            """, (area_info['id'], report_datetime))
+        else:
             cur.execute("""
-                INSERT INTO forecasts (datetime, office_code, area_id)
-                VALUES (?, ?, ?)
-            """, (now, area_info['id'], area_info['id']))
-            f_id = cur.lastrowid
-
-            # 日別天気予報登録
-            cur.executemany("""
-                INSERT INTO daily_forecasts
-                (date, temp_min, temp_max, forecast_id, weather_code)
-                VALUES (?, ?, ?, ?, ?)
-            """, [
+                SELECT forecast_id, content_hash FROM forecasts
+                WHERE area_id = ?
+                ORDER BY forecast_id DESC LIMIT 1
+            """, (area_info['id'],))
+        return cur.fetchone()
+
+    # 戻り値は書き込んだ地域コードのリスト
+    def _write_reports(self, cur, chunk, now):
+        # 同じ地域・同じ発表日時の予報が1つの塊に2つあると、両方 INSERT して一意インデックスに
+        # 当たり、まとめ書きの全体が巻き戻るので、後に来た方だけ残す
+        latest = {}
+        for i, (area_info, daily_data_list) in enumerate(chunk):
+            report_datetime = area_info.get('report_datetime')
+            key = (area_info['id'], report_datetime) if report_datetime else i
+            latest.pop(key, None)
+            latest[key] = (area_info, daily_data_list)
+
+        # 内容が変わっていない予報は何も書かずに飛ばす
+        changed = []
+        for area_info, daily_data_list in latest.values():
+            content_hash = self._content_hash(daily_data_list)
+            stored = self._find_stored_forecast(cur, area_info)
+            if stored is not None and stored[1] == content_hash:
+                continue
+            changed.append((area_info, daily_data_list, content_hash, stored))
+        if not changed:
+            return []
+
+        # 地域情報登録・更新（予報の外部キーより先にまとめて登録）
+        cur.executemany("""
+            INSERT OR REPLACE INTO areas (area_id, area_name, center_id, center_name)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (area_info['id'], area_info['name'], area_info['c_id'], area_info['c_name'])
+            for area_info, _, _, _ in changed
+        ])
+
+        daily_rows = []
+        for area_info, daily_data_list, content_hash, stored in changed:
+            if stored is not None and area_info.get('report_datetime'):
+                # 同じ発表日時の訂正報: ヘッダを使い回して日別データだけ入れ替える
+                f_id = stored[0]
+                cur.execute("""
+                    UPDATE forecasts SET datetime = ?, content_hash = ?
+                    WHERE forecast_id = ?
+                """, (now, content_hash, f_id))
+                cur.execute("DELETE FROM daily_forecasts WHERE forecast_id = ?", (f_id,))
+            else:
+                # 予報ヘッダ登録（forecast_id が必要なので1件ずつ）
+                cur.execute("""
+                    INSERT INTO forecasts (datetime, office_code, area_id, report_datetime, content_hash)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (now, area_info['id'], area_info['id'],
+                      area_info.get('report_datetime'), content_hash))
+                f_id = cur.lastrowid
+            daily_rows.extend(
                 (d['date'], d['min_t'], d['max_t'], f_id, d['w_code'])
                 for d in daily_data_list
-            ])
-            conn.commit()
+            )
+
+        # 日別天気予報登録
+        cur.executemany("""
+            INSERT INTO daily_forecasts
+            (date, temp_min, temp_max, forecast_id, weather_code)
+            VALUES (?, ?, ?, ?, ?)
+        """, daily_rows)
+        return [area_info['id'] for area_info, _, _, _ in changed]
 
     # 最新の天気予報取得
+    # 地域の最新の予報の行のリスト（返すリストはキャッシュと共有するので変更しない）
+    # 結果は地域ごとにキャッシュし、この WeatherDB での書き込みでは書いた地域だけ、
+    # 他の接続（他のプロセスや古い予報の整理）の書き込みがあれば全部を捨てる
     def get_latest_forecast(self, area_id):
+        generation = self._cache_generation_if_valid()
+        if generation is None:
+            with self._cache_lock:
+                self.cache_stats['bypassed'] += 1
+        else:
+            with self._cache_lock:
+                rows = self._latest_cache.get(area_id)
+                if rows is not None:
+                    self._latest_cache.move_to_end(area_id)
+                    self.cache_stats['hits'] += 1
+                    return rows
+                self.cache_stats['misses'] += 1
+
         with self._get_conn() as conn:
-            conn.row_factory = sqlite3.Row
             cur = conn.cursor()
-            cur.execute("""
-                SELECT df.*, wc.description, wc.color_code
-                FROM daily_forecasts df
-                JOIN weather_codes wc
-                  ON df.weather_code = wc.weather_code
-                WHERE df.forecast_id = (
-                    SELECT MAX(forecast_id)
-                    FROM forecasts
-                    WHERE area_id = ?
-                )
-                ORDER BY df.date ASC
-            """, (area_id,))
-            return cur.fetchall()
\ No newline at end of file
+            cur.row_factory = sqlite3.Row  # 接続を共有しているのでカーソル単位で設定
+            cur.execute(self.LATEST_FORECAST_SQL, (area_id,))
+            rows = cur.fetchall()
+
+        if generation is not None:
+            with self._cache_lock:
+                # 読み込み中に書き込みがあった（キャッシュが消された）なら入れない
+                if generation == self._cache_generation:
+                    self._latest_cache[area_id] = rows
+                    while len(self._latest_cache) > self.cache_size:
+                        self._latest_cache.popitem(last=False)
+        return rows
+
+    # キャッシュを使えるならその世代を返す。この WeatherDB で書き込み中なら None（キャッシュを使わない）
+    # 書き込み用の接続の PRAGMA data_version は他の接続が書き込んだときだけ変わるので、変わっていたら全部捨てる
+    def _cache_generation_if_valid(self):
+        if not self._write_lock.acquire(blocking=False):
+            return None
+        try:
+            data_version = self._writer().execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self._write_lock.release()
+        with self._cache_lock:
+            if data_version != self._data_version:
+                if self._data_version is not None and self._latest_cache:
+                    self.cache_stats['external_clears'] += 1
+                self._latest_cache.clear()
+                self._cache_generation += 1
+                self._data_version = data_version
+            return self._cache_generation
+
+    def _invalidate(self, area_ids):
+        if not area_ids:
+            return
+        with self._cache_lock:
+            for area_id in area_ids:
+                self._latest_cache.pop(area_id, None)
+            self._cache_generation += 1
+            self.cache_stats['invalidations'] += len(area_ids)
+
+    def _clear_cache(self):
+        with self._cache_lock:
+            self._latest_cache.clear()
+            self._cache_generation += 1
+
+    # 地域の最新の予報の (発表日時, 保存日時) を返す。保存されていなければ None
+    # 通信できないときに、保存済みの予報がどれだけ古いかを表示するのに使う
+    def get_latest_forecast_meta(self, area_id):
+        return self._get_conn().execute("""
+            SELECT report_datetime, datetime FROM forecasts
+            WHERE area_id = ?
+            ORDER BY forecast_id DESC LIMIT 1
+        """, (area_id,)).fetchone()
+
+    # 地域ごとの最新の予報の発表日時 {地域コード: reportDatetime}
+    def get_report_datetimes(self):
+        cur = self._get_conn().execute("""
+            SELECT office_code, report_datetime FROM forecasts
+            WHERE forecast_id IN (SELECT MAX(forecast_id) FROM forecasts GROUP BY office_code)
+        """)
+        return dict(cur.fetchall())
+
+    # 履歴の検索結果を返す共通処理
+    # as_columns=False なら sqlite3.Row を1行ずつ返すジェネレータ、
+    # True なら列名→値の配列の辞書（気温は array('d')、欠測は NaN）を返す
+    def _query_history(self, sql, params, as_columns):
+        cur = self._get_conn().cursor()
+        if not as_columns:
+            cur.row_factory = sqlite3.Row
+            cur.execute(sql, params)
+            return iter(cur)
+
+        cur.execute(sql, params)
+        names = [col[0] for col in cur.description]
+        columns = {name: array('d') if name.startswith("temp_") else [] for name in names}
+        targets = [columns[name] for name in names]
+        while True:
+            rows = cur.fetchmany(1000)
+            if not rows:
+                break
+            for row in rows:
+                for target, value in zip(targets, row):
+                    if isinstance(target, array):
+                        # 気象庁データの気温は空文字のこともある
+                        value = math.nan if value is None or value == "" else float(value)
+                    target.append(value)
+        return columns
+
+    # 地域の予報履歴（start〜end に保存された全世代の日別予報）
+    def iter_area_history(self, area_id, start, end, as_columns=False):
+        return self._query_history(self.AREA_HISTORY_SQL, (area_id, start, end), as_columns)
+
+    # ある日付の予報が、発表を重ねるごとにどう変わったか
+    def iter_date_evolution(self, area_id, target_date, as_columns=False):
+        return self._query_history(self.DATE_EVOLUTION_SQL, (area_id, target_date), as_columns)
+
+    # ある日付の全地域の最低・最高気温（地域ごとにその日を含む最新の予報を使う）
+    def get_temperature_summary(self, target_date):
+        cur = self._get_conn().cursor()
+        cur.row_factory = sqlite3.Row
+        cur.execute(self.TEMPERATURE_SUMMARY_SQL, (target_date, target_date))
+        return cur.fetchone()
+
+    # 古い予報の整理（保持ポリシー）
+    # ・keep_all_days 日以内: すべての予報を残す
+    # ・それより古いもの: 地域ごとに1日1件（その日の最後の予報）だけ残す
+    # ・keep_months か月（30日換算）より古いもの: すべて削除
+    # どの地域も最新の予報は必ず残す。長時間ロックしないよう batch_size 件ずつ別トランザクションで消す
+    # stop（threading.Event）がセットされたら、次のバッチに進まずにそこまでで終える
+    def compact_history(self, keep_all_days=7, keep_months=6, batch_size=200, vacuum_pages=500,
+                        pause=0.0, max_batches=None, stop=None):
+        now = datetime.now()
+        keep_all_cutoff = (now - timedelta(days=keep_all_days)).strftime("%Y-%m-%d %H:%M:%S")
+        drop_cutoff = (now - timedelta(days=30 * keep_months)).strftime("%Y-%m-%d %H:%M:%S")
+        conn = self._get_conn()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+        stats = {
+            'deleted_forecasts': 0,
+            'deleted_daily_rows': 0,
+            'batches': 0,
+            'lock_seconds': 0.0,
+            'max_lock_seconds': 0.0,
+            'reclaimed_bytes': 0,
+        }
+
+        # 削除対象の選択は読み込みだけなので、書き込みロックの外で一度だけ行う（WALなら書き込みを止めない）
+        candidate_ids = [row[0] for row in conn.execute("""
+            SELECT forecast_id FROM forecasts
+            WHERE datetime < :keep_all_cutoff
+              AND forecast_id NOT IN (
+                  SELECT MAX(forecast_id) FROM forecasts GROUP BY area_id
+              )
+              AND (
+                  datetime < :drop_cutoff
+                  OR forecast_id NOT IN (
+                      SELECT MAX(forecast_id) FROM forecasts
+                      WHERE datetime < :keep_all_cutoff
+                      GROUP BY area_id, substr(datetime, 1, 10)
+                  )
+              )
+            ORDER BY forecast_id
+        """, {'keep_all_cutoff': keep_all_cutoff, 'drop_cutoff': drop_cutoff})]
+
+        for offset in range(0, len(candidate_ids), batch_size):
+            if stop is not None and stop.is_set():
+                break
+            if max_batches is not None and stats['batches'] >= max_batches:
+                break
+            ids = candidate_ids[offset:offset + batch_size]
+            marks = ",".join("?" * len(ids))
+            lock_start = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = conn.execute(f"DELETE FROM daily_forecasts WHERE forecast_id IN ({marks})", ids)
+                stats['deleted_daily_rows'] += cur.rowcount
+                cur = conn.execute(f"DELETE FROM forecasts WHERE forecast_id IN ({marks})", ids)
+                stats['deleted_forecasts'] += cur.rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            lock_seconds = time.perf_counter() - lock_start
+            stats['lock_seconds'] += lock_seconds
+            stats['max_lock_seconds'] = max(stats['max_lock_seconds'], lock_seconds)
+            stats['batches'] += 1
+            if pause:
+                self._pause(pause, stop)  # 他の読み書きを先に通す
+
+        # 空いたページをファイルから返却する（auto_vacuum = INCREMENTAL のDBのみ）
+        # これも書き込みロックを取るので vacuum_pages ページずつ分けて行う
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            while conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+                if stop is not None and stop.is_set():
+                    break
+                lock_start = time.perf_counter()
+                # executescript でないと1ページしか返却されない
+                conn.executescript(f"PRAGMA incremental_vacuum({int(vacuum_pages)});")
+                lock_seconds = time.perf_counter() - lock_start
+                stats['lock_seconds'] += lock_seconds
+                stats['max_lock_seconds'] = max(stats['max_lock_seconds'], lock_seconds)
+                if pause:
+                    self._pause(pause, stop)
+        pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+        stats['reclaimed_bytes'] = (pages_before - pages_after) * page_size
+        self.last_compaction_stats = stats
+        return stats
+
+    # バッチの間の待ち（止めるように言われたらすぐ戻る）
+    @staticmethod
+    def _pause(seconds, stop):
+        if stop is None:
+            time.sleep(seconds)
+        else:
+            stop.wait(seconds)
+
+    # 整理処理をバックグラウンドスレッドで定期実行する
+    def start_compaction(self, interval=3600, **policy):
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_stop.clear()
+
+        def run():
+            while not self._compaction_stop.is_set():
+                try:
+                    self.compact_history(pause=0.01, stop=self._compaction_stop, **policy)
+                except sqlite3.Error as err:
+                    print(f"履歴の整理に失敗しました: {err}")
+                self._compaction_stop.wait(interval)
+
+        self._compaction_thread = threading.Thread(target=run, name="weather-db-compaction", daemon=True)
+        self._compaction_thread.start()
+
+    def stop_compaction(self):
+        self._compaction_stop.set()
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+            self._compaction_thread = None
+
+
+# プロセス内で共有する履歴の整理（画面がいくつ開いていても整理のスレッドは1本だけ）
+_compaction_db = None
+_compaction_users = 0
+_compaction_lock = threading.Lock()
+
+
+# 画面を開いたときに呼ぶ。最初の1回だけ整理用の接続を開いて定期実行を始める
+def acquire_compaction(db_name="weather_app.db"):
+    global _compaction_db, _compaction_users
+    with _compaction_lock:
+        if _compaction_db is None:
+            _compaction_db = WeatherDB(db_name)
+            _compaction_db.start_compaction()
+        _compaction_users += 1
+
+
+# 画面を閉じたときに呼ぶ。最後の画面が閉じたら整理を止めて接続を閉じる
+def release_compaction():
+    global _compaction_db, _compaction_users
+    with _compaction_lock:
+        _compaction_users = max(_compaction_users - 1, 0)
+        if _compaction_users == 0 and _compaction_db is not None:
+            _compaction_db.close()  # stop_compaction も行う
+            _compaction_db = None
@@ -0,0 +1,129 @@
+from datetime import datetime
+
+import flet as ft
+
+
+# 予報の古さを「N分前」などの表示にする（when は datetime、タイムゾーン付きでもなしでもよい）
+def format_age(when, now=None):
+    if now is None:
+        now = datetime.now(when.tzinfo)
+    seconds = max(0, int((now - when).total_seconds()))
+    if seconds < 60:
+        return "たった今"
+    if seconds < 3600:
+        return f"{seconds // 60}分前"
+    if seconds < 86400:
+        return f"{seconds // 3600}時間前"
+    return f"{seconds // 86400}日前"
+
+
+# 1日分の天気カード
+# 子コントロールは最初に作った固定の組み合わせを使い回し、表示の切り替えは値と visible の変更だけで行う
+# （Flet は変わったプロパティだけをクライアントに送るので、作り直すより送信量が少ない）
+class ForecastCard(ft.Container):
+    def __init__(self):
+        self.date_text = ft.Text(weight="bold")
+        self.first_icon = ft.Icon(ft.Icons.HELP_OUTLINE, color=ft.Colors.GREY_300, size=50)
+        self.arrow = ft.Icon(ft.Icons.ARROW_FORWARD, color=ft.Colors.GREY_400, size=24, visible=False)
+        self.bar = ft.Text("|", size=30, color=ft.Colors.GREY_300, visible=False)
+        self.second_icon = ft.Icon(ft.Icons.HELP_OUTLINE, size=40, visible=False)
+        self.short_text = ft.Text(size=13, weight="bold", text_align=ft.TextAlign.CENTER)
+        self.min_text = ft.Text(color=ft.Colors.BLUE, weight="bold")
+        self.max_text = ft.Text(color=ft.Colors.RED, weight="bold")
+        super().__init__(
+            padding=20, bgcolor=ft.Colors.WHITE, border_radius=15,
+            shadow=ft.BoxShadow(spread_radius=1, blur_radius=10, color=ft.Colors.BLUE_GREY_100),
+            content=ft.Column([
+                self.date_text,
+                ft.Container(
+                    content=ft.Row([self.first_icon, self.arrow, self.bar, self.second_icon], alignment=ft.MainAxisAlignment.CENTER, spacing=5),
+                    height=80, alignment=ft.alignment.center,
+                ),
+                self.short_text,
+                ft.Row([
+                    self.min_text,
+                    ft.Text("/", color=ft.Colors.GREY),
+                    self.max_text,
+                ], alignment=ft.MainAxisAlignment.CENTER)
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+        )
+
+    # 表示内容を差し替える（render は weather_render.WeatherRender）
+    def set_forecast(self, date, render, min_t, max_t):
+        self.date_text.value = date
+        self.short_text.value = render.short_text
+        self.min_text.value = min_t
+        self.max_text.value = max_t
+
+        icons = render.icons
+        if len(icons) == 2:
+            (first_icon, first_color), (second_icon, second_color) = icons
+            self._set_icon(self.first_icon, first_icon, first_color, 40)
+            self._set_icon(self.second_icon, second_icon, second_color, 40)
+            self.second_icon.visible = True
+            # 「のち」なら矢印、それ以外（時々など）は区切り線
+            self.arrow.visible = render.separator == "arrow"
+            self.bar.visible = render.separator != "arrow"
+        else:
+            if icons:
+                self._set_icon(self.first_icon, icons[0][0], icons[0][1], 70)
+            else:
+                self._set_icon(self.first_icon, ft.Icons.HELP_OUTLINE, ft.Colors.GREY_300, 50)
+            self.second_icon.visible = False
+            self.arrow.visible = False
+            self.bar.visible = False
+
+    @staticmethod
+    def _set_icon(icon_control, icon, color, size):
+        icon_control.name = icon
+        icon_control.color = color
+        icon_control.size = size
+
+
+# 天気カードの一覧（読み込み中・エラー表示を含む）
+# カードは必要な枚数だけ作って使い回す。変更後の page.update() は呼び出し側で1回だけ行う
+# status は一覧の上に置く1行の表示（予報の古さ・オフライン表示）で、レイアウトには呼び出し側で入れる
+class ForecastGrid:
+    def __init__(self, grid_view):
+        self.grid_view = grid_view
+        self.cards = []
+        self.progress = ft.Container(content=ft.ProgressRing(), alignment=ft.alignment.center, expand=True, visible=False)
+        self.error_text = ft.Text(color=ft.Colors.RED, visible=False)
+        self.status = ft.Text(size=12, color=ft.Colors.BLUE_GREY_700, visible=False)
+        grid_view.controls = [self.progress, self.error_text]
+
+    def show_status(self, message, offline=False):
+        self.status.value = message
+        self.status.color = ft.Colors.ORANGE_900 if offline else ft.Colors.BLUE_GREY_700
+        self.status.visible = bool(message)
+
+    def _hide_cards(self):
+        for card in self.cards:
+            card.visible = False
+
+    def show_progress(self):
+        self._hide_cards()
+        self.status.visible = False
+        self.error_text.visible = False
+        self.progress.visible = True
+
+    def show_error(self, message):
+        self._hide_cards()
+        self.status.visible = False
+        self.progress.visible = False
+        self.error_text.value = message
+        self.error_text.visible = True
+
+    # forecasts は (日付, 表示情報, 最低気温, 最高気温) のリスト
+    def show_forecasts(self, forecasts):
+        self.progress.visible = False
+        self.error_text.visible = False
+        while len(self.cards) < len(forecasts):
+            card = ForecastCard()
+            self.cards.append(card)
+            self.grid_view.controls.append(card)
+        for card, forecast in zip(self.cards, forecasts):
+            card.set_forecast(*forecast)
+            card.visible = True
+        for card in self.cards[len(forecasts):]:
+            card.visible = False
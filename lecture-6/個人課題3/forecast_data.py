@@ -0,0 +1,119 @@
+# 気象庁の予報JSON(forecast/{code}.json)から、DBに保存する週間予報を取り出す処理
+import threading
+from collections import OrderedDict
+
+from forecast_parser import weekly_forecasts
+
+
+# 地域から、実際に読みに行くファイルのコードを求める
+# 「十勝・奄美」は別の府県予報区のファイルに含まれている（regions.parse_region_data が area.json から求めた fetch_code）
+def fetch_code_for(office):
+    return office.get("fetch_code") or office["code"]
+
+
+# 予報JSONを1度だけ解析したもの
+# すべての timeSeries の地域コードを索引にしておき、地域の位置は辞書で引く
+# 週間予報は地域ごとの WeeklyForecast にして持ち、読み込んだ辞書そのものは持たない
+class ParsedForecast:
+    def __init__(self, response_data):
+        self.report_datetimes = tuple(section.get('reportDatetime') for section in response_data)
+        self.publishing_office = response_data[0].get('publishingOffice') if response_data else None
+        # 地域コード -> {(セクション番号, timeSeries番号): 地域の位置}
+        self.area_index = {}
+        for s, section in enumerate(response_data):
+            for t, series in enumerate(section.get('timeSeries', [])):
+                for i, area in enumerate(series.get('areas', [])):
+                    self.area_index.setdefault(area['area']['code'], {})[(s, t)] = i
+        self.weekly = weekly_forecasts(response_data)
+        self._reports = {}  # (地域コード, 細分区域のコード) -> weekly_report の結果
+
+    # 同じ発表の予報JSONから解析したものか
+    def same_report(self, response_data):
+        if len(response_data) != len(self.report_datetimes):
+            return False
+        for section, report_datetime in zip(response_data, self.report_datetimes):
+            if section.get('reportDatetime') != report_datetime:
+                return False
+        return True
+
+    def has_weekly(self):
+        return bool(self.weekly)
+
+    # 週間予報(index 1)の中での地域の位置を返す
+    # 地域コードそのものがなければ細分区域(area_codes)のコードで探し、それでもなければ None
+    def weekly_area_index(self, office_code, area_codes=()):
+        for code in (office_code, *area_codes):
+            position = self.area_index.get(code, {}).get((1, 0))
+            if position is not None:
+                return position
+        return None
+
+    # 選んだ地域の週間予報（forecast_parser.WeeklyForecast）
+    # 別の地域の予報を表示しないよう、ファイルにその地域がなければエラーにする
+    def weekly_forecast(self, office_code, area_codes=()):
+        if not self.has_weekly():
+            raise Exception("週間予報データがありません")
+        position = self.weekly_area_index(office_code, area_codes)
+        if position is None:
+            raise Exception(f"週間予報に地域 {office_code} がありません")
+        return self.weekly[position]
+
+    # 週間予報を解析し、(発表日時, 日別データのタプル) を返す
+    # 地域ごとに1度だけ作り、同じ地域はキャッシュから返す
+    def weekly_report(self, office_code, area_codes=()):
+        key = (office_code, tuple(area_codes))
+        report = self._reports.get(key)
+        if report is None:
+            forecast = self.weekly_forecast(office_code, area_codes)
+            report = self._reports[key] = (forecast.report_datetime, forecast.daily_list())
+        return report
+
+
+# 解析済みの予報をファイルのコードごとに覚えておく（発表日時が変われば解析し直す）
+class ForecastCache:
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fetch_code, response_data):
+        with self._lock:
+            parsed = self._entries.get(fetch_code)
+            if parsed is not None and parsed.same_report(response_data):
+                self._entries.move_to_end(fetch_code)
+                self.hits += 1
+                return parsed
+            self.misses += 1
+        parsed = ParsedForecast(response_data)
+        with self._lock:
+            self._entries[fetch_code] = parsed
+            self._entries.move_to_end(fetch_code)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return parsed
+
+
+_forecast_cache = ForecastCache()
+
+
+# 地域のファイルを取得して解析済みの予報を返す（両方のアプリで共有する）
+def fetch_parsed_forecast(client, office, cancel=None):
+    fetch_code = fetch_code_for(office)
+    return _forecast_cache.get(fetch_code, client.fetch_forecast(fetch_code, cancel))
+
+
+# 通信できないときに、HTTPキャッシュに残っている予報の (解析済みの予報, 取得時刻) を返す。なければ None
+def cached_parsed_forecast(client, office):
+    fetch_code = fetch_code_for(office)
+    cached = client.cached_forecast(fetch_code)
+    if cached is None:
+        return None
+    response_data, fetched_at = cached
+    return _forecast_cache.get(fetch_code, response_data), fetched_at
+
+
+# 週間予報を解析し、(発表日時, 日別データのリスト) を返す
+def extract_weekly_report(response_data, office_code, area_codes=()):
+    return ParsedForecast(response_data).weekly_report(office_code, area_codes)
@@ -0,0 +1,139 @@
+# 予報JSONのうち、週間予報の表示と保存に使う部分だけを取り出す解析処理
+# ・週間予報の天気コード・気温・日時だけを、地域ごとの小さなレコード(WeeklyForecast)にする
+# ・気温は array('d')（欠測は NaN）、日時と日付の文字列はファイルごとに1度だけ作って地域間で共有する
+# ・複数の予報JSONを続けて書いたファイル（バンドル）は1件ずつ読みながら処理できる
+# 読み込み自体は C 実装の json を使い（Python のフックを挟むより速い）、読み込んだ辞書はすぐに手放す
+import codecs
+import json
+import math
+from array import array
+from datetime import datetime
+
+
+# 気温の文字列のリストを array('d') にする（空文字は NaN）
+def parse_temps(values):
+    return array('d', [float(v) if v not in ("", None) else math.nan for v in values])
+
+
+# ISO形式の日時のリストを datetime のタプルにする
+def parse_times(values):
+    return tuple(datetime.fromisoformat(v) for v in values)
+
+
+# datetime のタプルから日付の文字列のタプルを作る
+def parse_dates(times):
+    return tuple(t.date().isoformat() for t in times)
+
+
+# 1地域分の週間予報
+class WeeklyForecast:
+    __slots__ = ("area_code", "report_datetime", "times", "dates", "weather_codes", "temps_min", "temps_max", "_daily_list")
+
+    def __init__(self, area_code, report_datetime, times, weather_codes, temps_min, temps_max, dates=None):
+        self.area_code = area_code
+        self.report_datetime = report_datetime  # 発表日時の文字列（DBの重複判定にそのまま使う）
+        self.times = times  # datetime のタプル（同じファイルの地域で共有）
+        self.dates = dates if dates is not None else parse_dates(times)  # 日付の文字列のタプル（同上）
+        self.weather_codes = weather_codes
+        self.temps_min = temps_min  # array('d')、欠測は NaN
+        self.temps_max = temps_max
+        self._daily_list = None
+
+    # WeatherDB.save_weather_report に渡す日別データのタプル
+    # 1度作ったものを返し続けるので、受け取った側で書き換えないこと
+    def daily_list(self):
+        if self._daily_list is not None:
+            return self._daily_list
+        daily_list = []
+        for i, date in enumerate(self.dates):
+            min_t = self.temps_min[i] if i < len(self.temps_min) else math.nan
+            max_t = self.temps_max[i] if i < len(self.temps_max) else math.nan
+            daily_list.append({
+                'date': date,
+                'w_code': self.weather_codes[i],
+                'min_t': None if math.isnan(min_t) else min_t,
+                'max_t': None if math.isnan(max_t) else max_t,
+            })
+        self._daily_list = tuple(daily_list)
+        return self._daily_list
+
+
+# 予報JSON1件に入っている全地域の週間予報（ファイル内の順）
+# 気温データ側（timeSeries[1]）は観測地点のコードなので、天気側と同じ位置のものを使う
+def weekly_forecasts(response_data):
+    if len(response_data) <= 1:
+        return []
+    weekly_data = response_data[1]
+    weather_series, temp_series = weekly_data['timeSeries'][:2]
+    report_datetime = weekly_data.get('reportDatetime')
+    times = parse_times(weather_series['timeDefines'])
+    dates = parse_dates(times)
+    temp_areas = temp_series['areas']
+    forecasts = []
+    for i, weather_area in enumerate(weather_series['areas']):
+        temp_area = temp_areas[i] if i < len(temp_areas) else {}
+        forecasts.append(WeeklyForecast(
+            weather_area['area']['code'],
+            report_datetime,
+            times,
+            tuple(weather_area['weatherCodes']),
+            parse_temps(temp_area.get('tempsMin', [""] * len(times))),
+            parse_temps(temp_area.get('tempsMax', [""] * len(times))),
+            dates,
+        ))
+    return forecasts
+
+
+_decoder = json.JSONDecoder()
+
+
+# 予報JSONを続けて書いたファイル（バンドル）から、1件ずつ読み込んで返す
+# 読み込み中の予報JSONの分しかメモリに持たない
+# 途中までしか読めていない予報JSONは、読めなかったときの2倍の長さがたまるまで解析し直さない
+# （チャンクごとに先頭から解析し直すと、大きな予報JSONで2乗の時間がかかる）
+def iter_bundle(fp, chunk_size=64 * 1024):
+    buffer = ""
+    pos = 0
+    pending = []  # まだ buffer につないでいないチャンク
+    pending_size = 0
+    retry_size = 0  # 未解析の部分がこの長さになるまで解析し直さない
+    eof = False
+    utf8 = codecs.getincrementaldecoder("utf-8")()  # チャンクの境目で切れた文字を次に回す
+    while True:
+        if pending and (eof or len(buffer) - pos + pending_size >= retry_size):
+            buffer = buffer[pos:] + "".join(pending)
+            pos, pending, pending_size = 0, [], 0
+        # 区切りの空白を飛ばす
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos >= len(buffer) and not pending:
+            if eof:
+                return
+            buffer, pos = "", 0
+        elif not pending:
+            try:
+                document, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # 途中までしか読めていなければ続きを読む
+                if eof:
+                    raise
+                retry_size = 2 * (len(buffer) - pos)
+            else:
+                yield document
+                pos = end
+                retry_size = 0
+                continue
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+        if isinstance(chunk, (bytes, bytearray)):
+            chunk = utf8.decode(chunk, final=eof)
+        if chunk:
+            pending.append(chunk)
+            pending_size += len(chunk)
+
+
+# 予報JSONを次々に受け取り、全地域の週間予報を1件ずつ返す
+def iter_weekly_forecasts(documents):
+    for response_data in documents:
+        yield from weekly_forecasts(response_data)
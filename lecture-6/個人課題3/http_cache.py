@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+import time
+
+
+# URLごとにレスポンス本文と ETag / Last-Modified を保存するディスクキャッシュ
+# ・ttl 秒以内ならサーバに問い合わせずに返す
+# ・それを過ぎたら条件付きGETで確認し、304 なら保存済みの本文を使う
+# ・合計サイズが max_bytes を超えたら、最後に使ってから時間が経ったものから消す（LRU）
+class HTTPCache:
+    def __init__(self, db_name="http_cache.db", ttl=600, max_bytes=50 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'revalidations': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_name, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL;")
+        self._conn.execute("PRAGMA synchronous = NORMAL;")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_http_cache_last_access
+                ON http_cache(last_access)
+            """)
+
+    # 保存済みのエントリ (body, etag, last_modified, fetched_at) を返す。なければ None
+    def get(self, url):
+        with self._lock:
+            return self._conn.execute("""
+                SELECT body, etag, last_modified, fetched_at FROM http_cache WHERE url = ?
+            """, (url,)).fetchone()
+
+    def is_fresh(self, entry):
+        return time.time() - entry[3] < self.ttl
+
+    # 条件付きGETに付けるヘッダ
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry is not None:
+            if entry[1]:
+                headers["If-None-Match"] = entry[1]
+            if entry[2]:
+                headers["If-Modified-Since"] = entry[2]
+        return headers
+
+    # 新鮮なキャッシュを使った
+    def record_hit(self, url):
+        self._touch(url, 'hits', refreshed=False)
+
+    # 304 で保存済みの本文がまだ有効だと確認できた
+    def record_revalidation(self, url):
+        self._touch(url, 'revalidations', refreshed=True)
+
+    # 統計の加算も、複数スレッドから呼ばれるのでロックの中で行う
+    def _touch(self, url, stat, refreshed):
+        now = time.time()
+        with self._lock, self._conn:
+            self.stats[stat] += 1
+            if refreshed:
+                self._conn.execute("UPDATE http_cache SET fetched_at = ?, last_access = ? WHERE url = ?",
+                                   (now, now, url))
+            else:
+                self._conn.execute("UPDATE http_cache SET last_access = ? WHERE url = ?", (now, url))
+
+    # 新しく取得したレスポンスを保存する
+    def put(self, url, body, etag=None, last_modified=None):
+        now = time.time()
+        with self._lock, self._conn:
+            self.stats['misses'] += 1
+            self._conn.execute("""
+                INSERT OR REPLACE INTO http_cache
+                (url, body, etag, last_modified, fetched_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (url, body, etag, last_modified, now, now, len(body)))
+            self._evict()
+
+    # 合計サイズが上限を超えていたら古いものから削除
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self._conn.execute(
+                "SELECT url, size FROM http_cache ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+            self.stats['evictions'] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM http_cache")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from http_cache import HTTPCache
+
+AREA_URL = "http://www.jma.go.jp/bosai/common/const/area.json"
+FORECAST_URL = "https://www.jma.go.jp/bosai/forecast/data/forecast/{code}.json"
+
+
+# 新しい操作で不要になった取得を途中でやめたとき
+class FetchCancelled(Exception):
+    pass
+
+
+# 気象庁APIの取得用クライアント
+# requests.Session を使い回すので、同じホストへの接続（TCP+TLS）は keep-alive で再利用される
+# cache に HTTPCache を渡すと、条件付きGETで変わっていないデータの再ダウンロードを省く
+class JMAClient:
+    def __init__(self, area_url=AREA_URL, forecast_url=FORECAST_URL,
+                 timeout=(3.05, 10), retries=3, backoff=0.5, pool_size=16, cache=None):
+        self.area_url = area_url
+        self.forecast_url = forecast_url
+        self.timeout = timeout  # (接続, 読み込み) のタイムアウト秒
+        self.cache = cache
+
+        # 一時的なエラー(5xx, 429)や接続失敗は間隔を空けて再試行する
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "User-Agent": "dsprog2-weather-app",
+        })
+
+    # (レスポンス, 本文) を返す。cancel(threading.Event) がセットされたら途中でやめる
+    def _get(self, url, headers=None, cancel=None):
+        if cancel is not None and cancel.is_set():
+            raise FetchCancelled(url)
+        response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        chunks = []
+        with response:
+            for chunk in response.iter_content(64 * 1024):
+                if cancel is not None and cancel.is_set():
+                    raise FetchCancelled(url)
+                chunks.append(chunk)
+        return response, b"".join(chunks)
+
+    # revalidate=True なら ttl 以内でも保存済みの本文をそのまま使わず、条件付きGETで確かめる
+    def get_json(self, url, cancel=None, revalidate=False):
+        if self.cache is None:
+            response, body = self._get(url, cancel=cancel)
+            response.raise_for_status()
+            return json.loads(body)
+
+        entry = self.cache.get(url)
+        if entry is not None and not revalidate and self.cache.is_fresh(entry):
+            self.cache.record_hit(url)
+            return json.loads(entry[0])
+
+        response, body = self._get(url, self.cache.conditional_headers(entry), cancel)
+        if response.status_code == 304 and entry is not None:
+            # 更新されていないので保存済みの本文を使う
+            self.cache.record_revalidation(url)
+            return json.loads(entry[0])
+        response.raise_for_status()
+        self.cache.put(url, body, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return json.loads(body)
+
+    # キャッシュに残っている本文の (データ, 取得時刻) を返す。なければ None
+    # 通信できないときに、古くても前回取得したデータを表示するのに使う
+    def get_cached_json(self, url):
+        if self.cache is None:
+            return None
+        entry = self.cache.get(url)
+        if entry is None:
+            return None
+        return json.loads(entry[0]), entry[3]
+
+    # 地域リスト(area.json)
+    def fetch_area(self):
+        return self.get_json(self.area_url)
+
+    # 府県予報区ごとの天気予報
+    def fetch_forecast(self, code, cancel=None, revalidate=False):
+        return self.get_json(self.forecast_url.format(code=code), cancel, revalidate)
+
+    def cached_forecast(self, code):
+        return self.get_cached_json(self.forecast_url.format(code=code))
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# アプリ全体で共有するクライアント（キャッシュはこのファイルと同じ場所に置く）
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "http_cache.db")
+            _client = JMAClient(cache=HTTPCache(cache_path))
+        return _client
@@ -1,54 +1,18 @@
+import os
+import threading
 import flet as ft
-import requests
 from datetime import datetime, timezone, timedelta
 from weather_code import CODE_TO_TEXT, WEATHER_COLORS
-from db import WeatherDB
-
-# ヘルパー関数で、天気文を短く整形するし、わかりやすくする
-def format_short_weather_text(text):
-    remove_words = ["所により", "を伴う", "山沿いでは", "平地では", "付近", "から", "にかけて"]
-    cleaned_text = text
-    for word in remove_words: 
-        #不要な語句を削除
-        cleaned_text = cleaned_text.replace(word, "") 
-    # 全角スペースを半角に変換し、連続スペースを単一スペースに
-    cleaned_text = cleaned_text.replace("　", " ")
-    cleaned_text = " ".join(cleaned_text.split())
-    return cleaned_text
-
-# 天気テキストからアイコンと色を決定し、表示用のコントロールを作成するヘルパー関数
-def create_weather_display_from_text(weather_text):
-    weather_keywords = {
-        "雪": (ft.Icons.SNOWING, ft.Colors.CYAN),
-        "雷": (ft.Icons.THUNDERSTORM, ft.Colors.YELLOW_900),
-        "雨": (ft.Icons.WATER_DROP, ft.Colors.BLUE),
-        "晴": (ft.Icons.SUNNY, ft.Colors.ORANGE),
-        "曇": (ft.Icons.CLOUD, ft.Colors.GREY),
-        "くもり": (ft.Icons.CLOUD, ft.Colors.GREY)
-    }
-    found_items = []
-    # テキスト内のキーワードを検索
-    for word, (icon, color) in weather_keywords.items():
-        # キーワードがテキストに含まれているかチェック
-        index = weather_text.find(word)
-        if index != -1:
-            found_items.append({"index": index, "icon": icon, "color": color})
-    # キーワードの出現順にソート
-    found_items.sort(key=lambda x: x["index"])
-
-    # 複数キーワードが見つかった場合の処理
-    if len(found_items) >= 2:
-        first, second = found_items[0], found_items[1]
-        # 「のち」があれば矢印、それ以外（時々など）は区切り線
-        separator = ft.Icon(ft.Icons.ARROW_FORWARD, color=ft.Colors.GREY_400, size=24) if "のち" in weather_text else ft.Text("|", size=30, color=ft.Colors.GREY_300)
-        # 2つのアイコンを横並びで表示
-        return ft.Row([ft.Icon(first["icon"], color=first["color"], size=40), separator, ft.Icon(second["icon"], color=second["color"], size=40)], alignment=ft.MainAxisAlignment.CENTER, spacing=5)
-    elif len(found_items) == 1:
-        item = found_items[0]
-        # 単一アイコンを表示
-        return ft.Icon(item["icon"], color=item["color"], size=70)
-    else:
-        return ft.Icon(ft.Icons.HELP_OUTLINE, color=ft.Colors.GREY_300, size=50)
+from weather_render import get_weather_render
+from forecast_cards import ForecastGrid, format_age
+from sidebar import RegionSidebar
+from db import WeatherDB, acquire_compaction, release_compaction
+from jma_client import get_client
+from regions import RegionStore, load_region_data
+from forecast_data import fetch_parsed_forecast
+from prefetch import prefetch_all
+from click_pipeline import LatestClickPipeline
+from scheduler import get_scheduler, last_publish_time
 
 
 # メイン
@@ -59,43 +23,15 @@ def main(page: ft.Page):
     page.scroll = None # スクロール無効
 
     db = WeatherDB()
+    client = get_client()
 
     # アプリ起動時に天気の定義（晴れ、曇りなど）をDBに登録する
     db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
-
-    def update_background_theme(weather_text):
-            target_color = ft.Colors.BLUE_GREY_50
-            for keyword, color in WEATHER_COLORS.items():
-                if keyword in weather_text:
-                    target_color = color
-                    break
-            page.bgcolor = target_color
-            page.update()
+    # 古い予報の整理をバックグラウンドで定期実行する（プロセスで1つだけ。最後の画面が閉じたら止める）
+    acquire_compaction(db.db_name)
 
     JST = timezone(timedelta(hours=9))
 
-    # 地域リストの準備
-    # APIで地域リストを取得し、地域名とコードの辞書を作成
-    region_data = {}
-    try:
-        area_url = "http://www.jma.go.jp/bosai/common/const/area.json"
-        area_json = requests.get(area_url).json()
-        center_data = area_json.get('centers', {}) 
-        office_data = area_json.get('offices', {}) 
-        
-        # 地域ごとのリスト作成
-        for center_code, center_info in center_data.items():
-            center_name = center_info['name']
-            office_codes = center_info.get('children', [])
-            office_list = []
-            for office_code in office_codes:
-                office_info = office_data.get(office_code, {})
-                office_list.append({"name": office_info.get('name', '不明'), "code": office_code})
-            region_data[center_name] = office_list
-    except Exception as e:
-        page.add(ft.Text(f"地域リスト取得エラー: {e}"))
-        return
-    
     # 天気表示エリア　
     cards_grid = ft.GridView(
         expand=True,
@@ -106,120 +42,183 @@ def main(page: ft.Page):
         run_spacing=15,
         padding=20,
     ) 
+    forecast_grid = ForecastGrid(cards_grid)
 
     # 取得・表示処理
-    def get_and_show_weather(e):
-        cards_grid.controls.clear()
-        cards_grid.controls.append(ft.Container(content=ft.ProgressRing(), alignment=ft.alignment.center, expand=True))
+    # 保存済みの予報があればDBからすぐに表示し（古さも表示）、最新の予報は裏で取りに行く
+    # 通信・解析・DB処理はクリック用のスレッドで行い、イベントハンドラはすぐに戻る
+    # 新しいクリックがあれば古い取得は取り消し、古い結果は表示しない
+    # 通信できなければ保存済みの予報をそのまま表示しておく（オフライン表示）
+    pipeline = LatestClickPipeline()
+    current_office = {'code': None}  # 表示中の地域
+    prefetch_cancel = threading.Event()  # 画面が閉じられたら先読みをやめる
+
+    # 画面が閉じられたら、先読みとクリックの処理を止め、整理の利用をやめてこの画面の接続を閉じる
+    def close_session(e=None):
+        prefetch_cancel.set()
+        pipeline.shutdown()
+        release_compaction()
+        db.close()
+
+    page.on_disconnect = close_session
+
+    # 保存済みの最新の予報の (行, (発表日時, 保存日時)) を返す。なければ None
+    def load_stored(office_code):
+        db_rows = db.get_latest_forecast(office_code)
+        if not db_rows:
+            return None
+        return db_rows, db.get_latest_forecast_meta(office_code)
+
+    # 予報を取得してDBに保存し、最新の予報を返す（別スレッドで実行）
+    def load_forecast(office_code, office_name, cancel):
+        # 実際に読みに行くのは fetch_code のファイル（十勝・奄美は別の地域のファイル）
+        # 解析済みの予報はファイルごとに覚えておき、地域は索引から引く
+        office, center_name = sidebar.office_index.get(office_code, ({"code": office_code}, ""))
+        parsed = fetch_parsed_forecast(client, office, cancel)
+        report_datetime, daily_list = parsed.weekly_report(office_code, office.get("area_codes", ()))
+
+        # DB保存用の地域情報を作成
+        area_info = {
+            'id': office_code,
+            'name': office_name,
+            'c_id': office.get("center_id", ""),
+            'c_name': center_name,
+            'report_datetime': report_datetime,  # 同じ発表なら再保存しない
+        }
+
+        # DB保存と表示の処理
+        db.save_weather_report(area_info, daily_list)
+        return load_stored(office_code)
+
+    # 保存済みの予報の発表日時（なければ保存した日時）。分からなければ None
+    def forecast_time(meta):
+        report_datetime, saved_at = meta
+        try:
+            return datetime.fromisoformat(report_datetime) if report_datetime else datetime.strptime(saved_at, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            return None
+
+    # 保存済みの予報の古さ
+    def forecast_age(meta):
+        when = forecast_time(meta)
+        if when is None:
+            return "発表日時不明"
+        local_time = when.astimezone(JST) if when.tzinfo else when
+        return f"{format_age(when)}の発表 ({local_time:%m/%d %H:%M})"
+
+    # 保存済みの予報が最後の発表時刻より後の発表なら、最新が入っているとみなす
+    # （週間予報は11時・17時の発表なので5時〜11時は取りに行くが、変わっていなければ条件付きGETの 304 で済む）
+    def is_latest(meta):
+        when = forecast_time(meta)
+        return when is not None and when.astimezone(JST) >= last_publish_time(datetime.now(JST))
+
+    # カードは作り直さず、変わった値だけを更新して1回の page.update() で送る
+    def show_forecast(stored, offline=False):
+        if stored is None:
+            return
+        db_rows, meta = stored
+        forecasts = []
+        for row in db_rows:
+            # 天気コードごとに作っておいた表示情報を引くだけ
+            render = get_weather_render(row['weather_code'], row['description'])
+            min_t = f"{row['temp_min']}℃" if row['temp_min'] is not None else "--"
+            max_t = f"{row['temp_max']}℃" if row['temp_max'] is not None else "--"
+            forecasts.append((row['date'], render, min_t, max_t))
+        forecast_grid.show_forecasts(forecasts)
+        if offline:
+            forecast_grid.show_status(f"オフライン: 保存済みの予報を表示しています（{forecast_age(meta)}）", offline=True)
+        else:
+            forecast_grid.show_status(forecast_age(meta))
+        if forecasts:
+            # 背景色も1日目の天気の表示情報から決める
+            page.bgcolor = forecasts[0][1].bg_color
+        page.update()
+
+    def show_error(err):
+        forecast_grid.show_error(f"エラー: {err}")
         page.update()
 
+    @pipeline.instrument
+    def get_and_show_weather(e):
         # 1. 選択された地域コードを取得
         office_code = e.control.data
-        
-        #「十勝・奄美」の例外を判定
-        mapping = {
-            "014030": "014100",  # 十勝 -> 釧路・根室・十勝セットのファイルを指定
-            "460040": "460100",  # 奄美 -> 鹿児島県セットのファイルを指定
-        }
-        fetch_code = mapping.get(office_code, office_code)
-        
-        # 実際に読みに行くURLを修正
-        weather_url = f"https://www.jma.go.jp/bosai/forecast/data/forecast/{fetch_code}.json"
-        
-        try:
-            response_data = requests.get(weather_url).json()
-            if len(response_data) <= 1:
-                raise Exception("週間予報データがありません")
+        office_name = e.control.title.value
+        current_office['code'] = office_code
+        token = pipeline.begin()
+
+        # 2. 保存済みの予報があればすぐに表示する（DBから数ミリ秒で読める）
+        stored = load_stored(office_code)
+        if stored is not None:
+            show_forecast(stored)
+            if is_latest(stored[1]):
+                # 先読み・定期更新で最新の予報が入っているので通信しない
+                return
+        else:
+            forecast_grid.show_progress()
+            page.update()
 
-            # 週間予報データ(index 1)を解析
-            weekly_data = response_data[1]
-            time_series = weekly_data['timeSeries']
-            
-            # 複数の地域が入っている中から、選んだ地域の「インデックス」を探す
-            area_index = 0
-            for i, area in enumerate(time_series[0]['areas']):
-                if area['area']['code'] == office_code:
-                    area_index = i
-                    break
-            
-            # 探し出したarea_indexを使ってデータを取得。[0] ではなく [area_index] を使う
-            dates = time_series[0]['timeDefines']
-            weather_codes = time_series[0]['areas'][area_index]['weatherCodes']
-            
-            # 気温データ側（timeSeries[1]）でも同じarea_indexを使用
-            temps_min = time_series[1]['areas'][area_index].get('tempsMin', [None] * len(dates))
-            temps_max = time_series[1]['areas'][area_index].get('tempsMax', [None] * len(dates))
-
-            # DB保存用の地域情報を作成
-            area_info = {
-                'id': office_code,
-                'name': e.control.title.value,
-                'c_id': "center_id_sample",
-                'c_name': "center_name_sample"
-            }
-
-            # DB保存と表示の処理
-            daily_list = []
-            for i in range(len(dates)):
-                daily_list.append({
-                    'date': dates[i][:10], 
-                    'w_code': weather_codes[i],
-                    'min_t': temps_min[i],
-                    'max_t': temps_max[i]
-                })
-            
-            db.save_weather_report(area_info, daily_list)
-            db_rows = db.get_latest_forecast(office_code)
-
-            cards_grid.controls.clear()
-            for row in db_rows:
-                weather_desc = row['description']
-                min_t = f"{row['temp_min']}℃" if row['temp_min'] is not None else "--"
-                max_t = f"{row['temp_max']}℃" if row['temp_max'] is not None else "--"
-
-                cards_grid.controls.append(
-                    ft.Container(
-                        padding=20, bgcolor=ft.Colors.WHITE, border_radius=15, 
-                        shadow=ft.BoxShadow(spread_radius=1, blur_radius=10, color=ft.Colors.BLUE_GREY_100),
-                        content=ft.Column([
-                            ft.Text(row['date'], weight="bold"),
-                            ft.Container(content=create_weather_display_from_text(weather_desc), height=80, alignment=ft.alignment.center),
-                            ft.Text(format_short_weather_text(weather_desc), size=13, weight="bold", text_align=ft.TextAlign.CENTER),
-                            ft.Row([
-                                ft.Text(min_t, color=ft.Colors.BLUE, weight="bold"),
-                                ft.Text("/", color=ft.Colors.GREY),
-                                ft.Text(max_t, color=ft.Colors.RED, weight="bold"),
-                            ], alignment=ft.MainAxisAlignment.CENTER)
-                        ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
-                    )
-                )
-            if db_rows:
-                update_background_theme(db_rows[0]['description'])
+        # 3. 最新の予報を取りに行く。失敗しても保存済みの予報があればオフライン表示にする
+        def on_error(err):
+            if stored is not None:
+                print(f"予報の取得に失敗しました: {err}")
+                show_forecast(stored, offline=True)
+            else:
+                show_error(err)
 
-        except Exception as err:
-            cards_grid.controls.clear()
-            cards_grid.controls.append(ft.Text(f"エラー: {err}", color=ft.Colors.RED))
-        page.update()
+        pipeline.run(token, lambda cancel: load_forecast(office_code, office_name, cancel), show_forecast, on_error)
             
 
     # サイドバーとレイアウト
-    sidebar_controls = []
-    sidebar_controls.append(ft.Container(padding=15, bgcolor=ft.Colors.BLUE_GREY_700, content=ft.Text("地域を選択", weight="bold", color=ft.Colors.WHITE, size=16)))
-    
-     # 地域ごとに展開タイルを作成
-    for center_name, office_list in region_data.items():
-        office_tiles = []
-        for office in office_list:
-            office_tiles.append(
-                ft.ListTile(title=ft.Text(office["name"], color=ft.Colors.WHITE70), data=office["code"], on_click=get_and_show_weather, bgcolor=ft.Colors.BLUE_GREY_800)
-            )
-        # 展開タイルをサイドバーに追加
-        sidebar_controls.append(
-            ft.ExpansionTile(title=ft.Text(center_name, size=14, color=ft.Colors.WHITE), controls=office_tiles, collapsed_text_color=ft.Colors.WHITE, icon_color=ft.Colors.WHITE, bgcolor=ft.Colors.BLUE_GREY_900, dense=True)
-        )
+    # 地方ごとの地域タイルは展開されたときに作る（起動時に送るコントロールを減らす）
+    sidebar = RegionSidebar({}, on_select=get_and_show_weather)
+
+    # 裏で取り直した地域リストが変わっていたらサイドバーを作り直し、定期更新の地域リストも差し替える
+    def rebuild_sidebar(region_data):
+        sidebar.set_region_data(region_data)
+        page.update()
+        get_scheduler(client, region_data, db.db_name).set_region_data(region_data)
+
+    # 地域リストの準備
+    # 前回保存した地域リストがあればすぐに使い、最新の area.json は裏で取り直す
+    region_store = RegionStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), "region_data.json"))
+    try:
+        region_data = load_region_data(client, region_store, on_update=rebuild_sidebar)
+    except Exception as e:
+        page.add(ft.Text(f"地域リスト取得エラー: {e}"))
+        return
+
+    sidebar.set_region_data(region_data)
+
+    # 全地域の予報を裏で先読みしておき、クリック時はDBから読むだけにする
+    def run_prefetch():
+        try:
+            prefetch_all(client, db, region_data, concurrency=8, per_second=10, cancel=prefetch_cancel)
+        except Exception as err:
+            if not prefetch_cancel.is_set():
+                print(f"先読みに失敗しました: {err}")
+
+    threading.Thread(target=run_prefetch, name="prefetch", daemon=True).start()
+
+    # 発表時刻ごとの定期更新（プロセス内で共有）で、表示中の地域が更新されたら表示し直す
+    def on_forecasts_updated(changed_codes):
+        office_code = current_office['code']
+        if office_code in changed_codes:
+            token = pipeline.begin()
+            pipeline.run(token, lambda cancel: load_stored(office_code), show_forecast, show_error)
+
+    scheduler = get_scheduler(client, region_data, db.db_name)
+    scheduler.subscribe(on_forecasts_updated)
+
+    def on_disconnect(e):
+        scheduler.unsubscribe(on_forecasts_updated)
+        close_session(e)
+
+    page.on_disconnect = on_disconnect
     # レイアウト構築
-    sidebar = ft.Container(width=250, bgcolor=ft.Colors.BLUE_GREY_900, content=ft.ListView(controls=sidebar_controls, padding=0, spacing=0)) 
-    weather_display_container = ft.Container(content=cards_grid, expand=True) 
+    weather_display_container = ft.Container(
+        content=ft.Column([ft.Container(content=forecast_grid.status, padding=ft.padding.only(left=20, top=10)), cards_grid], expand=True, spacing=0),
+        expand=True,
+    ) 
     layout = ft.Row(controls=[sidebar, weather_display_container], expand=True, spacing=0)
     page.add(layout)
 
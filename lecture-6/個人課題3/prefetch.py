@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from forecast_data import ParsedForecast, fetch_code_for
+from jma_client import FetchCancelled
+
+
+# ホストごとに1秒あたりの要求数を制限する
+class HostRateLimiter:
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next_time = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_time.get(host, now))
+            self._next_time[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# region_data のすべての地域の予報を並行して取得し、WeatherDB にまとめて保存する
+# concurrency: 同時に取得するファイル数、per_second: ホストごとの1秒あたりの要求数（None なら無制限）
+# batch_size: 何地域ずつ保存するか（取得・解析は DB の書き込みロックの外で行い、保存のときだけロックを取る）
+# revalidate: HTTPキャッシュの ttl 以内でも条件付きGETで確かめる（発表時刻の後の定期更新用）
+# cancel: セットされたら（画面が閉じられたときなど）残りの取得と保存をやめる
+# 戻り値は統計情報（'office_codes' に保存できた地域コード）
+def prefetch_all(client, db, region_data, concurrency=8, per_second=None, batch_size=50, revalidate=False,
+                 cancel=None):
+    # 地域ごとに読みに行くファイルをまとめる（十勝・奄美は他の地域と同じファイル）
+    offices_by_file = {}
+    for center_name, office_list in region_data.items():
+        for office in office_list:
+            offices_by_file.setdefault(fetch_code_for(office), []).append((office, center_name))
+
+    limiter = HostRateLimiter(per_second)
+    stats = {'files': len(offices_by_file), 'office_codes': [], 'errors': {}, 'seconds': 0.0, 'cancelled': False}
+    start = time.perf_counter()
+
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+
+    def fetch(fetch_code):
+        if cancelled():
+            raise FetchCancelled(fetch_code)
+        limiter.wait(client.forecast_url.format(code=fetch_code))
+        return client.fetch_forecast(fetch_code, cancel, revalidate=revalidate)
+
+    # 取得できたものから順に (area_info, daily_list) を返す
+    def reports(executor):
+        futures = {executor.submit(fetch, code): code for code in offices_by_file}
+        for future in as_completed(futures):
+            if cancelled():
+                for pending in futures:
+                    pending.cancel()
+                return
+            fetch_code = futures[future]
+            try:
+                response_data = future.result()
+            except Exception as err:
+                stats['errors'][fetch_code] = str(err)
+                continue
+            # ファイルごとに1度だけ解析し、各地域は索引から引く
+            parsed = ParsedForecast(response_data)
+            for office, center_name in offices_by_file[fetch_code]:
+                try:
+                    report_datetime, daily_list = parsed.weekly_report(office["code"], office.get("area_codes", ()))
+                except Exception as err:
+                    stats['errors'][office["code"]] = str(err)
+                    continue
+                area_info = {
+                    'id': office["code"],
+                    'name': office["name"],
+                    'c_id': office.get("center_id", ""),
+                    'c_name': center_name,
+                    'report_datetime': report_datetime,
+                }
+                stats['office_codes'].append(office["code"])
+                yield area_info, daily_list
+
+    # 通信を待つ間は書き込みロックを持たないので、クリック時の保存や読み込みキャッシュを止めない
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="prefetch") as executor:
+        batch = []
+        for report in reports(executor):
+            batch.append(report)
+            if len(batch) >= batch_size:
+                db.save_weather_reports_bulk(batch)
+                batch = []
+        if batch and not cancelled():
+            db.save_weather_reports_bulk(batch)
+    stats['cancelled'] = cancelled()
+    stats['seconds'] = time.perf_counter() - start
+    return stats
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+import time
+
+
+# 予報ファイルのコードを求める
+# 府県予報区のコードは "00" で終わる。そうでない地域（十勝・奄美）は、
+# 同じ地方にある上3桁が同じ府県予報区のファイルに含まれている
+def _fetch_code(office_code, sibling_codes):
+    if office_code.endswith("00"):
+        return office_code
+    for code in sibling_codes:
+        if code != office_code and code.endswith("00") and code[:3] == office_code[:3]:
+            return code
+    return office_code
+
+
+# area.json から {地方名: [{"name", "code", "center_id", "fetch_code", "area_codes"}, ...]} の形の地域リストを作る
+# fetch_code: 読みに行く予報ファイルのコード、area_codes: 地域に含まれる一次細分区域(class10)のコード
+def parse_region_data(area_json):
+    center_data = area_json.get('centers', {})
+    office_data = area_json.get('offices', {})
+    region_data = {}
+    for center_code, center_info in center_data.items():
+        office_list = []
+        office_codes = center_info.get('children', [])
+        for office_code in office_codes:
+            office_info = office_data.get(office_code, {})
+            office_list.append({
+                "name": office_info.get('name', '不明'),
+                "code": office_code,
+                "center_id": center_code,
+                "fetch_code": _fetch_code(office_code, office_codes),
+                "area_codes": office_info.get('children', []),
+            })
+        region_data[center_info['name']] = office_list
+    return region_data
+
+
+# fetch_code・area_codes がない古い形式で保存された地域リストを補う
+# （fetch_code がないと十勝・奄美が存在しないファイルを読みに行ってしまう）
+# area_codes は area.json がないと分からないので、裏で取り直すまでは空にしておく
+def _upgrade_region_data(region_data):
+    for office_list in region_data.values():
+        office_codes = [office["code"] for office in office_list]
+        for office in office_list:
+            office.setdefault("fetch_code", _fetch_code(office["code"], office_codes))
+            office.setdefault("area_codes", [])
+    return region_data
+
+
+# 地域リストをJSONファイルに保存しておき、次回の起動ではネットワークを待たずに使う
+class RegionStore:
+    def __init__(self, path):
+        self.path = path
+
+    # 保存済みの (region_data, 保存時刻) を返す。なければ None
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            return _upgrade_region_data(snapshot['region_data']), snapshot['saved_at']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, region_data):
+        # 書きかけのファイルを読まないよう、一時ファイルに書いてから置き換える
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'saved_at': time.time(), 'region_data': region_data},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+
+# 地域リストを用意する
+# 保存済みならすぐそれを返し、裏で最新の area.json を取り直す（変わっていれば on_update を呼ぶ）
+# 保存されていなければその場で取得する（失敗したら例外）
+def load_region_data(client, store, on_update=None):
+    cached = store.load()
+    if cached is None:
+        region_data = parse_region_data(client.fetch_area())
+        store.save(region_data)
+        return region_data
+
+    region_data = cached[0]
+
+    def refresh():
+        try:
+            latest = parse_region_data(client.fetch_area())
+        except Exception as err:
+            print(f"地域リストの更新に失敗しました: {err}")
+            return
+        if latest != region_data:
+            store.save(latest)
+            if on_update is not None:
+                on_update(latest)
+
+    threading.Thread(target=refresh, name="region-refresh", daemon=True).start()
+    return region_data
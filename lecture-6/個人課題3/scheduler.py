@@ -0,0 +1,166 @@
+import argparse
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from db import WeatherDB
+from jma_client import get_client
+from prefetch import prefetch_all
+from regions import RegionStore, load_region_data
+from weather_code import CODE_TO_TEXT, WEATHER_COLORS
+
+JST = timezone(timedelta(hours=9))
+# 気象庁が府県天気予報を発表する時刻（日本時間）
+PUBLISH_HOURS = (5, 11, 17)
+
+
+# now より後の最初の「発表時刻 + delay_minutes 分」を返す
+def next_run_time(now, publish_hours=PUBLISH_HOURS, delay_minutes=10):
+    now = now.astimezone(JST)
+    for days in (0, 1):
+        day = now.date() + timedelta(days=days)
+        for hour in sorted(publish_hours):
+            run_at = datetime(day.year, day.month, day.day, hour, tzinfo=JST) + timedelta(minutes=delay_minutes)
+            if run_at > now:
+                return run_at
+    raise ValueError("publish_hours が空です")
+
+
+# now 以前の最後の発表時刻を返す（保存済みの予報が最新かどうかの判定に使う）
+def last_publish_time(now, publish_hours=PUBLISH_HOURS):
+    now = now.astimezone(JST)
+    for days in (0, -1):
+        day = now.date() + timedelta(days=days)
+        for hour in sorted(publish_hours, reverse=True):
+            published = datetime(day.year, day.month, day.day, hour, tzinfo=JST)
+            if published <= now:
+                return published
+    raise ValueError("publish_hours が空です")
+
+
+# 発表時刻の少し後に全地域の予報を取り直し、発表日時が変わった地域を購読者に知らせる
+# 取得は条件付きGET（HTTPCache）なので、更新されていないファイルは 304 で済む
+class RefreshScheduler:
+    def __init__(self, client, db, region_data, publish_hours=PUBLISH_HOURS, delay_minutes=10,
+                 concurrency=8, per_second=10):
+        self.client = client
+        self.db = db
+        self.region_data = region_data
+        self.publish_hours = publish_hours
+        self.delay_minutes = delay_minutes
+        self.concurrency = concurrency
+        self.per_second = per_second
+        self.last_stats = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # 更新があったとき callback(変わった地域コードのリスト) を呼ぶ
+    def subscribe(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    # 裏で取り直した地域リストに差し替える（次の更新から使う）
+    # 古い形式の region_data.json から始めたときは area_codes が空なので、取り直すまで多くの地域が引けない
+    def set_region_data(self, region_data):
+        with self._lock:
+            self.region_data = region_data
+
+    # 1回分の更新。発表日時が変わった地域コードのリストを返す
+    # 発表時刻の直前に取得したファイルは HTTPキャッシュの ttl 以内でも古いので、必ず条件付きGETで確かめる
+    def run_once(self):
+        with self._lock:
+            region_data = self.region_data
+        before = self.db.get_report_datetimes()
+        stats = prefetch_all(self.client, self.db, region_data, self.concurrency, self.per_second,
+                             revalidate=True)
+        after = self.db.get_report_datetimes()
+        changed = [code for code in stats['office_codes'] if after.get(code) != before.get(code)]
+        stats['changed'] = changed
+        self.last_stats = stats
+
+        if changed:
+            with self._lock:
+                listeners = list(self._listeners)
+            for callback in listeners:
+                try:
+                    callback(changed)
+                except Exception as err:
+                    print(f"更新の通知に失敗しました: {err}")
+        return changed
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            run_at = next_run_time(datetime.now(JST), self.publish_hours, self.delay_minutes)
+            if self._stop.wait((run_at - datetime.now(JST)).total_seconds()):
+                break
+            try:
+                changed = self.run_once()
+                print(f"{datetime.now(JST):%Y-%m-%d %H:%M} 更新: {len(changed)} 地域 "
+                      f"(エラー {len(self.last_stats['errors'])})")
+            except Exception as err:
+                print(f"定期更新に失敗しました: {err}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="refresh-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# プロセス内で共有するスケジューラ（最初に呼ばれたときに開始する）
+# スケジューラ用の WeatherDB（接続）は、スケジューラを作るときに1度だけ開く
+# 地域リストは最初の画面のものを使い、取り直したら set_region_data で差し替える
+def get_scheduler(client, region_data, db_name="weather_app.db"):
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RefreshScheduler(client, WeatherDB(db_name), region_data)
+            _scheduler.start()
+        return _scheduler
+
+
+# 画面なしで定期更新だけを行う（1つのプロセスでDBを最新に保ち、複数の画面から読む）
+# 使い方: python scheduler.py [--db weather_app.db] [--once]
+def main():
+    parser = argparse.ArgumentParser(description="天気予報の定期更新")
+    parser.add_argument("--db", default="weather_app.db")
+    parser.add_argument("--once", action="store_true", help="今すぐ1回だけ更新して終了する")
+    args = parser.parse_args()
+
+    db = WeatherDB(args.db)
+    db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+    client = get_client()
+    region_store = RegionStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), "region_data.json"))
+    scheduler = RefreshScheduler(client, db, load_region_data(client, region_store))
+    if args.once:
+        print(f"更新: {len(scheduler.run_once())} 地域")
+        return
+    print(f"次の更新: {next_run_time(datetime.now(JST)):%Y-%m-%d %H:%M}")
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import flet as ft
+
+_VALUES = ""  # 木の節点で、そこで終わるキーの値を入れる場所（1文字のキーとは重ならない）
+
+
+# 前方一致検索用のトライ木（地域名・地域コードから地域を引く）
+class PrefixIndex:
+    def __init__(self):
+        self._root = {}
+
+    def add(self, key, value):
+        node = self._root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node.setdefault(_VALUES, []).append(value)
+
+    # prefix で始まるキーの値を、最大 limit 件返す（同じ値は1回だけ）
+    def search(self, prefix, limit=20):
+        node = self._root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        results = []
+        seen = set()
+        stack = [node]
+        while stack and len(results) < limit:
+            node = stack.pop()
+            for value in node.get(_VALUES, ()):
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    results.append(value)
+            # 辞書順に取り出せるよう逆順に積む
+            stack.extend(node[ch] for ch in sorted(node, reverse=True) if ch != _VALUES)
+        return results[:limit]
+
+
+# 地域選択のサイドバー
+# 地方ごとの展開タイルの中身（地域のタイル）は、最初に開かれたときに作る
+# 上の検索欄では地域名・地域コードの前方一致で地域を探せる
+class RegionSidebar(ft.Container):
+    def __init__(self, region_data, on_select, search_limit=20):
+        self.on_select = on_select
+        self.search_limit = search_limit
+        self.office_index = {}  # 地域コード -> (地域, 地方名)
+        self._search_index = PrefixIndex()
+        self._pending = {}  # まだタイルを作っていない地方 -> 地域リスト
+
+        self.search_field = ft.TextField(
+            hint_text="地域名・コードで検索", dense=True, border_color=ft.Colors.BLUE_GREY_400,
+            color=ft.Colors.WHITE, hint_style=ft.TextStyle(color=ft.Colors.WHITE54),
+            on_change=self._on_search,
+        )
+        self.search_results = ft.Column(spacing=0, visible=False)
+        self.center_tiles = ft.Column(spacing=0)
+        super().__init__(
+            width=250, bgcolor=ft.Colors.BLUE_GREY_900,
+            content=ft.ListView(controls=[
+                ft.Container(padding=15, bgcolor=ft.Colors.BLUE_GREY_700, content=ft.Text("地域を選択", weight="bold", color=ft.Colors.WHITE, size=16)),
+                ft.Container(padding=10, content=self.search_field),
+                self.search_results,
+                self.center_tiles,
+            ], padding=0, spacing=0),
+        )
+        self.set_region_data(region_data)
+
+    # 地域リストを設定する（裏で取り直した地域リストが変わったときも呼ぶ）
+    def set_region_data(self, region_data):
+        self.office_index = {}
+        self._search_index = PrefixIndex()
+        self._pending = {}
+        center_tiles = []
+        for center_name, office_list in region_data.items():
+            for office in office_list:
+                self.office_index[office["code"]] = (office, center_name)
+                self._search_index.add(office["name"], office)
+                self._search_index.add(office["code"], office)
+            self._pending[center_name] = office_list
+            # 地方ごとに展開タイルを作成（中身は開いたときに作る）
+            center_tiles.append(
+                ft.ExpansionTile(title=ft.Text(center_name, size=14, color=ft.Colors.WHITE), controls=[], data=center_name, on_change=self._on_expand, collapsed_text_color=ft.Colors.WHITE, icon_color=ft.Colors.WHITE, bgcolor=ft.Colors.BLUE_GREY_900, dense=True)
+            )
+        self.center_tiles.controls = center_tiles
+        self.search_results.controls = []
+        self.search_results.visible = False
+
+    def _office_tile(self, office):
+        return ft.ListTile(title=ft.Text(office["name"], color=ft.Colors.WHITE70), data=office["code"], on_click=self.on_select, bgcolor=ft.Colors.BLUE_GREY_800)
+
+    def _on_expand(self, e):
+        tile = e.control
+        office_list = self._pending.pop(tile.data, None)
+        if office_list is not None:
+            tile.controls = [self._office_tile(office) for office in office_list]
+            tile.update()
+
+    def _on_search(self, e):
+        query = self.search_field.value.strip()
+        if query:
+            offices = self._search_index.search(query, self.search_limit)
+            self.search_results.controls = [self._office_tile(office) for office in offices]
+            self.search_results.visible = True
+        else:
+            self.search_results.controls = []
+            self.search_results.visible = False
+        self.search_results.update()
@@ -0,0 +1,144 @@
+# bench.py とテストで使う、気象庁APIのダミーデータとローカルのスタブサーバ
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from jma_client import JMAClient
+from weather_code import CODE_TO_TEXT
+
+
+# ダミーの週間予報データ（7日分）を作る
+def sample_daily_list(seed=0, days=7):
+    codes = list(CODE_TO_TEXT.keys())
+    daily_list = []
+    for i in range(days):
+        daily_list.append({
+            'date': f"2026-01-{i + 1:02d}",
+            'w_code': codes[(seed + i) % len(codes)],
+            'min_t': float((seed + i) % 10),
+            'max_t': float((seed + i) % 10 + 8),
+        })
+    return daily_list
+
+
+def sample_area_info(office_code):
+    return {'id': office_code, 'name': f"地域{office_code}", 'c_id': "010100", 'c_name': "テスト地方"}
+
+
+# 気象庁の forecast/{code}.json と同じ形のダミーデータ
+# report_hour: 発表時刻（発表日時を変えると、同じ地域の別の発表になる）
+def sample_forecast_json(office_code, area_codes=None, seed=0, report_hour=11):
+    area_codes = area_codes or [office_code]
+    codes = list(CODE_TO_TEXT.keys())
+    base = datetime(2026, 1, 1, 0, 0)
+    report = (base + timedelta(hours=report_hour)).strftime("%Y-%m-%dT%H:%M:%S+09:00")
+    week = [(base + timedelta(days=i)).strftime("%Y-%m-%dT00:00:00+09:00") for i in range(7)]
+    weekly_weather = {
+        "timeDefines": week,
+        "areas": [{
+            "area": {"name": f"地域{code}", "code": code},
+            "weatherCodes": [codes[(seed + n + i) % len(codes)] for i in range(7)],
+            "pops": ["", "20", "30", "40", "50", "30", "20"],
+            "reliabilities": ["", "", "A", "B", "C", "B", "A"],
+        } for n, code in enumerate(area_codes)],
+    }
+    weekly_temps = {
+        "timeDefines": week,
+        "areas": [{
+            "area": {"name": f"観測点{code}", "code": f"{n:05d}"},
+            "tempsMin": [""] + [str((seed + n + i) % 10) for i in range(1, 7)],
+            "tempsMinUpper": [""] * 7,
+            "tempsMinLower": [""] * 7,
+            "tempsMax": [""] + [str((seed + n + i) % 10 + 8) for i in range(1, 7)],
+            "tempsMaxUpper": [""] * 7,
+            "tempsMaxLower": [""] * 7,
+        } for n, code in enumerate(area_codes)],
+    }
+    return [
+        {"publishingOffice": "気象台", "reportDatetime": report, "timeSeries": []},
+        {"publishingOffice": "気象台", "reportDatetime": report, "tempAverage": {"areas": []},
+         "precipAverage": {"areas": []}, "timeSeries": [weekly_weather, weekly_temps]},
+    ]
+
+
+# 気象庁の area.json と同じ形のダミーデータ（11地方・58府県予報区、細分区域も含めた大きさ）
+def sample_area_json(center_count=11, office_count=58, class20_count=1900):
+    centers, offices, class20s = {}, {}, {}
+    for n in range(office_count):
+        center_code = f"{(n % center_count + 1) * 10:04d}00"
+        office_code = f"{(n + 1) * 10:04d}00"
+        centers.setdefault(center_code, {"name": f"地方{center_code}", "enName": "Region", "children": []})
+        centers[center_code]["children"].append(office_code)
+        offices[office_code] = {"name": f"県{office_code}", "enName": "Pref", "officeName": "気象台",
+                                "parent": center_code, "children": []}
+    for n in range(class20_count):
+        class20s[f"{n:07d}"] = {"name": f"市町村{n}", "enName": "City", "kana": "しちょうそん", "parent": "0000000"}
+    return {"centers": centers, "offices": offices, "class10s": {}, "class15s": {}, "class20s": class20s}
+
+
+# 気象庁の代わりに使うローカルのHTTPサーバ（HTTP/1.1 keep-alive, gzip 対応）
+# delay 秒だけ応答を遅らせてネットワークの往復時間を再現できる
+class StubJMAServer:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = 0
+        self.conditional_requests = 0  # If-None-Match 付きで来た要求の数
+        self.forecasts = {}  # 地域コード -> 返す予報JSON（なければ sample_forecast_json）
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # keep-alive でヘッダと本文を別送信しても遅延しないように
+
+            def do_GET(self):
+                stub.requests += 1
+                if self.headers.get("If-None-Match"):
+                    stub.conditional_requests += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if self.path.endswith("area.json"):
+                    payload = sample_area_json()
+                else:
+                    code = self.path.rsplit("/", 1)[-1].split(".")[0]
+                    payload = stub.forecasts.get(code) or sample_forecast_json(code)
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("ETag", etag)
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.area_url = self.base_url + "/bosai/common/const/area.json"
+        self.forecast_url = self.base_url + "/bosai/forecast/data/forecast/{code}.json"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def client(self, **kwargs):
+        return JMAClient(area_url=self.area_url, forecast_url=self.forecast_url, **kwargs)
@@ -0,0 +1,104 @@
+# WeatherDB の保存・読み込み・接続のテスト
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from db import WeatherDB
+from stub_jma import sample_area_info, sample_daily_list
+from weather_code import CODE_TO_TEXT, WEATHER_COLORS
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = WeatherDB(str(tmp_path / "weather.db"))
+    db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+    yield db
+    db.close()
+
+
+def test_closed_db_does_not_reopen_connections(db):
+    db.save_weather_report(sample_area_info("130000"), sample_daily_list(0))
+    db.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        db.save_weather_report(sample_area_info("130000"), sample_daily_list(1))
+
+    # 別のスレッドからの読み込みも開き直さない
+    errors = []
+
+    def read():
+        try:
+            db.get_latest_forecast_meta("130000")
+        except sqlite3.ProgrammingError as err:
+            errors.append(err)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+    assert db._conns == []
+
+
+# 1回のまとめ書きに同じ発表が2つあっても、一意インデックスで巻き戻らず後の方が残る
+def test_bulk_keeps_last_duplicate_report(db):
+    corrected = dict(sample_area_info("130010"), report_datetime="2026-01-02T05:00:00+09:00")
+    db.save_weather_reports_bulk([(corrected, sample_daily_list(1)), (corrected, sample_daily_list(2))])
+    saved = db.get_latest_forecast("130010")
+    assert [row['weather_code'] for row in saved] == [d['w_code'] for d in sample_daily_list(2)]
+    assert db._get_conn().execute("SELECT COUNT(*) FROM forecasts").fetchone()[0] == 1
+
+
+def test_same_report_is_not_saved_twice(db):
+    area_info = dict(sample_area_info("130010"), report_datetime="2026-01-01T11:00:00+09:00")
+    db.save_weather_report(area_info, sample_daily_list(0))
+    db.save_weather_report(area_info, sample_daily_list(0))
+    assert db._get_conn().execute("SELECT COUNT(*) FROM daily_forecasts").fetchone()[0] == 7
+
+
+# 別のプロセスから1地域の予報を書き込む
+OTHER_PROCESS_WRITER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from db import WeatherDB
+db = WeatherDB(sys.argv[2])
+db.save_weather_report({'id': sys.argv[3], 'name': 'x', 'c_id': '010100', 'c_name': 'x'},
+                       [{'date': '2026-02-01', 'w_code': '100', 'min_t': -5.0, 'max_t': 5.0}])
+db.close()
+"""
+
+
+def test_read_cache_drops_only_written_area(db):
+    db.save_weather_reports_bulk((sample_area_info(f"{a:06d}"), sample_daily_list(a)) for a in range(3))
+    for a in range(3):
+        db.get_latest_forecast(f"{a:06d}")
+
+    db.save_weather_report(sample_area_info("000000"), sample_daily_list(999))
+    hits = db.cache_stats['hits']
+    assert [row['weather_code'] for row in db.get_latest_forecast("000000")] == [d['w_code'] for d in sample_daily_list(999)]
+    assert db.cache_stats['hits'] == hits
+    db.get_latest_forecast("000001")
+    assert db.cache_stats['hits'] == hits + 1
+
+
+def test_read_cache_sees_other_process_writes(db):
+    db.save_weather_report(sample_area_info("000002"), sample_daily_list(0))
+    db.get_latest_forecast("000002")
+    subprocess.run([sys.executable, "-c", OTHER_PROCESS_WRITER, os.path.dirname(os.path.abspath(__file__)),
+                    db.db_name, "000002"], check=True)
+    rows = db.get_latest_forecast("000002")
+    assert [(row['date'], row['temp_min']) for row in rows] == [("2026-02-01", -5.0)]
+
+
+# 天気コード表が変わったときは、変わった行だけを書き込む
+def test_seed_writes_only_changed_codes(db):
+    assert db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS) == 0
+    changed = dict(CODE_TO_TEXT)
+    code = next(iter(changed))
+    changed[code] = changed[code] + "（改）"
+    assert db.seed_weather_master(changed, WEATHER_COLORS) == 1
+    assert db.seed_weather_master(changed, WEATHER_COLORS) == 0
+    row = db._get_conn().execute("SELECT description FROM weather_codes WHERE weather_code = ?", (code,)).fetchone()
+    assert row[0] == changed[code]
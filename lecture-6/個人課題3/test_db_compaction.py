@@ -0,0 +1,84 @@
+# 古い予報の整理（WeatherDB.compact_history / start_compaction）のテスト
+import threading
+import time
+
+import pytest
+
+from db import WeatherDB, acquire_compaction, release_compaction
+from stub_jma import sample_area_info, sample_daily_list
+from weather_code import CODE_TO_TEXT, WEATHER_COLORS
+
+
+# areas 地域 x days 日分（1日 per_day 回）の履歴を作り、保存日時を過去にずらす
+def seed_history(db, areas=5, per_day=4, days=60):
+    db.save_weather_reports_bulk(
+        (sample_area_info(f"{a:06d}"), sample_daily_list(g))
+        for g in range(per_day * days) for a in range(areas)
+    )
+    conn = db._get_conn()
+    conn.execute("""
+        UPDATE forecasts SET datetime = datetime('now', 'localtime',
+            '-' || ((forecast_id - 1) / :areas / :per_day) || ' days',
+            '-' || ((forecast_id - 1) / :areas % :per_day) || ' hours')
+    """, {'areas': areas, 'per_day': per_day})
+    conn.commit()
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = WeatherDB(str(tmp_path / "compact.db"))
+    db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+    seed_history(db)
+    yield db
+    db.close()
+
+
+def test_compaction_keeps_latest_and_one_per_day(db):
+    stats = db.compact_history(keep_all_days=7, keep_months=1)
+    assert stats['deleted_forecasts'] > 0
+    conn = db._get_conn()
+    # どの地域も最新の予報は残る
+    assert conn.execute("SELECT COUNT(DISTINCT area_id) FROM forecasts").fetchone()[0] == 5
+    # 7日より古いものは地域ごとに1日1件まで
+    per_day = conn.execute("""
+        SELECT MAX(n) FROM (
+            SELECT COUNT(*) AS n FROM forecasts
+            WHERE datetime < datetime('now', 'localtime', '-7 days')
+            GROUP BY area_id, substr(datetime, 1, 10)
+        )
+    """).fetchone()[0]
+    assert per_day == 1
+
+
+def test_stop_ends_a_pass_between_batches(db):
+    stop = threading.Event()
+    stop.set()
+    stats = db.compact_history(batch_size=1, pause=1.0, stop=stop)
+    assert stats['batches'] == 0
+
+
+def test_stop_compaction_does_not_wait_for_the_whole_pass(db):
+    # 1件ずつ・0.01秒ずつ待つので、最後まで行うと数秒かかる
+    db.start_compaction(batch_size=1)
+    time.sleep(0.1)
+    start = time.perf_counter()
+    db.stop_compaction()
+    assert time.perf_counter() - start < 0.5
+    assert db.last_compaction_stats is None or db.last_compaction_stats['batches'] < 500
+
+
+def compaction_threads():
+    return [t for t in threading.enumerate() if t.name == "weather-db-compaction"]
+
+
+# 画面（セッション）がいくつ開いても整理のスレッドは1本で、最後の画面が閉じたら止まる
+def test_sessions_share_one_compaction_thread(tmp_path):
+    path = str(tmp_path / "shared.db")
+    for _ in range(3):
+        acquire_compaction(path)
+    try:
+        assert len(compaction_threads()) == 1
+    finally:
+        for _ in range(3):
+            release_compaction()
+    assert not compaction_threads()
@@ -0,0 +1,101 @@
+# 予報履歴の検索（iter_area_history / iter_date_evolution / get_temperature_summary）のテスト
+import math
+import sqlite3
+from array import array
+
+import pytest
+
+from db import WeatherDB
+from stub_jma import sample_area_info, sample_daily_list
+from weather_code import CODE_TO_TEXT, WEATHER_COLORS
+
+AREAS = ["000000", "000001", "000002"]
+GENERATIONS = 4
+
+
+def saved_at(generation):
+    return f"2026-01-0{generation + 1} 12:00:00"
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = WeatherDB(str(tmp_path / "history.db"))
+    db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+    for g in range(GENERATIONS):
+        reports = []
+        for a, area_id in enumerate(AREAS):
+            daily_list = sample_daily_list(g + a)
+            if area_id == "000002":
+                daily_list[2]['min_t'] = None  # 欠測
+            reports.append((sample_area_info(area_id), daily_list))
+        db.save_weather_reports_bulk(reports)
+    # 世代ごとに保存日時を1日ずつずらす（forecast_id は世代順・地域順に振られる）
+    conn = db._get_conn()
+    conn.execute("UPDATE forecasts SET datetime = '2026-01-0' || ((forecast_id - 1) / ? + 1) || ' 12:00:00'",
+                 (len(AREAS),))
+    conn.commit()
+    yield db
+    db.close()
+
+
+def plan(db, sql, params):
+    return [row[3] for row in db._get_conn().execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def test_area_history_rows_and_order(db):
+    rows = list(db.iter_area_history("000001", saved_at(1), saved_at(3)))
+    assert all(isinstance(row, sqlite3.Row) for row in rows)
+    # 世代1・2の7日分ずつ、保存日時 → 日付の順
+    assert [row['saved_at'] for row in rows] == [saved_at(1)] * 7 + [saved_at(2)] * 7
+    assert [row['date'] for row in rows[:7]] == [d['date'] for d in sample_daily_list()]
+    assert [row['weather_code'] for row in rows[7:]] == [d['w_code'] for d in sample_daily_list(2 + 1)]
+
+
+def test_area_history_as_columns(db):
+    columns = db.iter_area_history("000002", saved_at(0), saved_at(GENERATIONS), as_columns=True)
+    assert list(columns) == ["forecast_id", "saved_at", "report_datetime", "date", "weather_code", "temp_min", "temp_max"]
+    assert isinstance(columns['temp_min'], array) and columns['temp_min'].typecode == 'd'
+    assert isinstance(columns['date'], list)
+    assert len(columns['date']) == GENERATIONS * 7
+    # 欠測は NaN
+    assert [math.isnan(v) for v in columns['temp_min']].count(True) == GENERATIONS
+    assert math.isnan(columns['temp_min'][2])
+
+
+def test_date_evolution_follows_generations(db):
+    rows = list(db.iter_date_evolution("000000", "2026-01-03"))
+    assert [row['forecast_id'] for row in rows] == sorted(row['forecast_id'] for row in rows)
+    assert [row['saved_at'] for row in rows] == [saved_at(g) for g in range(GENERATIONS)]
+    assert [row['weather_code'] for row in rows] == [sample_daily_list(g)[2]['w_code'] for g in range(GENERATIONS)]
+
+    columns = db.iter_date_evolution("000000", "2026-01-03", as_columns=True)
+    assert list(columns['temp_max']) == [sample_daily_list(g)[2]['max_t'] for g in range(GENERATIONS)]
+
+
+def test_temperature_summary_uses_latest_generation(db):
+    summary = db.get_temperature_summary("2026-01-02")
+    latest = [sample_daily_list(GENERATIONS - 1 + a)[1] for a in range(len(AREAS))]
+    assert summary['area_count'] == len(AREAS)
+    assert summary['temp_min'] == min(d['min_t'] for d in latest)
+    assert summary['temp_max'] == max(d['max_t'] for d in latest)
+    assert summary['avg_temp_max'] == pytest.approx(sum(d['max_t'] for d in latest) / len(latest))
+
+
+def test_area_history_plan(db):
+    lines = plan(db, WeatherDB.AREA_HISTORY_SQL, ("000000", saved_at(0), saved_at(GENERATIONS)))
+    assert any("INDEX idx_forecasts_area_datetime" in line for line in lines), lines
+    assert any("COVERING INDEX idx_daily_forecasts_forecast_date" in line for line in lines), lines
+    assert not any("TEMP B-TREE" in line for line in lines), lines
+
+
+def test_date_evolution_plan(db):
+    lines = plan(db, WeatherDB.DATE_EVOLUTION_SQL, ("000000", "2026-01-03"))
+    assert lines[0].startswith("SEARCH f USING INDEX idx_forecasts_area_forecast"), lines
+    assert any("COVERING INDEX idx_daily_forecasts_forecast_date (forecast_id=? AND date=?)" in line for line in lines), lines
+    assert not any("TEMP B-TREE" in line for line in lines), lines
+
+
+def test_temperature_summary_plan(db):
+    lines = plan(db, WeatherDB.TEMPERATURE_SUMMARY_SQL, ("2026-01-03", "2026-01-03"))
+    assert any("COVERING INDEX idx_daily_forecasts_date" in line for line in lines), lines
+    assert not any(line.startswith("SCAN") for line in lines), lines
@@ -0,0 +1,51 @@
+# get_latest_forecast の実行計画のテスト（時間の比較は bench.py plan）
+# 2つの覆う索引を使い、ORDER BY のための一時B木を作らないことを確かめる
+import pytest
+
+from db import WeatherDB
+from weather_code import CODE_TO_TEXT, WEATHER_COLORS
+
+
+def daily_list(seed, days=7):
+    codes = list(CODE_TO_TEXT.keys())
+    return [{
+        'date': f"2026-01-{i + 1:02d}",
+        'w_code': codes[(seed + i) % len(codes)],
+        'min_t': float(i),
+        'max_t': float(i + 8),
+    } for i in range(days)]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = WeatherDB(str(tmp_path / "plan.db"), cache_size=0)
+    db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+    # 数地域 × 数世代の予報を入れておく
+    db.save_weather_reports_bulk(
+        ({'id': f"{a:06d}", 'name': f"地域{a}", 'c_id': "010100", 'c_name': "テスト地方"}, daily_list(g))
+        for g in range(3) for a in range(5)
+    )
+    yield db
+    db.close()
+
+
+def latest_plan(db, area_id):
+    conn = db._get_conn()
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + WeatherDB.LATEST_FORECAST_SQL, (area_id,))]
+
+
+def test_latest_forecast_uses_covering_indexes(db):
+    plan = latest_plan(db, "000001")
+    assert any("COVERING INDEX idx_forecasts_area_forecast" in line for line in plan), plan
+    assert any("COVERING INDEX idx_daily_forecasts_forecast_date" in line for line in plan), plan
+
+
+def test_latest_forecast_has_no_temp_btree(db):
+    plan = latest_plan(db, "000001")
+    assert not any("USE TEMP B-TREE" in line for line in plan), plan
+
+
+def test_latest_forecast_returns_newest_generation(db):
+    rows = db.get_latest_forecast("000001")
+    assert [row[1] for row in rows] == [d['date'] for d in daily_list(2)]
+    assert [row[5] for row in rows] == [d['w_code'] for d in daily_list(2)]
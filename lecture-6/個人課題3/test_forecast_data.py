@@ -0,0 +1,108 @@
+# 予報ファイルの読み分け（regions.py の fetch_code）と解析済みの予報（forecast_data.py）のテスト
+# 時間の比較は bench.py areas / offline
+import json
+import time
+
+import pytest
+import requests
+
+from db import WeatherDB
+from forecast_data import ForecastCache, cached_parsed_forecast, fetch_parsed_forecast
+from http_cache import HTTPCache
+from regions import RegionStore, parse_region_data
+from stub_jma import StubJMAServer, sample_area_info, sample_forecast_json
+from weather_code import CODE_TO_TEXT, WEATHER_COLORS
+
+# 十勝・奄美のように別の地域のファイルに入る地域を含む area.json
+AREA_JSON = {
+    "centers": {"010100": {"name": "北海道地方", "children": ["014100", "014030"]},
+                "010900": {"name": "九州南部・奄美地方", "children": ["460100", "460040"]}},
+    "offices": {"014100": {"name": "釧路・根室地方", "children": ["014010", "014020"]},
+                "014030": {"name": "十勝地方", "children": ["014030"]},
+                "460100": {"name": "鹿児島県", "children": ["460010", "460020", "460030"]},
+                "460040": {"name": "奄美地方", "children": ["460040"]}},
+}
+FETCH_CODES = {"014100": "014100", "014030": "014100", "460100": "460100", "460040": "460100"}
+
+
+def fetch_codes(region_data):
+    return {office["code"]: office["fetch_code"] for office_list in region_data.values() for office in office_list}
+
+
+def test_fetch_code_from_area_json():
+    assert fetch_codes(parse_region_data(AREA_JSON)) == FETCH_CODES
+
+
+# fetch_code のない古い形式の region_data.json を読んでも、十勝・奄美は同じファイルを読みに行く
+def test_old_region_snapshot_is_upgraded(tmp_path):
+    store = RegionStore(str(tmp_path / "region_data.json"))
+    old_data = {name: [{key: office[key] for key in ("name", "code", "center_id")} for office in office_list]
+                for name, office_list in parse_region_data(AREA_JSON).items()}
+    with open(store.path, "w", encoding="utf-8") as f:
+        json.dump({'saved_at': time.time(), 'region_data': old_data}, f, ensure_ascii=False)
+    region_data, _ = store.load()
+    assert fetch_codes(region_data) == FETCH_CODES
+    assert all(office["area_codes"] == [] for office_list in region_data.values() for office in office_list)
+
+
+@pytest.fixture
+def parsed():
+    area_codes = [f"{n:06d}" for n in range(50)]
+    response_data = sample_forecast_json(area_codes[0], area_codes)
+    return ForecastCache().get("000000", response_data), response_data
+
+
+@pytest.mark.parametrize("n", [0, 25, 49])
+def test_weekly_report_picks_the_area(parsed, n):
+    parsed, response_data = parsed
+    report_datetime, daily_list = parsed.weekly_report(f"{n:06d}")
+    assert report_datetime == response_data[1]['reportDatetime']
+    assert [day['w_code'] for day in daily_list] == response_data[1]['timeSeries'][0]['areas'][n]['weatherCodes']
+    # 同じ地域は作り直さない
+    assert parsed.weekly_report(f"{n:06d}")[1] is daily_list
+
+
+# ファイルにない地域は、先頭の地域の予報を返さずにエラーにする
+def test_missing_office_is_error(parsed):
+    parsed, _ = parsed
+    with pytest.raises(Exception, match="999999"):
+        parsed.weekly_report("999999")
+
+
+def test_cache_reparses_only_new_reports():
+    cache = ForecastCache()
+    first = cache.get("130000", sample_forecast_json("130000"))
+    assert cache.get("130000", sample_forecast_json("130000")) is first
+    updated = cache.get("130000", sample_forecast_json("130000", report_hour=17))
+    assert updated is not first
+    assert (cache.misses, cache.hits) == (2, 1)
+
+
+# サーバを止めても、保存済みの予報（DB）とHTTPキャッシュの予報は表示できる
+def test_stored_forecast_is_served_offline(tmp_path):
+    db = WeatherDB(str(tmp_path / "weather.db"))
+    db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+    server = StubJMAServer()
+    client = server.client(cache=HTTPCache(str(tmp_path / "http_cache.db"), ttl=0), retries=0, timeout=(0.5, 0.5))
+    office_codes = ["130000", "270000"]
+
+    def load(code):
+        report_datetime, daily_list = fetch_parsed_forecast(client, {"code": code}).weekly_report(code)
+        db.save_weather_report(dict(sample_area_info(code), report_datetime=report_datetime), daily_list)
+
+    try:
+        with server:
+            for code in office_codes:
+                load(code)
+        client.session.close()  # keep-alive の接続を残さない
+        for code in office_codes:
+            with pytest.raises(requests.RequestException):
+                load(code)
+            rows = db.get_latest_forecast(code)
+            meta = db.get_latest_forecast_meta(code)
+            parsed, fetched_at = cached_parsed_forecast(client, {"code": code})
+            assert rows and meta[0] == parsed.report_datetimes[1]
+            assert [row['weather_code'] for row in rows] == list(parsed.weekly_forecast(code).weather_codes)
+    finally:
+        client.close()
+        db.close()
@@ -0,0 +1,61 @@
+# 週間予報の解析（forecast_parser.py）のテスト（時間・メモリの比較は bench.py parse）
+import io
+import json
+import math
+import time
+from datetime import datetime
+
+from forecast_parser import iter_bundle, iter_weekly_forecasts, weekly_forecasts
+from stub_jma import sample_forecast_json
+
+
+def sample_bundle(files=20):
+    documents = [sample_forecast_json(f"{(n + 1) * 100:06d}",
+                                      [f"{(n + 1) * 100:04d}{m}0" for m in range(1 + n % 3)], seed=n)
+                 for n in range(files)]
+    body = "\n".join(json.dumps(document, ensure_ascii=False) for document in documents).encode("utf-8")
+    return documents, body
+
+
+def test_weekly_forecasts_match_the_json():
+    response_data = sample_forecast_json("130000", ["130010", "130020"], seed=3)
+    weekly = response_data[1]['timeSeries']
+    forecasts = weekly_forecasts(response_data)
+    assert [f.area_code for f in forecasts] == ["130010", "130020"]
+    for i, forecast in enumerate(forecasts):
+        assert forecast.report_datetime == response_data[1]['reportDatetime']
+        assert list(forecast.weather_codes) == weekly[0]['areas'][i]['weatherCodes']
+        assert list(forecast.times) == [datetime.fromisoformat(t) for t in weekly[0]['timeDefines']]
+        assert list(forecast.dates) == [t[:10] for t in weekly[0]['timeDefines']]
+        expected_min = [float(t) if t else None for t in weekly[1]['areas'][i]['tempsMin']]
+        assert [d['min_t'] for d in forecast.daily_list()] == expected_min
+        assert [math.isnan(t) for t in forecast.temps_min] == [t is None for t in expected_min]
+    # 日時・日付はファイル内の地域で共有する
+    assert forecasts[0].times is forecasts[1].times
+    assert forecasts[0].dates is forecasts[1].dates
+
+
+# チャンクの境目で文字や予報JSONが切れても、1件ずつ同じ内容を返す
+def test_bundle_is_read_across_chunk_boundaries():
+    documents, body = sample_bundle()
+    for chunk_size in (7, 4096, 1 << 20):
+        assert list(iter_bundle(io.BytesIO(body), chunk_size=chunk_size)) == documents
+    assert list(iter_bundle(io.StringIO(body.decode("utf-8")), chunk_size=100)) == documents
+
+
+def test_bundle_yields_every_area():
+    documents, body = sample_bundle()
+    codes = [f.area_code for f in iter_weekly_forecasts(iter_bundle(io.BytesIO(body)))]
+    assert codes == [f.area_code for document in documents for f in weekly_forecasts(document)]
+
+
+# 大きな予報JSON1件を小さなチャンクで読んでも、チャンクごとに先頭から解析し直さない
+def test_large_document_is_not_reparsed_per_chunk():
+    area_codes = [f"{n:06d}" for n in range(3000)]
+    body = json.dumps(sample_forecast_json(area_codes[0], area_codes), ensure_ascii=False).encode("utf-8")
+    start = time.perf_counter()
+    json.loads(body)
+    loads_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    assert len(list(iter_bundle(io.BytesIO(body), chunk_size=4096))) == 1
+    assert time.perf_counter() - start < loads_seconds * 10
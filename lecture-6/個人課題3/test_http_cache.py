@@ -0,0 +1,44 @@
+# HTTPキャッシュ（http_cache.py）のテスト
+import threading
+
+import pytest
+
+from http_cache import HTTPCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = HTTPCache(str(tmp_path / "http_cache.db"), ttl=600)
+    yield cache
+    cache.close()
+
+
+# 複数のスレッドから同時に記録しても統計の数が欠けない
+def test_stats_are_counted_across_threads(cache):
+    urls = [f"https://example.com/{n}.json" for n in range(8)]
+    for url in urls:
+        cache.put(url, b"{}")
+
+    def worker(url):
+        for _ in range(200):
+            cache.record_hit(url)
+            cache.record_revalidation(url)
+
+    threads = [threading.Thread(target=worker, args=(url,)) for url in urls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.stats == {'hits': 1600, 'misses': 8, 'revalidations': 1600, 'evictions': 0}
+
+
+def test_eviction_is_counted(tmp_path):
+    cache = HTTPCache(str(tmp_path / "http_cache.db"), max_bytes=10)
+    try:
+        cache.put("https://example.com/a.json", b"12345678")
+        cache.put("https://example.com/b.json", b"12345678")
+        assert cache.stats['evictions'] == 1
+        assert cache.get("https://example.com/a.json") is None
+    finally:
+        cache.close()
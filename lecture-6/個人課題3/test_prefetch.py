@@ -0,0 +1,69 @@
+# 全地域の先読み（prefetch.py）のテスト
+import threading
+import time
+
+import pytest
+
+from db import WeatherDB
+from prefetch import prefetch_all
+from regions import parse_region_data
+from stub_jma import StubJMAServer, sample_area_info, sample_area_json, sample_daily_list
+from weather_code import CODE_TO_TEXT, WEATHER_COLORS
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = WeatherDB(str(tmp_path / "weather.db"))
+    db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def region_data():
+    return parse_region_data(sample_area_json())
+
+
+def test_prefetch_saves_every_office(db, region_data):
+    with StubJMAServer() as server:
+        client = server.client()
+        stats = prefetch_all(client, db, region_data, concurrency=8, batch_size=10)
+        client.close()
+    office_codes = [office["code"] for office_list in region_data.values() for office in office_list]
+    assert sorted(stats['office_codes']) == sorted(office_codes)
+    assert stats['errors'] == {}
+    assert set(db.get_report_datetimes()) == set(office_codes)
+
+
+def test_cancel_stops_fetching_and_saving(db, region_data):
+    cancel = threading.Event()
+    with StubJMAServer(delay=0.05) as server:
+        client = server.client()
+        threading.Timer(0.2, cancel.set).start()
+        stats = prefetch_all(client, db, region_data, concurrency=1, batch_size=1, cancel=cancel)
+        client.close()
+        requests = server.requests
+    # 0.05秒ずつ1件ずつ取得するので、0.2秒で止めれば58件のうち数件しか取りに行かない
+    assert stats['cancelled']
+    assert requests < 20
+    assert len(db.get_report_datetimes()) <= len(stats['office_codes']) < 20
+
+
+# 先読みの途中で別の地域をクリックして保存しても、先読みの終わりまで待たされない
+def test_save_during_prefetch_is_not_blocked(db, region_data):
+    click_seconds = []
+
+    def click():
+        start = time.perf_counter()
+        db.save_weather_report(sample_area_info("999999"), sample_daily_list(0))
+        click_seconds.append(time.perf_counter() - start)
+
+    with StubJMAServer(delay=0.05) as server:
+        client = server.client()
+        clicker = threading.Timer(0.2, click)
+        clicker.start()
+        stats = prefetch_all(client, db, region_data, concurrency=8)
+        clicker.join()
+        client.close()
+    assert click_seconds[0] < stats['seconds'] / 2
+    assert "999999" in db.get_report_datetimes()
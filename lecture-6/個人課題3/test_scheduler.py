@@ -0,0 +1,86 @@
+# 発表時刻ごとの定期更新（scheduler.py）のテスト
+import pytest
+
+from db import WeatherDB
+from http_cache import HTTPCache
+from prefetch import prefetch_all
+from scheduler import RefreshScheduler
+from stub_jma import StubJMAServer, sample_forecast_json
+from weather_code import CODE_TO_TEXT, WEATHER_COLORS
+
+REGION_DATA = {"テスト地方": [{"name": "県130000", "code": "130000", "center_id": "010300",
+                               "fetch_code": "130000", "area_codes": []}]}
+
+
+@pytest.fixture
+def server():
+    with StubJMAServer() as server:
+        yield server
+
+
+@pytest.fixture
+def client(server, tmp_path):
+    client = server.client(cache=HTTPCache(str(tmp_path / "http_cache.db"), ttl=600))
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = WeatherDB(str(tmp_path / "weather.db"))
+    db.seed_weather_master(CODE_TO_TEXT, WEATHER_COLORS)
+    yield db
+    db.close()
+
+
+# 発表時刻の直後（気象庁のファイルが更新される前）に取得しておき、その後でファイルが更新された状態にする
+def fetch_before_update(server, client, db):
+    prefetch_all(client, db, REGION_DATA)
+    server.forecasts["130000"] = sample_forecast_json("130000", seed=3, report_hour=17)
+
+
+def test_scheduled_run_revalidates_within_ttl(server, client, db):
+    fetch_before_update(server, client, db)
+    requests = server.requests
+
+    changed = RefreshScheduler(client, db, REGION_DATA).run_once()
+
+    assert changed == ["130000"]
+    assert server.requests == requests + 1
+    assert server.conditional_requests == 1
+    assert db.get_report_datetimes()["130000"] == "2026-01-01T17:00:00+09:00"
+
+
+def test_scheduled_run_without_update_is_not_modified(server, client, db):
+    prefetch_all(client, db, REGION_DATA)
+
+    changed = RefreshScheduler(client, db, REGION_DATA).run_once()
+
+    assert changed == []
+    assert server.conditional_requests == 1
+    assert client.cache.stats['revalidations'] == 1
+
+
+def test_prefetch_within_ttl_uses_cache(server, client, db):
+    fetch_before_update(server, client, db)
+    requests = server.requests
+
+    prefetch_all(client, db, REGION_DATA)
+
+    assert server.requests == requests
+    assert db.get_report_datetimes()["130000"] == "2026-01-01T11:00:00+09:00"
+
+
+# 古い形式の地域リストで始めても、取り直した地域リストに差し替えれば次の更新から引ける
+def test_set_region_data_is_used_by_next_run(server, client, db):
+    weekly_code = "130010"  # 週間予報の地域コードが府県予報区のコードと違う地域
+    server.forecasts["130000"] = sample_forecast_json("130000", [weekly_code])
+    old_snapshot = {"テスト地方": [dict(REGION_DATA["テスト地方"][0], area_codes=[])]}
+    scheduler = RefreshScheduler(client, db, old_snapshot)
+    assert scheduler.run_once() == []
+    assert "130000" in scheduler.last_stats['errors']
+
+    scheduler.set_region_data({"テスト地方": [dict(REGION_DATA["テスト地方"][0], area_codes=[weekly_code])]})
+
+    assert scheduler.run_once() == ["130000"]
+    assert scheduler.last_stats['errors'] == {}
@@ -0,0 +1,96 @@
+from collections import namedtuple
+
+import flet as ft
+
+from weather_code import CODE_TO_TEXT, WEATHER_COLORS
+
+# 天気表示に必要な情報を天気コードごとに1度だけ計算しておく
+# icons: ((アイコン, 色), ...) 最大2つ、separator: "arrow"（のち）/ "bar"（時々など）/ None
+WeatherRender = namedtuple("WeatherRender", ["text", "icons", "separator", "short_text", "bg_color"])
+
+WEATHER_KEYWORDS = {
+    "雪": (ft.Icons.SNOWING, ft.Colors.CYAN),
+    "雷": (ft.Icons.THUNDERSTORM, ft.Colors.YELLOW_900),
+    "雨": (ft.Icons.WATER_DROP, ft.Colors.BLUE),
+    "晴": (ft.Icons.SUNNY, ft.Colors.ORANGE),
+    "曇": (ft.Icons.CLOUD, ft.Colors.GREY),
+    "くもり": (ft.Icons.CLOUD, ft.Colors.GREY)
+}
+REMOVE_WORDS = ["所により", "を伴う", "山沿いでは", "平地では", "付近", "から", "にかけて"]
+
+
+# ヘルパー関数で、天気文を短く整形するし、わかりやすくする
+def format_short_weather_text(text):
+    cleaned_text = text
+    for word in REMOVE_WORDS:
+        #不要な語句を削除
+        cleaned_text = cleaned_text.replace(word, "")
+    # 全角スペースを半角に変換し、連続スペースを単一スペースに
+    cleaned_text = cleaned_text.replace("　", " ")
+    cleaned_text = " ".join(cleaned_text.split())
+    return cleaned_text
+
+
+# 天気テキストを解析して表示情報を作る（キーワードの出現順にアイコンを並べる）
+def build_weather_render(weather_text):
+    found_items = []
+    for word, (icon, color) in WEATHER_KEYWORDS.items():
+        index = weather_text.find(word)
+        if index != -1:
+            found_items.append((index, icon, color))
+    found_items.sort(key=lambda x: x[0])
+    icons = tuple((icon, color) for _, icon, color in found_items[:2])
+
+    separator = None
+    if len(icons) == 2:
+        # 「のち」があれば矢印、それ以外（時々など）は区切り線
+        separator = "arrow" if "のち" in weather_text else "bar"
+
+    bg_color = ft.Colors.BLUE_GREY_50
+    for keyword, color in WEATHER_COLORS.items():
+        if keyword in weather_text:
+            bg_color = color
+            break
+    return WeatherRender(weather_text, icons, separator, format_short_weather_text(weather_text), bg_color)
+
+
+# 起動時に全天気コード分を作っておく
+RENDER_TABLE = {code: build_weather_render(text) for code, text in CODE_TO_TEXT.items()}
+_RENDER_BY_TEXT = {render.text: render for render in RENDER_TABLE.values()}
+
+
+# 天気コード（なければ天気テキスト）から表示情報を引く
+def get_weather_render(code, weather_text=None):
+    render = RENDER_TABLE.get(code)
+    if render is not None:
+        return render
+    text = weather_text if weather_text is not None else CODE_TO_TEXT.get(code, "晴れ")
+    render = _RENDER_BY_TEXT.get(text)
+    if render is None:
+        render = build_weather_render(text)
+        _RENDER_BY_TEXT[text] = render
+    return render
+
+
+# 表示情報からアイコン表示のコントロールを作成
+def create_weather_display(render):
+    icons = render.icons
+    if len(icons) == 2:
+        (first_icon, first_color), (second_icon, second_color) = icons
+        if render.separator == "arrow":
+            separator = ft.Icon(ft.Icons.ARROW_FORWARD, color=ft.Colors.GREY_400, size=24)
+        else:
+            separator = ft.Text("|", size=30, color=ft.Colors.GREY_300)
+        # 2つのアイコンを横並びで表示
+        return ft.Row([ft.Icon(first_icon, color=first_color, size=40), separator, ft.Icon(second_icon, color=second_color, size=40)], alignment=ft.MainAxisAlignment.CENTER, spacing=5)
+    elif len(icons) == 1:
+        icon, color = icons[0]
+        # 単一アイコンを表示
+        return ft.Icon(icon, color=color, size=70)
+    else:
+        return ft.Icon(ft.Icons.HELP_OUTLINE, color=ft.Colors.GREY_300, size=50)
+
+
+# ヘルパー関数： 天気テキストから天気表示を作成
+def create_weather_display_from_text(weather_text):
+    return create_weather_display(get_weather_render(None, weather_text))